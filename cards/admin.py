@@ -1,10 +1,20 @@
 # backend/cards/admin.py - VERSIÓN COMPLETA CORREGIDA
 from django.contrib import admin
 from django import forms
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.http import StreamingHttpResponse
 from django.utils.html import format_html
 from django.utils import timezone
-from .models import CardTemplate, IDCard
-from cards.utils import generate_barcode_image, generate_card_preview, generate_card_pdf, export_cards_to_pdf_batch
+from django.urls import reverse
+from .models import CardTemplate, IDCard, PrintJob, RerenderRun
+from .archives import stream_cards_zip
+from .assets import generate_assets_batch
+from .printing import mark_cards_printed
+from .progress import ProgressTracker, run_in_background
+from .render_queue import queue_render
+from .search import normalize_search_text
+from cards.utils import generate_card_pdf, generate_cards_batch
+from config.pagination import EstimatedCountPaginator
 
 # ========== CARD TEMPLATE ADMIN ==========
 class CardTemplateForm(forms.ModelForm):
@@ -111,16 +121,67 @@ class IDCardForm(forms.ModelForm):
         self.fields['expiration_date'].required = False
         # self.fields['metadata'].required = False
 
+class CompanyAutocompleteFilter(admin.SimpleListFilter):
+    """
+    Filtro por empresa con el buscador de autocompletado del admin, en lugar
+    de listar todas las empresas en la barra lateral. Solo consulta la
+    empresa seleccionada (para mostrar su nombre).
+    """
+    title = 'empresa'
+    parameter_name = 'company__id__exact'
+    template = 'admin/cards/autocomplete_filter.html'
+    
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.field = model._meta.get_field('company')
+        self.admin_site = model_admin.admin_site
+    
+    def lookups(self, request, model_admin):
+        return ()
+    
+    def has_output(self):
+        return True
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(company_id=self.value())
+        return queryset
+    
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'Todas',
+        }
+    
+    @classmethod
+    def widget(cls, field, admin_site):
+        return AutocompleteSelect(field, admin_site, attrs={'style': 'width: 100%'})
+    
+    @property
+    def widget_html(self):
+        choice_field = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.only('pk', 'name'),
+            widget=self.widget(self.field, self.admin_site),
+        )
+        return choice_field.widget.render(f'filter_{self.parameter_name}', self.value())
+
+
 @admin.register(IDCard)
 class IDCardAdmin(admin.ModelAdmin):
     form = IDCardForm  # Usar nuestro formulario personalizado
     
     # Configuración de listado
-    list_display = ['card_number', 'person_name', 'company', 'status', 'get_issue_date', 'has_barcode']
-    list_filter = ['company', 'status', 'card_type', 'printed']
+    # Con millones de tarjetas: sin COUNT(*) del total, total estimado, empresa en el mismo
+    # SELECT, filtro de empresa con autocompletado y sin date_hierarchy (agrupa toda la tabla)
+    list_display = ['thumbnail', 'card_number', 'person_name', 'company', 'status', 'get_issue_date', 'has_barcode']
+    list_display_links = ['card_number']
+    list_select_related = ['company']
+    list_filter = [CompanyAutocompleteFilter, 'status', 'card_type', 'printed', ('created_at', admin.DateFieldListFilter)]
     search_fields = ['card_number', 'person_name', 'id_number', 'employee_id']
     list_per_page = 50
-    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     # Campos de solo lectura (después de creados)
     readonly_fields = [
@@ -196,7 +257,24 @@ class IDCardAdmin(admin.ModelAdmin):
     )
     
     # Relaciones con widget de búsqueda
-    raw_id_fields = ['company', 'template', 'printed_by']
+    raw_id_fields = ['template', 'printed_by']
+    autocomplete_fields = ['company']
+    
+    @property
+    def media(self):
+        field = IDCard._meta.get_field('company')
+        return super().media + CompanyAutocompleteFilter.widget(field, self.admin_site).media
+    
+    def get_queryset(self, request):
+        # Columnas grandes que el listado no muestra
+        return super().get_queryset(request).defer('metadata', 'search_document')
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Buscar en search_document (normalizado e indexado) como el API"""
+        terms = normalize_search_text(search_term).split()
+        for term in terms:
+            queryset = queryset.filter(search_document__contains=term)
+        return queryset, False
     
     # Métodos personalizados para display (solo lectura)
     def get_issue_date(self, obj):
@@ -226,6 +304,16 @@ class IDCardAdmin(admin.ModelAdmin):
         return obj.printed_count
     printed_count_display.short_description = 'Veces impresa'
     
+    def thumbnail(self, obj):
+        # loading="lazy": el navegador solo descarga las miniaturas visibles
+        if obj.composite_image:
+            return format_html(
+                '<img src="{}" loading="lazy" decoding="async" height="40" style="border: 1px solid #ccc;" />',
+                obj.composite_image.url
+            )
+        return ''
+    thumbnail.short_description = ''
+    
     def has_barcode(self, obj):
         return "✅" if obj.barcode_image else "❌"
     has_barcode.short_description = "Código Barras"
@@ -294,78 +382,65 @@ class IDCardAdmin(admin.ModelAdmin):
         return readonly
     
     # Acciones personalizadas
-    actions = ['generate_barcodes', 'generate_previews', 'mark_as_printed', 'generate_pdf']
+    actions = ['generate_barcodes', 'generate_previews', 'mark_as_printed', 'generate_pdf', 'download_zip']
     
     def generate_barcodes(self, request, queryset):
-        """Generar códigos de barras para tarjetas seleccionadas"""
-        success = 0
-        for card in queryset:
-            try:
-                if not card.barcode_data:
-                    card.barcode_data = card.id_number or card.card_number
-                    card.save(update_fields=['barcode_data'])
-                
-                barcode_file = generate_barcode_image(card.barcode_data, card.barcode_type or 'code128')
-                if barcode_file:                   
-                    card.barcode_image.save(f'barcode_{card.id}_{card.barcode_type}.png', barcode_file)
-                    success += 1
-            except Exception as e:
-                self.message_user(request, f"Error con {card.card_number}: {e}", level='error')
-        
-        self.message_user(request, f'Códigos de barras generados para {success} tarjetas.')
+        """Generar códigos de barras para tarjetas seleccionadas (en segundo plano)"""
+        card_ids = list(queryset.values_list('pk', flat=True))
+        tracker = ProgressTracker('generate_barcodes', total=len(card_ids), user_id=request.user.pk)
+        run_in_background(tracker, generate_assets_batch, card_ids, ['barcode'])
+        self._message_progress(request, tracker, len(card_ids))
         
     generate_barcodes.short_description = "Generar códigos de barras*"
 
+    def _run_tracked_action(self, request, queryset, operation, generator):
+        """Lanzar la generación en segundo plano y enlazar su progreso (cards/progress.py)"""
+        card_ids = list(queryset.values_list('pk', flat=True))
+        tracker = ProgressTracker(operation, total=len(card_ids), user_id=request.user.pk)
+        run_in_background(tracker, generate_cards_batch, card_ids, generator)
+        self._message_progress(request, tracker, len(card_ids))
+    
+    def _message_progress(self, request, tracker, total):
+        url = reverse('card-progress', args=[tracker.id])
+        self.message_user(request, format_html(
+            '{} tarjetas en proceso. Progreso: <a href="{}">{}</a> (eventos en vivo: <a href="{}stream/">stream</a>)',
+            total, url, tracker.id, url
+        ))
+
     def generate_pdf(self, request, queryset):
         """Generar PDFS de las tarjetas seleccionadas"""
-        success = 0
-        for card in queryset:
-            try:
-                if generate_card_pdf(card):
-                # if export_cards_to_pdf_batch():
-                    success += 1
-            except Exception as e:
-                self.message_user(request, f"Error con {card.card_number}: {e}", level='error')
-        
-        self.message_user(request, f'PDFs generadas para {success} tarjetas.')
+        self._run_tracked_action(request, queryset, 'generate_pdf', generate_card_pdf)
 
     generate_pdf.short_description = "Generar PDF++"
     
     def generate_previews(self, request, queryset):
-        """Generar vistas previas para tarjetas seleccionadas"""
-        success = 0
-        for card in queryset:
-            try:
-                if generate_card_preview(card):
-                    success += 1
-            except Exception as e:
-                self.message_user(request, f"Error con {card.card_number}: {e}", level='error')
-        
-        self.message_user(request, f'Vistas previas generadas para {success} tarjetas.')
+        """Poner en cola la regeneración de vistas previas (un solo UPDATE, ver render_pending_cards)"""
+        queued = queue_render(queryset)
+        self.message_user(request, f'{queued} tarjetas en cola de regeneración (render_pending_cards).')
     
     generate_previews.short_description = "Generar vistas previas"
     
     def mark_as_printed(self, request, queryset):
         """Marcar tarjetas como impresas"""
-        updated = queryset.update(
-            printed=True, 
-            printed_at=timezone.now(), 
-            printed_by=request.user
-        )
-        # Incrementar contador
-        for card in queryset:
-            card.printed_count += 1
-            card.save(update_fields=['printed_count'])
+        # Un solo UPDATE: el contador se incrementa con F()
+        updated = mark_cards_printed(queryset, user=request.user)
         
         self.message_user(request, f'{updated} tarjetas marcadas como impresas.')
     
     mark_as_printed.short_description = "Marcar como impresas"
     
+    def download_zip(self, request, queryset):
+        """Descargar vistas previas, PDFs y códigos de barras en un ZIP generado al vuelo"""
+        response = StreamingHttpResponse(stream_cards_zip(queryset), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="tarjetas.zip"'
+        return response
+    
+    download_zip.short_description = "Descargar archivos (ZIP)"
+    
     # save_model
     def save_model(self, request, obj, form, change):
-        """Guardar tarjeta y generar assets automáticamente"""
-        from cards.utils import generate_barcode_image
-        import os
+        """Guardar tarjeta; los archivos se generan después del commit (cards/assets.py)"""
+        from django.conf import settings
         # Asignar creador si es nueva
         if not change:
             obj.created_by = request.user
@@ -384,57 +459,47 @@ class IDCardAdmin(admin.ModelAdmin):
         if not obj.barcode_type:
             obj.barcode_type = 'code128'
         
-        # GUARDAR PRIMERO (esto crea el ID)
         super().save_model(request, obj, form, change)
         
-        # Generar código de barras inmediatamente
-        if obj.barcode_data:
-            try:
-                print(f"🔧 Generando barcode para {obj.card_number}...")
-                
-                # Generar imagen
-                barcode_file = generate_barcode_image(obj.barcode_data, obj.barcode_type)
-                
-                if barcode_file:
-                    print(f"✅ Barcode generado, tamaño: {len(barcode_file.read())} bytes")
-                    
-                    # IMPORTANTE: Regresar al inicio del archivo
-                    barcode_file.seek(0)
-                    
-                    # Nombre del archivo
-                    file_name = f"barcode_{obj.id}_{obj.barcode_type}.png"
-                    
-                    # Guardar CORRECTAMENTE
-                    obj.barcode_image.save(file_name, barcode_file, save=True)
-                    
-                    print(f"✅ Barcode guardado como: {obj.barcode_image.name}")
-                    
-                    # Mostrar mensaje al usuario
-                    self.message_user(request, f"Código de barras generado: {obj.barcode_data}")
-                else:
-                    print("❌ No se pudo generar barcode")
-                    self.message_user(request, "No se pudo generar el código de barras", level='warning')
-                    
-            except Exception as e:
-                print(f"❌ Error generando barcode: {e}")
-                import traceback
-                traceback.print_exc()
-                self.message_user(request, f"Error generando código de barras: {e}", level='error')
-        
-        # Generar vista previa en segundo plano
-        try:
-            import threading
-            def generate_preview():
-                try:
-                    generate_card_preview(obj)
-                except Exception as e:
-                    print(f"Error generando vista previa: {e}")
-            
-            thread = threading.Thread(target=generate_preview)
-            thread.daemon = True
-            thread.start()
-            
-            if not change:
-                self.message_user(request, "Tarjeta creada. La vista previa se generará en segundo plano.")
-        except Exception as e:
-            print(f"Error programando vista previa: {e}")
\ No newline at end of file
+        if not change and settings.CARD_ASSETS_MODE == 'thread':
+            self.message_user(request, "Tarjeta creada. El código de barras y la vista previa se generarán en segundo plano.")
+
+
+# ========== PRINT JOB ADMIN ==========
+@admin.register(PrintJob)
+class PrintJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'company', 'printer_name', 'status', 'total_cards',
+        'printed_cards', 'failed_cards', 'cards_per_minute', 'created_at'
+    ]
+    list_filter = ['status', 'company']
+    search_fields = ['printer_name']
+    raw_id_fields = ['company', 'created_by']
+    readonly_fields = [
+        'id', 'total_cards', 'printed_cards', 'failed_cards',
+        'created_at', 'started_at', 'finished_at', 'cards_per_minute'
+    ]
+    exclude = ['cards']
+
+
+# ========== RERENDER RUN ADMIN ==========
+@admin.register(RerenderRun)
+class RerenderRunAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'company', 'template', 'status', 'total_cards', 'processed_cards',
+        'failed_cards', 'chunks_done', 'checkpoint_at', 'created_at'
+    ]
+    list_filter = ['status']
+    raw_id_fields = ['company', 'template', 'created_by']
+    readonly_fields = [
+        'id', 'total_cards', 'processed_cards', 'failed_cards', 'failed_card_ids',
+        'chunks_done', 'last_error', 'created_at', 'checkpoint_at', 'finished_at'
+    ]
+    actions = ['cancel_runs']
+    
+    def cancel_runs(self, request, queryset):
+        """Detener las regeneraciones en curso tras su bloque actual"""
+        updated = queryset.filter(status='running').update(status='cancelled', finished_at=timezone.now())
+        self.message_user(request, f"{updated} regeneraciones canceladas.")
+    
+    cancel_runs.short_description = "Cancelar regeneraciones"
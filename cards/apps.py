@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CardsConfig(AppConfig):
     name = 'cards'
+
+    def ready(self):
+        from . import signals  # noqa: F401
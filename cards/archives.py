@@ -0,0 +1,103 @@
+# backend/cards/archives.py
+import logging
+import os
+import re
+import time
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+# Tipo de archivo -> (campo de IDCard, carpeta dentro del ZIP)
+ARCHIVE_FILES = {
+    'previews': ('composite_image', 'previews'),
+    'pdfs': ('pdf_file', 'pdfs'),
+    'barcodes': ('barcode_image', 'barcodes'),
+}
+
+# Formatos ya comprimidos: se guardan tal cual (ZIP_STORED), recomprimir solo gasta CPU
+STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.pdf', '.zip'}
+
+READ_CHUNK_SIZE = 256 * 1024
+
+
+class _StreamBuffer:
+    """
+    Destino sin seek para ZipFile: guarda lo escrito hasta que el
+    generador lo entrega. zipfile usa descriptores de datos al no poder
+    volver atrás, así que nunca hay que reescribir una cabecera.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _safe_name(value):
+    return re.sub(r'[^\w.-]+', '_', value).strip('._') or 'tarjeta'
+
+
+def _add_file(archive, buffer, path, arcname):
+    """Copiar un archivo al ZIP por bloques, entregando lo escrito en cada uno"""
+    stat = os.stat(path)
+    zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(stat.st_mtime)[:6])
+    zinfo.file_size = stat.st_size  # decide ZIP64 antes de escribir
+    extension = os.path.splitext(path)[1].lower()
+    zinfo.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+    with open(path, 'rb') as source, archive.open(zinfo, 'w') as target:
+        while True:
+            chunk = source.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            target.write(chunk)
+            data = buffer.drain()
+            if data:
+                yield data
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+def stream_cards_zip(queryset, kinds=tuple(ARCHIVE_FILES)):
+    """
+    Generador con un ZIP de los archivos de las tarjetas del queryset
+    (vistas previas, PDFs, códigos de barras), para StreamingHttpResponse.
+    Se construye sobre la marcha: sin archivos temporales y sin tener el
+    ZIP completo en memoria (solo el bloque en curso y el índice final).
+    Los archivos que faltan en disco se omiten.
+    """
+    fields = [ARCHIVE_FILES[kind][0] for kind in kinds]
+    cards = queryset.select_related(None).only('pk', 'card_number', *fields)
+
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, strict_timestamps=False) as archive:
+        for card in cards.iterator(chunk_size=500):
+            name = _safe_name(card.card_number)
+            for kind in kinds:
+                field_name, folder = ARCHIVE_FILES[kind]
+                field_file = getattr(card, field_name)
+                if not field_file:
+                    continue
+                try:
+                    path = field_file.path
+                    if not os.path.isfile(path):
+                        continue
+                    extension = os.path.splitext(path)[1].lower()
+                    yield from _add_file(archive, buffer, path, f'{folder}/{name}{extension}')
+                except OSError as e:
+                    logger.warning("Error agregando %s al ZIP: %s", field_file.name, e)
+    # Al cerrar se escribe el directorio central
+    data = buffer.drain()
+    if data:
+        yield data
@@ -0,0 +1,154 @@
+# backend/cards/artifacts.py
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+_memory = None
+_memory_lock = threading.Lock()
+
+# Bytes escritos en disco desde la última limpieza
+_written = 0
+_written_lock = threading.Lock()
+
+
+def artifact_key(*parts):
+    """Clave de un archivo generado: huella de la tarjeta + variante (cara, formato, tamaño)"""
+    return hashlib.sha256('|'.join(map(str, parts)).encode('utf-8')).hexdigest()
+
+
+class MemoryLRU:
+    """LRU en memoria limitada por bytes (no por número de entradas)"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        # Un archivo que ocupa más de un cuarto de la caché solo se guarda en disco
+        if len(data) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+def memory_cache():
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = MemoryLRU(settings.RENDER_CACHE_MEMORY_BYTES)
+    return _memory
+
+
+def _disk_path(key):
+    return os.path.join(settings.RENDER_CACHE_DIR, key[:2], key[2:4], key)
+
+
+def get_artifact(key):
+    """
+    Buscar un archivo generado: primero en memoria (este proceso), luego en
+    disco (compartido por los procesos del nodo). Devuelve bytes o None.
+    """
+    memory = memory_cache()
+    data = memory.get(key)
+    if data is not None:
+        return data
+
+    path = _disk_path(key)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        os.utime(path)  # LRU en disco por fecha de modificación
+    except OSError:
+        pass
+    memory.set(key, data)
+    return data
+
+
+def put_artifact(key, data):
+    """Guardar en memoria y en disco (escritura atómica: nunca se lee un archivo a medias)"""
+    global _written
+    memory_cache().set(key, data)
+
+    path = _disk_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Recorrer el directorio cada ~10 % del límite escrito, no en cada escritura
+    with _written_lock:
+        _written += len(data)
+        prune = _written >= settings.RENDER_CACHE_DISK_BYTES // 10
+        if prune:
+            _written = 0
+    if prune:
+        prune_disk_cache()
+
+
+def prune_disk_cache(max_bytes=None):
+    """
+    Borrar los archivos usados hace más tiempo hasta quedar en el 90 % del
+    límite (RENDER_CACHE_DISK_BYTES). Devuelve (archivos borrados, bytes liberados).
+    """
+    max_bytes = settings.RENDER_CACHE_DISK_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for root, _, files in os.walk(settings.RENDER_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0, 0
+
+    target = max_bytes * 0.9
+    removed = freed = 0
+    for _, size, path in sorted(entries):
+        if total - freed <= target:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        freed += size
+    return removed, freed
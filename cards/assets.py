@@ -0,0 +1,143 @@
+# backend/cards/assets.py
+import importlib.util
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from companies.generations import bump_generation
+from .models import IDCard
+
+logger = logging.getLogger(__name__)
+
+# Archivos que se generan a partir de los datos de la tarjeta
+ASSETS = ('barcode', 'qr', 'preview')
+
+# El QR depende del paquete opcional qrcode[pil]
+QR_AVAILABLE = importlib.util.find_spec('qrcode') is not None
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CARD_ASSETS_WORKERS,
+                thread_name_prefix='card-assets',
+            )
+    return _executor
+
+
+def assets_to_generate(card, created=False):
+    """
+    Decidir qué archivos hay que (re)generar tras guardar la tarjeta.
+    No consulta la base de datos: usa los valores leídos en from_db.
+    """
+    assets = []
+    barcode_changed = (
+        getattr(card, '_loaded_barcode', None) is not None
+        and card._loaded_barcode != (card.barcode_data, card.barcode_type)
+    )
+    if card.barcode_data and (not card.barcode_image or barcode_changed):
+        assets.append('barcode')
+    if QR_AVAILABLE and card.card_number and not card.qr_code:
+        assets.append('qr')
+    if created and not card.composite_image:
+        assets.append('preview')
+    return assets
+
+
+def schedule_card_assets(card_pk, assets):
+    """
+    Generar los archivos cuando la transacción actual confirme.
+    CARD_ASSETS_MODE: 'inline' (en el mismo hilo), 'thread' (ejecutor en
+    segundo plano) u 'off' (no generar; ej. importaciones masivas).
+    """
+    mode = settings.CARD_ASSETS_MODE
+    if not assets or mode == 'off':
+        return
+
+    assets = tuple(assets)
+    if mode == 'thread':
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, card_pk, assets))
+    else:
+        transaction.on_commit(lambda: generate_card_assets(card_pk, assets))
+
+
+def _run_in_thread(card_pk, assets):
+    close_old_connections()
+    try:
+        generate_card_assets(card_pk, assets)
+    except Exception:
+        logger.exception('Error generando archivos de la tarjeta %s', card_pk)
+    finally:
+        close_old_connections()
+
+
+def generate_card_assets(card_pk, assets=ASSETS):
+    """
+    Generar los archivos indicados fuera de cualquier transacción.
+    Los archivos se escriben primero en el storage y luego se guardan los
+    nombres con un solo UPDATE de esas columnas (no pisa otros cambios).
+    """
+    from companies.stats import sync_card_media_bytes
+    from .utils import generate_barcode_image, generate_card_preview, generate_qr_code
+
+    card = IDCard.objects.select_related('template', 'company').filter(pk=card_pk).first()
+    if card is None:
+        return []
+
+    changed = {}
+    if 'barcode' in assets and card.barcode_data:
+        barcode_file = generate_barcode_image(card.barcode_data, card.barcode_type)
+        if barcode_file:
+            # Reemplazar el archivo anterior en lugar de acumular copias
+            if card.barcode_image:
+                card.barcode_image.storage.delete(card.barcode_image.name)
+            card.barcode_image.save(f'barcode_{card.pk}_{card.barcode_type}.png', barcode_file, save=False)
+            changed['barcode_image'] = card.barcode_image.name
+
+    if 'qr' in assets and card.card_number:
+        qr_file = generate_qr_code(card.card_number)
+        if qr_file:
+            if card.qr_code:
+                card.qr_code.storage.delete(card.qr_code.name)
+            card.qr_code.save(f'qr_{card.pk}.png', qr_file, save=False)
+            changed['qr_code'] = card.qr_code.name
+
+    if changed:
+        IDCard.objects.filter(pk=card.pk).update(**changed)
+        bump_generation(card.company_id)
+        sync_card_media_bytes(card)
+
+    # Al final, para dibujar el código de barras nuevo; guarda sus columnas con otro UPDATE
+    if 'preview' in assets and generate_card_preview(card):
+        changed['composite_image'] = card.composite_image.name
+    return list(changed)
+
+
+def generate_assets_batch(card_ids, assets, progress=None):
+    """
+    Generar los archivos indicados de varias tarjetas (acciones del admin).
+    `progress` es un cards.progress.ProgressTracker opcional. Devuelve (correctas, fallidas).
+    """
+    ok = failed = 0
+    for card_pk in card_ids:
+        try:
+            done = bool(generate_card_assets(card_pk, assets))
+        except Exception:
+            logger.exception('Error generando archivos de la tarjeta %s', card_pk)
+            done = False
+        if done:
+            ok += 1
+        else:
+            failed += 1
+        if progress is not None:
+            progress.advance(ok=1 if done else 0, failed=0 if done else 1)
+
+    if progress is not None:
+        progress.finish(result={'ok': ok, 'failed': failed}, message=f'{ok} correctas, {failed} con error')
+    return ok, failed
@@ -0,0 +1,263 @@
+# backend/cards/async_views.py
+"""
+Vistas async (ASGI) para dibujar y descargar tarjetas.
+
+DRF no tiene vistas async, así que son vistas de Django: la autenticación
+de DRF (token, sesión, API Key) se resuelve en un hilo, la tarjeta se lee
+con el ORM async y el dibujo va al pool de procesos (cards/rendering.py).
+Un nodo atiende muchas vistas previas a la vez sin ocupar un hilo por cada una.
+"""
+import asyncio
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from users.authentication import CompanyAPIKeyAuthentication
+from users.permissions import user_company_ids
+from .artifacts import artifact_key, get_artifact, put_artifact
+from .models import IDCard
+from .rendering import (
+    IMAGE_FORMATS, RENDER_FORMATS, SIDES, RenderBusy, derive_image, render_card as render_in_pool,
+    render_fingerprint, render_once,
+)
+from .utils import DPI
+
+# Formato -> archivo guardado de la tarjeta
+STORED_FILES = {
+    'png': 'composite_image',
+    'pdf': 'pdf_file',
+}
+
+AUTHENTICATION_CLASSES = [CompanyAPIKeyAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+
+
+def _authenticate(request):
+    """
+    Autenticar como lo haría IDCardViewSet.
+    Devuelve (usuario, empresas visibles o None si ve todas) o (None, None).
+    """
+    drf_request = Request(request, authenticators=[cls() for cls in AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return None, None
+    if not user or not user.is_authenticated:
+        return None, None
+    if user.is_superuser:
+        return user, None
+    return user, user_company_ids(drf_request)
+
+
+def _unsupported_format(fmt, formats):
+    if fmt in formats:
+        return None
+    return JsonResponse({'error': f'Formato no soportado. Usa: {", ".join(formats)}'}, status=400)
+
+
+async def _get_card(request, pk):
+    """La tarjeta si el usuario puede verla; si no, una respuesta de error"""
+    user, company_ids = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return None, JsonResponse({'error': 'Se requiere autenticación'}, status=401)
+
+    queryset = IDCard.objects.select_related('template', 'company').defer('search_document', 'metadata')
+    if company_ids is not None:
+        queryset = queryset.filter(company_id__in=company_ids)
+    try:
+        return await queryset.aget(pk=pk), None
+    except IDCard.DoesNotExist:
+        return None, JsonResponse({'error': 'Tarjeta no encontrada'}, status=404)
+
+
+async def _touch_last_accessed(card):
+    """Registrar el acceso como mucho una vez cada LAST_ACCESSED_UPDATE_INTERVAL segundos"""
+    now = timezone.now()
+    interval = timedelta(seconds=settings.LAST_ACCESSED_UPDATE_INTERVAL)
+    if card.last_accessed and now - card.last_accessed < interval:
+        return
+    await IDCard.objects.filter(pk=card.pk).aupdate(last_accessed=now)
+    card.last_accessed = now
+
+
+def _busy_response():
+    response = JsonResponse({'error': 'Servidor ocupado, intenta de nuevo en unos segundos'}, status=503)
+    response['Retry-After'] = '2'
+    return response
+
+
+async def _render_response(card, fmt, filename=None):
+    try:
+        data = await render_in_pool(card, fmt)
+    except RenderBusy:
+        return _busy_response()
+    except Exception as e:
+        return JsonResponse({'error': f'Error al generar la tarjeta: {str(e)}'}, status=500)
+
+    response = HttpResponse(data, content_type=RENDER_FORMATS[fmt])
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@require_GET
+async def render_card(request, pk, fmt):
+    """
+    Dibujar la tarjeta con sus datos actuales, sin guardarla.
+    GET /api/cards/<id>/render/png/ o /render/pdf/
+    """
+    error = _unsupported_format(fmt, RENDER_FORMATS)
+    if error is None:
+        card, error = await _get_card(request, pk)
+    if error is not None:
+        return error
+    return await _render_response(card, fmt)
+
+
+@require_GET
+async def download_card(request, pk, fmt):
+    """
+    Descargar la vista previa o el PDF guardado de la tarjeta;
+    si todavía no existe se dibuja al momento.
+    GET /api/cards/<id>/download/png/ o /download/pdf/
+    """
+    error = _unsupported_format(fmt, RENDER_FORMATS)
+    if error is None:
+        card, error = await _get_card(request, pk)
+    if error is not None:
+        return error
+    await _touch_last_accessed(card)
+
+    filename = f'{card.card_number}.{fmt}'
+    stored = getattr(card, STORED_FILES[fmt])
+    if stored:
+        try:
+            data = await asyncio.to_thread(_read_file, stored.path)
+        except OSError:
+            data = None
+        if data is not None:
+            response = HttpResponse(data, content_type=RENDER_FORMATS[fmt])
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+    return await _render_response(card, fmt, filename)
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+# ========== IMAGEN BAJO DEMANDA ==========
+
+def _image_options(params):
+    """Validar ?format=&width=&dpi=&side= (ValueError con el mensaje para el cliente)"""
+    fmt = params.get('format', 'png').lower()
+    fmt = 'jpeg' if fmt == 'jpg' else fmt
+    if fmt not in IMAGE_FORMATS and fmt != 'pdf':
+        raise ValueError(f'Formato no soportado. Usa: {", ".join([*IMAGE_FORMATS, "pdf"])}')
+
+    side = params.get('side', 'front').lower()
+    if side not in SIDES:
+        raise ValueError(f'Cara no válida. Usa: {", ".join(SIDES)}')
+
+    width = dpi = None
+    if params.get('width') and params.get('dpi'):
+        raise ValueError('Indica width o dpi, no ambos')
+    try:
+        if params.get('width'):
+            width = int(params['width'])
+        if params.get('dpi'):
+            dpi = int(params['dpi'])
+    except ValueError:
+        raise ValueError('width y dpi deben ser números enteros')
+    if width is not None and not 16 <= width <= settings.CARD_IMAGE_MAX_WIDTH:
+        raise ValueError(f'width debe estar entre 16 y {settings.CARD_IMAGE_MAX_WIDTH}')
+    if dpi is not None and not 16 <= dpi <= DPI:
+        raise ValueError(f'dpi debe estar entre 16 y {DPI}')
+    if fmt == 'pdf':
+        width = dpi = None  # vectorial: el tamaño es el físico CR80
+    return fmt, side, width, dpi
+
+
+async def _stored_or_render(key, card, fmt, side):
+    """Archivo a resolución completa desde la caché o dibujado una vez en el pool"""
+    data = await asyncio.to_thread(get_artifact, key)
+    if data is not None:
+        return data
+
+    async def render():
+        data = await render_in_pool(card, fmt, side)
+        await asyncio.to_thread(put_artifact, key, data)
+        return data
+    return await render_once(key, render)
+
+
+async def _card_image_bytes(card, fingerprint, fmt, side, width, dpi):
+    """
+    Dos niveles de caché: el PNG (o PDF) a resolución completa, que es lo
+    caro de dibujar, y cada variante de formato/tamaño derivada de él.
+    """
+    if fmt == 'pdf':
+        return await _stored_or_render(artifact_key(fingerprint, side, 'pdf'), card, 'pdf', side)
+
+    master_key = artifact_key(fingerprint, side, 'png')
+    if fmt == 'png' and width is None and dpi is None:
+        return await _stored_or_render(master_key, card, 'png', side)
+
+    key = artifact_key(fingerprint, side, fmt, width or '', dpi or '')
+    data = await asyncio.to_thread(get_artifact, key)
+    if data is not None:
+        return data
+
+    master = await _stored_or_render(master_key, card, 'png', side)
+    data = await asyncio.to_thread(derive_image, master, fmt, width, dpi)
+    await asyncio.to_thread(put_artifact, key, data)
+    return data
+
+
+@require_GET
+async def card_image(request, pk):
+    """
+    Imagen de la tarjeta generada bajo demanda.
+    GET /api/cards/<id>/image/?format=png|webp|jpeg|pdf&width=<px>|dpi=<n>&side=front|back
+
+    El resultado se guarda en la caché de archivos (memoria + disco) con la
+    huella de los datos de la tarjeta: cualquier cambio genera otra huella,
+    así que nunca se sirve una imagen vieja. ETag para revalidar sin descargar.
+    """
+    try:
+        fmt, side, width, dpi = _image_options(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    card, error = await _get_card(request, pk)
+    if error is not None:
+        return error
+    await _touch_last_accessed(card)
+
+    fingerprint = await asyncio.to_thread(render_fingerprint, card)
+    etag = f'"{artifact_key(fingerprint, side, fmt, width or "", dpi or "")[:32]}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    try:
+        data = await _card_image_bytes(card, fingerprint, fmt, side, width, dpi)
+    except RenderBusy:
+        return _busy_response()
+    except Exception as e:
+        return JsonResponse({'error': f'Error al generar la tarjeta: {str(e)}'}, status=500)
+
+    content_type = RENDER_FORMATS['pdf'] if fmt == 'pdf' else IMAGE_FORMATS[fmt][1]
+    response = HttpResponse(data, content_type=content_type)
+    response['ETag'] = etag
+    # Siempre revalidar: si la tarjeta cambia, cambia el ETag
+    response['Cache-Control'] = 'private, no-cache'
+    if fmt == 'pdf':
+        response['Content-Disposition'] = f'inline; filename="{card.card_number}-{side}.pdf"'
+    return response
@@ -0,0 +1,74 @@
+# backend/cards/bulk.py
+from django.db import transaction
+from django.utils import timezone
+from companies.generations import bump_generations
+from companies.webhooks import queue_card_events, webhook_cards
+from .lifecycle import apply_status_transition
+from .models import IDCard
+from .search import normalize_search_text
+
+# Campos que se pueden cambiar en lote
+BULK_UPDATE_FIELDS = [
+    'status', 'department', 'person_title', 'card_type',
+    'id_type', 'valid_from', 'expiration_date', 'template',
+]
+
+# Campos que cambian lo que se imprime en la tarjeta
+RENDER_FIELDS = {'person_title', 'template', 'valid_from', 'expiration_date'}
+
+CHUNK_SIZE = 1000
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_update_cards(queryset, changes, user=None):
+    """
+    Aplicar `changes` a todas las tarjetas del queryset por bloques.
+
+    - status: un UPDATE por bloque + historial y estadísticas (lifecycle).
+    - department: bulk_update, porque también cambia search_document.
+    - resto: un UPDATE por bloque.
+    Si cambia algo visible en la tarjeta, se marca para regenerar; si cambia
+    algo de lo que se envía en los webhooks, se encola card.updated.
+    Devuelve el número de tarjetas afectadas.
+    """
+    changes = dict(changes)
+    new_status = changes.pop('status', None)
+    department = changes.pop('department', None)
+    render = bool(RENDER_FIELDS & set(changes))
+    now = timezone.now()
+
+    rows = list(queryset.order_by().values_list('pk', 'company_id'))
+    pks = [pk for pk, _ in rows]
+    company_ids = {company_id for _, company_id in rows}
+    with transaction.atomic():
+        for chunk in _chunks(pks):
+            if new_status is not None:
+                status_rows = list(
+                    IDCard.objects.filter(pk__in=chunk).values_list('pk', 'company_id', 'status')
+                )
+                apply_status_transition(status_rows, new_status, reason='bulk', changed_by=user)
+
+            if department is not None:
+                cards = list(IDCard.objects.filter(pk__in=chunk).only('pk', *IDCard.SEARCH_DOCUMENT_FIELDS))
+                for card in cards:
+                    card.department = department
+                    card.updated_at = now
+                    card.search_document = normalize_search_text(
+                        *(getattr(card, field) for field in IDCard.SEARCH_DOCUMENT_FIELDS)
+                    )
+                IDCard.objects.bulk_update(cards, ['department', 'search_document', 'updated_at'])
+
+            if changes or render:
+                extra = {'render_pending': True} if render else {}
+                IDCard.objects.filter(pk__in=chunk).update(updated_at=now, **changes, **extra)
+
+            if department is not None or set(changes) & set(IDCard.WEBHOOK_FIELDS):
+                queue_card_events('card.updated', webhook_cards(IDCard.objects.filter(pk__in=chunk)))
+        # Los cambios de estado ya invalidan la caché en apply_status_transition
+        if department is not None or changes:
+            bump_generations(company_ids)
+    return len(pks)
@@ -0,0 +1,182 @@
+# backend/cards/integrity.py
+import json
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
+from .media_gc import file_fields, iter_media_files, normalize_media_path
+
+CHUNK_SIZE = 2000
+
+
+class JSONType(models.Func):
+    """Tipo del valor JSON guardado: json_type (SQLite) / jsonb_typeof (PostgreSQL)"""
+    function = 'JSON_TYPE'
+    output_field = models.CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function='JSONB_TYPEOF', **extra_context)
+
+
+class Problem:
+    """Resultado de una comprobación: qué falla, cuántas filas y si se puede arreglar"""
+
+    def __init__(self, check, label, count, fix=None, detail=''):
+        self.check = check
+        self.label = label
+        self.count = count
+        self.fix = fix
+        self.detail = detail
+
+    @property
+    def fixable(self):
+        return self.fix is not None
+
+
+def _models():
+    # Incluye las tablas intermedias de los ManyToMany
+    return apps.get_models(include_auto_created=True)
+
+
+# ========== CLAVES FORÁNEAS ==========
+
+def check_foreign_keys():
+    """
+    Filas cuya clave foránea apunta a una fila inexistente.
+    Una consulta anti-join (NOT EXISTS) por clave foránea.
+    Solo se arreglan las nulables (se ponen a NULL, en un UPDATE).
+    """
+    for model in _models():
+        for field in model._meta.concrete_fields:
+            if not isinstance(field, models.ForeignKey):
+                continue
+            target = field.remote_field.model
+            target_field = field.target_field.attname
+            broken = model._base_manager.filter(**{f'{field.attname}__isnull': False}).filter(
+                ~Exists(target._base_manager.filter(**{target_field: OuterRef(field.attname)}))
+            )
+            count = broken.count()
+            if not count:
+                continue
+
+            fix = None
+            if field.null:
+                def null_broken_fks(broken=broken, field=field):
+                    return broken.update(**{field.attname: None})
+                fix = null_broken_fks
+            label = f'{model._meta.label}.{field.name} -> {target._meta.label}'
+            yield Problem('fk', label, count, fix, '' if fix else 'no nulable: revisar a mano')
+
+
+# ========== CAMPOS JSON ==========
+
+def _expected_json_type(field):
+    return 'array' if field.default is list else 'object'
+
+
+def _coerce_json(value, expected):
+    """Convertir valores guardados como texto JSON (json.dumps) al tipo esperado"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = None
+    python_type = list if expected == 'array' else dict
+    return value if isinstance(value, python_type) else python_type()
+
+
+def check_json_fields():
+    """
+    JSONField con un tipo distinto al esperado (ej. texto en lugar de objeto,
+    como dejaba find_broken_references.py). Una consulta por campo; el arreglo
+    decodifica el texto y guarda con bulk_update.
+    """
+    for model in _models():
+        for field in model._meta.concrete_fields:
+            if not isinstance(field, models.JSONField):
+                continue
+            expected = _expected_json_type(field)
+            broken = (
+                model._base_manager.annotate(_json_type=JSONType(field.attname))
+                .exclude(_json_type=expected)
+                .order_by()
+            )
+            count = broken.count()
+            if not count:
+                continue
+
+            def fix(broken=broken, model=model, field=field, expected=expected):
+                fixed = 0
+                rows = broken.values_list('pk', field.attname)
+                objects = [
+                    model(**{'pk': pk, field.attname: _coerce_json(value, expected)})
+                    for pk, value in rows.iterator(chunk_size=CHUNK_SIZE)
+                ]
+                for start in range(0, len(objects), CHUNK_SIZE):
+                    chunk = objects[start:start + CHUNK_SIZE]
+                    model._base_manager.bulk_update(chunk, [field.attname])
+                    fixed += len(chunk)
+                return fixed
+
+            yield Problem('json', f'{model._meta.label}.{field.name} (se esperaba {expected})', count, fix)
+
+
+# ========== ARCHIVOS ==========
+
+def check_files(root=None):
+    """
+    FileField que apuntan a archivos inexistentes. Un solo recorrido del disco
+    (os.scandir) y una consulta en streaming por campo.
+    Solo se arreglan los campos opcionales (se vacían con UPDATE por bloques).
+    """
+    root = root or settings.MEDIA_ROOT
+    existing = {relative for relative, _ in iter_media_files(root)}
+    for model, name in file_fields():
+        field = model._meta.get_field(name)
+        rows = (
+            model._base_manager.exclude(**{name: ''})
+            .exclude(**{f'{name}__isnull': True})
+            .order_by()
+            .values_list('pk', name)
+        )
+        missing = [
+            pk for pk, value in rows.iterator(chunk_size=CHUNK_SIZE)
+            if normalize_media_path(value) not in existing
+        ]
+        if not missing:
+            continue
+
+        fix = None
+        if field.blank:
+            def clear_missing_files(model=model, name=name, missing=missing):
+                fixed = 0
+                for start in range(0, len(missing), CHUNK_SIZE):
+                    fixed += model._base_manager.filter(pk__in=missing[start:start + CHUNK_SIZE]).update(**{name: ''})
+                return fixed
+            fix = clear_missing_files
+        label = f'{model._meta.label}.{name}'
+        yield Problem('files', label, len(missing), fix, '' if fix else 'campo obligatorio: revisar a mano')
+
+
+CHECKS = {
+    'fk': check_foreign_keys,
+    'json': check_json_fields,
+    'files': check_files,
+}
+
+
+def run_checks(checks=None, fix=False):
+    """
+    Ejecutar las comprobaciones indicadas (todas por defecto).
+    Con fix=True aplica los arreglos posibles, cada uno en su transacción.
+    Devuelve una lista de (Problem, filas_arregladas).
+    """
+    results = []
+    for name in checks or CHECKS:
+        for problem in CHECKS[name]():
+            fixed = 0
+            if fix and problem.fixable:
+                with transaction.atomic():
+                    fixed = problem.fix()
+            results.append((problem, fixed))
+    return results
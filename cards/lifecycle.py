@@ -0,0 +1,81 @@
+# backend/cards/lifecycle.py
+from collections import Counter
+from django.db import transaction
+from django.utils import timezone
+from companies.generations import bump_generations
+from companies.stats import record_card_status_change
+from companies.webhooks import STATUS_EVENTS, queue_card_events, webhook_cards
+from .models import CardStatusTransition, IDCard
+
+
+def cards_to_expire(today=None):
+    """Tarjetas activas con fecha de expiración pasada (índice parcial idcard_active_expiration_idx)"""
+    today = today or timezone.localdate()
+    return IDCard.objects.filter(status='active', expiration_date__lt=today)
+
+
+def apply_status_transition(rows, new_status, reason, changed_by=None):
+    """
+    Cambiar el estado de un bloque de tarjetas con un solo UPDATE.
+    `rows` es una lista de tuplas (pk, company_id, status_actual).
+    Registra el historial, marca las tarjetas para regenerar, ajusta las
+    estadísticas por empresa, encola los webhooks e invalida la caché de
+    respuestas. Debe llamarse dentro de
+    una transacción.
+    """
+    rows = [row for row in rows if row[2] != new_status]
+    if not rows:
+        return 0
+
+    pks = [pk for pk, _, _ in rows]
+    updated = IDCard.objects.filter(pk__in=pks).exclude(status=new_status).update(
+        status=new_status,
+        render_pending=True,
+        updated_at=timezone.now(),
+    )
+
+    CardStatusTransition.objects.bulk_create([
+        CardStatusTransition(
+            card_id=pk,
+            company_id=company_id,
+            from_status=old_status,
+            to_status=new_status,
+            reason=reason,
+            changed_by=changed_by,
+        )
+        for pk, company_id, old_status in rows
+    ])
+
+    per_company = Counter((company_id, old_status) for _, company_id, old_status in rows)
+    for (company_id, old_status), count in per_company.items():
+        record_card_status_change(company_id, old_status, new_status, count)
+
+    queue_card_events(
+        STATUS_EVENTS.get(new_status, 'card.updated'),
+        webhook_cards(IDCard.objects.filter(pk__in=pks)),
+    )
+    bump_generations({company_id for _, company_id, _ in rows})
+    return updated
+
+
+def expire_cards(today=None, chunk_size=1000, dry_run=False):
+    """
+    Pasar a 'expired' todas las tarjetas activas vencidas, por bloques.
+    Devuelve el número de tarjetas expiradas (o por expirar si dry_run).
+    """
+    queryset = cards_to_expire(today)
+    if dry_run:
+        return queryset.count()
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.order_by()
+                .select_for_update(skip_locked=True)
+                .values_list('pk', 'company_id', 'status')[:chunk_size]
+            )
+            if not rows:
+                break
+            total += apply_status_transition(rows, 'expired', reason='expiration')
+    return total
@@ -0,0 +1,48 @@
+# backend/cards/management/commands/check_integrity.py
+import time
+from django.core.management.base import BaseCommand
+from cards.integrity import CHECKS, run_checks
+
+class Command(BaseCommand):
+    help = (
+        'Comprueba la integridad de los datos con consultas de conjunto: claves foráneas rotas, '
+        'campos JSON con tipo incorrecto y FileField que apuntan a archivos inexistentes. '
+        'Reemplaza a find_broken_references.py.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='append',
+            choices=list(CHECKS),
+            dest='checks',
+            help='Comprobación a ejecutar (repetible); por defecto todas'
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Arreglar lo que se pueda con UPDATE masivos (FK nulables a NULL, JSON decodificado, archivos opcionales vacíos)'
+        )
+    
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        results = run_checks(options['checks'], fix=options['fix'])
+        
+        for problem, fixed in results:
+            line = f'❌ [{problem.check}] {problem.label}: {problem.count} filas'
+            if fixed:
+                line += f' ({fixed} arregladas)'
+            elif problem.detail:
+                line += f' ({problem.detail})'
+            self.stdout.write(line)
+        
+        elapsed = round(time.monotonic() - start, 2)
+        if not results:
+            self.stdout.write(self.style.SUCCESS(f'✅ Sin problemas de integridad ({elapsed}s).'))
+            return
+        
+        pending = sum(problem.count - fixed for problem, fixed in results)
+        if pending:
+            self.stdout.write(self.style.WARNING(f'{pending} filas con problemas pendientes ({elapsed}s).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Todos los problemas arreglados ({elapsed}s).'))
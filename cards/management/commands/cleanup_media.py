@@ -0,0 +1,72 @@
+# backend/cards/management/commands/cleanup_media.py
+import time
+from django.core.management.base import BaseCommand
+from cards.media_gc import delete_media_files, find_orphaned_media
+
+class Command(BaseCommand):
+    help = (
+        'Busca archivos en MEDIA_ROOT que no referencia ningún FileField '
+        '(vistas previas, códigos de barras y PDFs viejos, exportaciones) y los borra por lotes.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar los archivos que se borrarían'
+        )
+        parser.add_argument(
+            '--older-than',
+            type=float,
+            default=1,
+            help='Solo archivos con más de N días (por defecto 1)'
+        )
+        parser.add_argument(
+            '--directory',
+            action='append',
+            dest='directories',
+            help='Limitar a una carpeta de MEDIA_ROOT (repetible), ej: --directory batch_pdfs'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Archivos borrados por lote'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.5,
+            help='Segundos de pausa entre lotes (para no saturar el disco)'
+        )
+    
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+        orphans = find_orphaned_media(
+            older_than_seconds=options['older_than'] * 86400,
+            directories=options['directories'],
+        )
+        
+        found = deleted = total_bytes = 0
+        batch = []
+        for path, size in orphans:
+            found += 1
+            total_bytes += size
+            if dry_run:
+                self.stdout.write(f'  {path} ({size} bytes)')
+                continue
+            batch.append(path)
+            if len(batch) >= batch_size:
+                deleted += delete_media_files(batch)
+                batch = []
+                self.stdout.write(f'  {deleted} archivos borrados...')
+                time.sleep(options['sleep'])
+        if batch:
+            deleted += delete_media_files(batch)
+        
+        size_mb = round(total_bytes / (1024 * 1024), 2)
+        if dry_run:
+            self.stdout.write(f'{found} archivos sin referencia ({size_mb} MB) se borrarían.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{deleted} archivos sin referencia borrados ({size_mb} MB).'))
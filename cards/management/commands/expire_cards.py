@@ -0,0 +1,48 @@
+# backend/cards/management/commands/expire_cards.py
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from cards.lifecycle import expire_cards
+from companies.stats import prune_daily_stats
+
+class Command(BaseCommand):
+    help = (
+        'Pasa a "expired" las tarjetas activas con fecha de expiración vencida. '
+        'Pensado para ejecutarse a diario (cron), ej: 5 0 * * * python manage.py expire_cards'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Fecha de referencia YYYY-MM-DD (por defecto hoy)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Tarjetas por bloque/transacción'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar cuántas tarjetas expirarían'
+        )
+    
+    def handle(self, *args, **options):
+        today = None
+        if options.get('date'):
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Fecha inválida, usa el formato YYYY-MM-DD')
+        
+        total = expire_cards(today=today, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        
+        if options['dry_run']:
+            self.stdout.write(f'{total} tarjetas expirarían.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{total} tarjetas marcadas como expiradas.'))
+            # Misma tarea diaria: la tabla de estadísticas por día no crece sin límite
+            pruned = prune_daily_stats(today)
+            if pruned:
+                self.stdout.write(f'{pruned} días de estadísticas fuera de retención borrados.')
@@ -1,5 +1,6 @@
 # backend/cards/management/commands/export_cr80_pdf.py
 from django.core.management.base import BaseCommand
+from cards.progress import ProgressTracker
 from cards.utils import export_cards_to_pdf_batch
 
 class Command(BaseCommand):
@@ -25,7 +26,11 @@ class Command(BaseCommand):
         if card_ids_str:
             card_ids = [cid.strip() for cid in card_ids_str.split(',')]
         
-        pdf_files = export_cards_to_pdf_batch(card_ids, output_dir)
+        # Visible en /api/cards/progress/<id>/ si la caché es compartida (solo superusuarios)
+        progress = ProgressTracker('export_cr80_pdf', total=0)
+        self.stdout.write(f'Progreso: {progress.id}')
+        
+        pdf_files = export_cards_to_pdf_batch(card_ids, output_dir, progress=progress)
         
         self.stdout.write(self.style.SUCCESS(
             f'\n🎯 INSTRUCCIONES DE IMPRESIÓN:\n'
@@ -0,0 +1,26 @@
+# backend/cards/management/commands/render_pending_cards.py
+from django.core.management.base import BaseCommand
+from cards.render_queue import process_render_queue
+
+class Command(BaseCommand):
+    help = 'Regenera vista previa/PDF de las tarjetas en cola (render_pending)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Máximo de tarjetas a procesar'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100,
+            help='Tarjetas por bloque'
+        )
+    
+    def handle(self, *args, **options):
+        processed, failed = process_render_queue(
+            limit=options.get('limit'),
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{processed} tarjetas regeneradas, {failed} con error.'))
@@ -0,0 +1,73 @@
+# backend/cards/management/commands/rerender_stale.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from cards.models import CardTemplate, RerenderRun
+from cards.rerender import process_rerender_run, stale_summary, start_rerender
+from companies.models import Company
+
+class Command(BaseCommand):
+    help = 'Regenera por bloques las tarjetas con archivos de una versión vieja de su plantilla'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            help='ID de la empresa (por defecto todas)'
+        )
+        parser.add_argument(
+            '--template',
+            help='ID de la plantilla'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.RERENDER_CHUNK_SIZE,
+            help='Tarjetas por bloque (se guarda el avance tras cada uno)'
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            help='Bloques a procesar en esta ejecución; el resto queda para la siguiente'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Retomar todas las regeneraciones en curso en lugar de crear una'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo contar las tarjetas desactualizadas'
+        )
+    
+    def handle(self, *args, **options):
+        company = template = None
+        try:
+            if options.get('company'):
+                company = Company.objects.get(pk=options['company'])
+            if options.get('template'):
+                template = CardTemplate.objects.get(pk=options['template'])
+        except (Company.DoesNotExist, CardTemplate.DoesNotExist, ValueError) as e:
+            raise CommandError(str(e))
+        
+        if options['dry_run']:
+            summary = stale_summary(company.pk if company else None, template.pk if template else None)
+            by_status = ', '.join(f'{key}: {value}' for key, value in summary['by_status'].items())
+            self.stdout.write(f"{summary['total']} tarjetas desactualizadas{f' ({by_status})' if by_status else ''}.")
+            return
+        
+        if options['resume']:
+            runs = list(RerenderRun.objects.filter(status='running').order_by('created_at'))
+            if not runs:
+                self.stdout.write('No hay regeneraciones en curso.')
+                return
+        else:
+            run, created = start_rerender(company, template, chunk_size=options['chunk_size'])
+            if not created:
+                self.stdout.write(f'Retomando la regeneración {run.pk}.')
+            runs = [run]
+        
+        for run in runs:
+            run = process_rerender_run(run.pk, max_chunks=options.get('max_chunks'))
+            self.stdout.write(self.style.SUCCESS(
+                f'{run}: {run.processed_cards} regeneradas, {run.failed_cards} con error, {run.chunks_done} bloques.'
+            ))
@@ -0,0 +1,92 @@
+# backend/cards/media_gc.py
+import os
+import time
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+
+
+def normalize_media_path(name):
+    """Ruta relativa a MEDIA_ROOT tal como la guarda un FileField"""
+    name = name.replace('\\', '/')
+    if name.startswith('media/'):
+        name = name[len('media/'):]  # generate_card_pdf guardaba rutas con el prefijo
+    return os.path.normpath(name).replace('\\', '/')
+
+
+def file_fields():
+    """(modelo, nombre de campo) de todos los FileField/ImageField del proyecto"""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field.name
+
+
+def referenced_media_paths(chunk_size=5000):
+    """
+    Conjunto de rutas referenciadas por la base de datos.
+    Una consulta en streaming por FileField (solo la columna del archivo).
+    """
+    referenced = set()
+    for model, name in file_fields():
+        queryset = (
+            model._base_manager.exclude(**{name: ''})
+            .exclude(**{f'{name}__isnull': True})
+            .order_by()
+            .values_list(name, flat=True)
+        )
+        for value in queryset.iterator(chunk_size=chunk_size):
+            referenced.add(normalize_media_path(value))
+    return referenced
+
+
+def iter_media_files(root, directory=''):
+    """Recorrer MEDIA_ROOT con os.scandir (sin cargar listas completas en memoria)"""
+    path = os.path.join(root, directory)
+    try:
+        entries = os.scandir(path)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            relative = f'{directory}/{entry.name}' if directory else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_media_files(root, relative)
+            elif entry.is_file(follow_symlinks=False):
+                yield relative, entry
+
+
+def find_orphaned_media(older_than_seconds=86400, directories=None, root=None):
+    """
+    Archivos bajo MEDIA_ROOT que ningún FileField referencia: copias viejas
+    de barcodes/, composite_cards/, card_pdfs/... y las exportaciones de
+    batch_pdfs/ e impresion/, que ningún modelo guarda.
+    Solo se consideran archivos más viejos que `older_than_seconds`, para no
+    tocar archivos recién escritos cuya referencia aún no se ha guardado.
+    Devuelve un generador de (ruta_relativa, tamaño).
+    """
+    root = root or settings.MEDIA_ROOT
+    referenced = referenced_media_paths()
+    cutoff = time.time() - older_than_seconds
+
+    for directory in directories or ['']:
+        for relative, entry in iter_media_files(root, directory.strip('/')):
+            if relative in referenced:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                continue
+            yield relative, stat.st_size
+
+
+def delete_media_files(paths, root=None):
+    """Borrar archivos (rutas relativas a MEDIA_ROOT); devuelve cuántos se borraron"""
+    root = root or settings.MEDIA_ROOT
+    deleted = 0
+    for relative in paths:
+        try:
+            os.remove(os.path.join(root, relative))
+            deleted += 1
+        except FileNotFoundError:
+            pass
+    return deleted
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_alter_idcard_barcode_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idcard',
+            name='media_bytes',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Bytes en disco'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_idcard_media_bytes'),
+        ('companies', '0003_company_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='idcard',
+            index=models.Index(fields=['created_at', 'id'], name='cards_idcar_created_f2ea4d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='idcard',
+            index=models.Index(fields=['company', 'created_at', 'id'], name='cards_idcar_company_bbc2d5_idx'),
+        ),
+    ]
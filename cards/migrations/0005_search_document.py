@@ -0,0 +1,73 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:39
+
+import unicodedata
+from django.db import migrations, models
+
+
+def _normalize(*values):
+    text = ' '.join(str(value) for value in values if value)
+    decomposed = unicodedata.normalize('NFKD', text)
+    without_accents = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(without_accents.lower().split())
+
+
+def backfill_search_documents(apps, schema_editor):
+    sources = {
+        'CardTemplate': ['name', 'description'],
+        'IDCard': ['person_name', 'card_number', 'id_number', 'employee_id', 'department'],
+    }
+    for model_name, fields in sources.items():
+        model = apps.get_model('cards', model_name)
+        batch = []
+        for obj in model.objects.only('pk', *fields).iterator(chunk_size=2000):
+            obj.search_document = _normalize(*(getattr(obj, field) for field in fields))
+            batch.append(obj)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['search_document'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['search_document'])
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Solo PostgreSQL: en SQLite la búsqueda funciona sin índice
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS cards_idcard_search_trgm '
+        'ON cards_idcard USING gin (search_document gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS cards_cardtemplate_search_trgm '
+        'ON cards_cardtemplate USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS cards_idcard_search_trgm')
+    schema_editor.execute('DROP INDEX IF EXISTS cards_cardtemplate_search_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0004_idcard_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardtemplate',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='idcard',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0005_search_document'),
+        ('companies', '0003_company_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardStatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('draft', 'Borrador'), ('active', 'Activa'), ('expired', 'Expirada'), ('revoked', 'Revocada'), ('lost', 'Perdida'), ('damaged', 'Dañada')], max_length=20, verbose_name='Estado anterior')),
+                ('to_status', models.CharField(choices=[('draft', 'Borrador'), ('active', 'Activa'), ('expired', 'Expirada'), ('revoked', 'Revocada'), ('lost', 'Perdida'), ('damaged', 'Dañada')], max_length=20, verbose_name='Estado nuevo')),
+                ('reason', models.CharField(choices=[('manual', 'Cambio manual'), ('expiration', 'Expiración automática'), ('bulk', 'Actualización masiva')], default='manual', max_length=20, verbose_name='Motivo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+            ],
+            options={
+                'verbose_name': 'Cambio de estado',
+                'verbose_name_plural': 'Cambios de estado',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='idcard',
+            name='render_pending',
+            field=models.BooleanField(default=False, editable=False, help_text='En cola para regenerar vista previa/PDF (ver cards/render_queue.py)', verbose_name='Pendiente de regenerar'),
+        ),
+        migrations.AddIndex(
+            model_name='idcard',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['expiration_date'], name='idcard_active_expiration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='idcard',
+            index=models.Index(condition=models.Q(('render_pending', True)), fields=['created_at'], name='idcard_render_pending_idx'),
+        ),
+        migrations.AddField(
+            model_name='cardstatustransition',
+            name='card',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_transitions', to='cards.idcard'),
+        ),
+        migrations.AddField(
+            model_name='cardstatustransition',
+            name='changed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='card_status_transitions', to=settings.AUTH_USER_MODEL, verbose_name='Cambiado por'),
+        ),
+        migrations.AddField(
+            model_name='cardstatustransition',
+            name='company',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='card_status_transitions', to='companies.company'),
+        ),
+        migrations.AddIndex(
+            model_name='cardstatustransition',
+            index=models.Index(fields=['card', 'created_at'], name='cards_cards_card_id_e369c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cardstatustransition',
+            index=models.Index(fields=['company', 'created_at'], name='cards_cards_company_2f2823_idx'),
+        ),
+    ]
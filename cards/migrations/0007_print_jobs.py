@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:45
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0006_card_lifecycle'),
+        ('companies', '0003_company_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrintJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('printer_name', models.CharField(blank=True, max_length=100, verbose_name='Impresora')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('rendered', 'Documento generado'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20, verbose_name='Estado')),
+                ('document', models.FileField(blank=True, null=True, upload_to='print_jobs/', verbose_name='Documento PDF')),
+                ('total_cards', models.PositiveIntegerField(default=0, verbose_name='Tarjetas')),
+                ('printed_cards', models.PositiveIntegerField(default=0, verbose_name='Impresas')),
+                ('failed_cards', models.PositiveIntegerField(default=0, verbose_name='Fallidas')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('cards', models.ManyToManyField(blank=True, related_name='print_jobs', to='cards.idcard', verbose_name='Tarjetas')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='print_jobs', to='companies.company')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='print_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Creado por')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de impresión',
+                'verbose_name_plural': 'Trabajos de impresión',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['company', 'created_at'], name='cards_print_company_b463e9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:49
+
+import hashlib
+import json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+VERSIONED_FIELDS = [
+    'width_mm', 'height_mm', 'corner_radius_mm', 'dpi',
+    'background_type', 'background_color', 'background_image', 'background_opacity',
+    'elements', 'fields_config', 'has_watermark', 'watermark_text',
+]
+
+
+def backfill_template_versions(apps, schema_editor):
+    CardTemplate = apps.get_model('cards', 'CardTemplate')
+    CardTemplateVersion = apps.get_model('cards', 'CardTemplateVersion')
+    IDCard = apps.get_model('cards', 'IDCard')
+    for template in CardTemplate.objects.iterator(chunk_size=500):
+        snapshot = {}
+        for name in VERSIONED_FIELDS:
+            value = getattr(template, name)
+            snapshot[name] = (value.name or '') if name == 'background_image' else value
+        payload = json.dumps(snapshot, sort_keys=True, separators=(',', ':'), default=str)
+        content_hash = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        template_version = CardTemplateVersion.objects.create(
+            template=template,
+            version=template.version,
+            content_hash=content_hash,
+            snapshot=snapshot,
+            created_by_id=template.created_by_id,
+        )
+        CardTemplate.objects.filter(pk=template.pk).update(
+            content_hash=content_hash, current_version=template_version
+        )
+        # Las tarjetas con archivos generados se consideran hechas con la versión actual
+        IDCard.objects.filter(template=template).exclude(composite_image='').exclude(composite_image__isnull=True).update(
+            template_version=template_version
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0007_print_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardtemplate',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='Hash del diseño'),
+        ),
+        migrations.CreateModel(
+            name='CardTemplateVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(verbose_name='Versión')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='Hash del diseño')),
+                ('snapshot', models.JSONField(verbose_name='Diseño')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Creado por')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='cards.cardtemplate')),
+            ],
+            options={
+                'verbose_name': 'Versión de plantilla',
+                'verbose_name_plural': 'Versiones de plantilla',
+                'ordering': ['template', '-version'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cardtemplate',
+            name='current_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cards.cardtemplateversion', verbose_name='Versión vigente'),
+        ),
+        migrations.AddField(
+            model_name='idcard',
+            name='template_version',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Versión del diseño con la que se generaron los archivos de la tarjeta', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cards', to='cards.cardtemplateversion', verbose_name='Versión de plantilla usada'),
+        ),
+        migrations.AddIndex(
+            model_name='cardtemplateversion',
+            index=models.Index(fields=['template', 'content_hash'], name='cards_cardt_templat_986d3c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cardtemplateversion',
+            unique_together={('template', 'version')},
+        ),
+        migrations.RunPython(backfill_template_versions, migrations.RunPython.noop),
+    ]
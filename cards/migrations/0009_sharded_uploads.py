@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:12
+
+import companies.uploads
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0008_template_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cardtemplate',
+            name='background_image',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to=companies.uploads.ShardedUploadTo('template_backgrounds'), verbose_name='Imagen de fondo'),
+        ),
+        migrations.AlterField(
+            model_name='idcard',
+            name='barcode_image',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to=companies.uploads.ShardedUploadTo('barcodes'), verbose_name='Imagen de código de barras'),
+        ),
+        migrations.AlterField(
+            model_name='idcard',
+            name='composite_image',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to=companies.uploads.ShardedUploadTo('composite_cards'), verbose_name='Imagen compuesta'),
+        ),
+        migrations.AlterField(
+            model_name='idcard',
+            name='pdf_file',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to=companies.uploads.ShardedUploadTo('card_pdfs'), verbose_name='Archivo PDF'),
+        ),
+        migrations.AlterField(
+            model_name='idcard',
+            name='photo',
+            field=models.ImageField(max_length=255, upload_to=companies.uploads.ShardedUploadTo('card_photos'), verbose_name='Fotografía'),
+        ),
+        migrations.AlterField(
+            model_name='idcard',
+            name='qr_code',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to=companies.uploads.ShardedUploadTo('qr_codes'), verbose_name='Código QR'),
+        ),
+        migrations.AlterField(
+            model_name='idcard',
+            name='signature',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to=companies.uploads.ShardedUploadTo('signatures'), verbose_name='Firma'),
+        ),
+        migrations.AlterField(
+            model_name='printjob',
+            name='document',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to=companies.uploads.ShardedUploadTo('print_jobs'), verbose_name='Documento PDF'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:05
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0009_sharded_uploads'),
+        ('companies', '0005_webhooks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RerenderRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('running', 'En curso'), ('completed', 'Completada'), ('cancelled', 'Cancelada'), ('failed', 'Fallida')], default='running', max_length=20, verbose_name='Estado')),
+                ('chunk_size', models.PositiveIntegerField(default=100, verbose_name='Tarjetas por bloque')),
+                ('total_cards', models.PositiveIntegerField(default=0, verbose_name='Desactualizadas al iniciar')),
+                ('processed_cards', models.PositiveIntegerField(default=0, verbose_name='Regeneradas')),
+                ('failed_cards', models.PositiveIntegerField(default=0, verbose_name='Con error')),
+                ('failed_card_ids', models.JSONField(blank=True, default=list, verbose_name='IDs con error')),
+                ('chunks_done', models.PositiveIntegerField(default=0, verbose_name='Bloques')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('checkpoint_at', models.DateTimeField(blank=True, null=True, verbose_name='Último punto de control')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+            ],
+            options={
+                'verbose_name': 'Regeneración de tarjetas',
+                'verbose_name_plural': 'Regeneraciones de tarjetas',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='idcard',
+            index=models.Index(fields=['template', 'template_version'], name='idcard_template_version_idx'),
+        ),
+        migrations.AddField(
+            model_name='rerenderrun',
+            name='company',
+            field=models.ForeignKey(blank=True, help_text='Vacío: todas las empresas', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rerender_runs', to='companies.company'),
+        ),
+        migrations.AddField(
+            model_name='rerenderrun',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rerender_runs', to=settings.AUTH_USER_MODEL, verbose_name='Creado por'),
+        ),
+        migrations.AddField(
+            model_name='rerenderrun',
+            name='template',
+            field=models.ForeignKey(blank=True, help_text='Vacío: todas las plantillas de la empresa', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rerender_runs', to='cards.cardtemplate'),
+        ),
+        migrations.AddIndex(
+            model_name='rerenderrun',
+            index=models.Index(fields=['status', 'created_at'], name='cards_reren_status_ed0da0_idx'),
+        ),
+    ]
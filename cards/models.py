@@ -1,8 +1,12 @@
 # backend/cards/models.py
+import hashlib
+import json
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from companies.models import Company
+from companies.uploads import ShardedUploadTo
+from .search import refresh_search_document
 
 class CardTemplate(models.Model):
     """Plantillas de diseño para tarjetas CR80"""
@@ -50,7 +54,8 @@ class CardTemplate(models.Model):
     )
     background_color = models.CharField(max_length=7, default='#FFFFFF', verbose_name="Color de fondo")
     background_image = models.ImageField(
-        upload_to='template_backgrounds/',
+        upload_to=ShardedUploadTo('template_backgrounds'),
+        max_length=255,
         null=True,
         blank=True,
         verbose_name="Imagen de fondo"
@@ -67,6 +72,21 @@ class CardTemplate(models.Model):
     # Configuración de campos
     fields_config = models.JSONField(default=dict, verbose_name="Configuración de campos")
     
+    # Búsqueda (texto normalizado de SEARCH_DOCUMENT_FIELDS, ver cards/search.py)
+    search_document = models.TextField(blank=True, default='', editable=False)
+    
+    # Versionado (hash del diseño y versión inmutable vigente, ver CardTemplateVersion)
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False, verbose_name="Hash del diseño")
+    current_version = models.ForeignKey(
+        'CardTemplateVersion',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        verbose_name="Versión vigente"
+    )
+    
     # Estado
     is_default = models.BooleanField(default=False, verbose_name="Plantilla predeterminada")
     is_active = models.BooleanField(default=True, verbose_name="Activa")
@@ -96,28 +116,106 @@ class CardTemplate(models.Model):
             models.Index(fields=['is_active']),
         ]
     
+    SEARCH_DOCUMENT_FIELDS = ['name', 'description']
+    
+    # Campos que definen cómo se dibuja la tarjeta (entran en content_hash)
+    VERSIONED_FIELDS = [
+        'width_mm', 'height_mm', 'corner_radius_mm', 'dpi',
+        'background_type', 'background_color', 'background_image', 'background_opacity',
+        'elements', 'fields_config', 'has_watermark', 'watermark_text',
+    ]
+    
     def __str__(self):
         return f"{self.company.name} - {self.name} (v{self.version})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        instance._loaded_is_default = instance.__dict__.get('is_default')
+        instance._loaded_content_hash = instance.__dict__.get('content_hash')
+        return instance
+    
+    def design_snapshot(self):
+        """Diseño de la plantilla como diccionario serializable"""
+        snapshot = {}
+        for name in self.VERSIONED_FIELDS:
+            value = getattr(self, name)
+            if name == 'background_image':
+                value = value.name or ''
+            snapshot[name] = value
+        return snapshot
+    
+    @staticmethod
+    def hash_snapshot(snapshot):
+        payload = json.dumps(snapshot, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
     def save(self, *args, **kwargs):
+        refresh_search_document(self, kwargs)
+        update_fields = kwargs.get('update_fields')
+        adding = self._state.adding
+        
         # Si se marca como default, quitar default de otras plantillas de la misma empresa
-        if self.is_default and self.company_id:
-            # Desmarcar otros templates como default
+        # (solo cuando is_default cambia a True)
+        if self.is_default and self.company_id and (adding or not getattr(self, '_loaded_is_default', False)):
             CardTemplate.objects.filter(
-                company=self.company, 
+                company_id=self.company_id,
                 is_default=True
             ).exclude(pk=self.pk).update(is_default=False)
         
-        # Incrementar versión si es una actualización (SOLO si ya tiene pk)
-        if self.pk:
-            try:
-                old_template = CardTemplate.objects.get(pk=self.pk)
-                if self.elements != old_template.elements or self.fields_config != old_template.fields_config:
-                    self.version += 1
-            except CardTemplate.DoesNotExist:
-                pass  # Es una nueva plantilla, no hay versión vieja
+        # Comparar el hash del diseño en lugar de volver a leer la fila
+        if update_fields is None or set(update_fields) & set(self.VERSIONED_FIELDS):
+            with transaction.atomic():
+                self._save_versioned(adding, *args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._loaded_is_active = self.is_active
+        self._loaded_is_default = self.is_default
+        self._loaded_content_hash = self.content_hash
+    
+    def _save_versioned(self, adding, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Subir antes los archivos nuevos: el hash debe llevar la ruta guardada, no el nombre del cliente
+        field = self._meta.get_field('background_image')
+        if self.background_image and not self.background_image._committed:
+            field.pre_save(self, adding)
+        
+        snapshot = self.design_snapshot()
+        content_hash = self.hash_snapshot(snapshot)
+        if content_hash == self.content_hash:
+            snapshot = None
+        else:
+            if not adding and self.content_hash:
+                # Bloquear la fila: dos ediciones simultáneas no comparten número de versión
+                locked = CardTemplate.objects.select_for_update().only('version', 'content_hash').get(pk=self.pk)
+                if locked.content_hash == content_hash:
+                    snapshot = None
+                    self.version = locked.version
+                else:
+                    self.version = locked.version + 1
+            self.content_hash = content_hash
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_hash', 'version'}
         
         super().save(*args, **kwargs)
+        if snapshot is not None:
+            self.record_version(snapshot)
+    
+    def record_version(self, snapshot):
+        """Guardar una versión inmutable del diseño y marcarla como vigente"""
+        template_version, _ = CardTemplateVersion.objects.get_or_create(
+            template=self,
+            version=self.version,
+            defaults={
+                'content_hash': self.content_hash,
+                'snapshot': snapshot,
+                'created_by_id': self.created_by_id,
+            },
+        )
+        CardTemplate.objects.filter(pk=self.pk).update(current_version=template_version)
+        self.current_version = template_version
+        return template_version
     
     @property
     def width_px(self):
@@ -129,6 +227,36 @@ class CardTemplate(models.Model):
         """Convertir mm a píxeles según DPI"""
         return int((self.height_mm / 25.4) * self.dpi)
     
+class CardTemplateVersion(models.Model):
+    """Versión inmutable del diseño de una plantilla (una fila por cambio de diseño)"""
+    
+    template = models.ForeignKey(CardTemplate, on_delete=models.CASCADE, related_name='versions')
+    version = models.PositiveIntegerField(verbose_name="Versión")
+    content_hash = models.CharField(max_length=64, verbose_name="Hash del diseño")
+    snapshot = models.JSONField(verbose_name="Diseño")
+    created_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Creado por"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    
+    class Meta:
+        verbose_name = "Versión de plantilla"
+        verbose_name_plural = "Versiones de plantilla"
+        unique_together = ['template', 'version']
+        ordering = ['template', '-version']
+        indexes = [
+            models.Index(fields=['template', 'content_hash']),
+        ]
+    
+    def __str__(self):
+        return f"{self.template_id} v{self.version} ({self.content_hash[:8]})"
+
+
 # backend/cards/models.py  
 class IDCard(models.Model):
     """Tarjeta de identificación individual"""
@@ -154,6 +282,16 @@ class IDCard(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='cards')
     template = models.ForeignKey(CardTemplate, on_delete=models.PROTECT, related_name='cards')
+    template_version = models.ForeignKey(
+        CardTemplateVersion,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='cards',
+        verbose_name="Versión de plantilla usada",
+        help_text="Versión del diseño con la que se generaron los archivos de la tarjeta"
+    )
     
     # Número único de tarjeta
     card_number = models.CharField(
@@ -174,8 +312,8 @@ class IDCard(models.Model):
     id_type = models.CharField(max_length=50, default='employee', verbose_name="Tipo de ID")
     
     # Fotos y gráficos
-    photo = models.ImageField(upload_to='card_photos/', verbose_name="Fotografía")
-    signature = models.ImageField(upload_to='signatures/', null=True, blank=True, verbose_name="Firma")
+    photo = models.ImageField(upload_to=ShardedUploadTo('card_photos'), max_length=255, verbose_name="Fotografía")
+    signature = models.ImageField(upload_to=ShardedUploadTo('signatures'), max_length=255, null=True, blank=True, verbose_name="Firma")
     
     # Códigos
     BARCODE_TYPES = [
@@ -187,11 +325,12 @@ class IDCard(models.Model):
     barcode_type = models.CharField(max_length=20, choices=BARCODE_TYPES, default='code128')
     barcode_data = models.CharField(max_length=100, verbose_name="Datos para código de barras")
     barcode_image = models.ImageField(
-                                       upload_to='barcodes/', 
+                                       upload_to=ShardedUploadTo('barcodes'),
+                                       max_length=255,
                                        null=True,           # Permite NULL en la base de datos
                                        blank=True,          # Permite campo vacío en formularios
                                        verbose_name="Imagen de código de barras")
-    qr_code = models.ImageField(upload_to='qr_codes/', null=True, blank=True, verbose_name="Código QR")
+    qr_code = models.ImageField(upload_to=ShardedUploadTo('qr_codes'), max_length=255, null=True, blank=True, verbose_name="Código QR")
     
     # Fechas
     issue_date = models.DateField(auto_now_add=True, verbose_name="Fecha de emisión")
@@ -215,17 +354,25 @@ class IDCard(models.Model):
 
     # Archivos generados
     composite_image = models.ImageField(
-        upload_to='composite_cards/',
+        upload_to=ShardedUploadTo('composite_cards'),
+        max_length=255,
         null=True,
         blank=True,
         verbose_name="Imagen compuesta"
     )
     pdf_file = models.FileField(
-        upload_to='card_pdfs/',
+        upload_to=ShardedUploadTo('card_pdfs'),
+        max_length=255,
         null=True,
         blank=True,
         verbose_name="Archivo PDF"
     )
+    render_pending = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Pendiente de regenerar",
+        help_text="En cola para regenerar vista previa/PDF (ver cards/render_queue.py)"
+    )
     
     # Auditoría
     created_by = models.ForeignKey(
@@ -239,9 +386,15 @@ class IDCard(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
     last_accessed = models.DateTimeField(null=True, blank=True, verbose_name="Último acceso")
     
+    # Tamaño en disco de los archivos de la tarjeta (ver companies/stats.py)
+    media_bytes = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Bytes en disco")
+    
     # Metadata adicional
     metadata = models.JSONField(default=dict, blank=True, verbose_name="Metadatos adicionales")
     
+    # Búsqueda (texto normalizado de SEARCH_DOCUMENT_FIELDS, ver cards/search.py)
+    search_document = models.TextField(blank=True, default='', editable=False)
+    
     class Meta:
         verbose_name = "Tarjeta de identificación"
         verbose_name_plural = "Tarjetas de identificación"
@@ -251,18 +404,55 @@ class IDCard(models.Model):
             models.Index(fields=['company', 'status']),
             models.Index(fields=['expiration_date']),
             models.Index(fields=['created_at']),
+            # Paginación por llave (created_at, id), ver config/pagination.py
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['company', 'created_at', 'id']),
+            # Índices parciales: solo las filas que interesan a los procesos por lotes
+            models.Index(
+                fields=['expiration_date'],
+                condition=models.Q(status='active'),
+                name='idcard_active_expiration_idx'
+            ),
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(render_pending=True),
+                name='idcard_render_pending_idx'
+            ),
+            # Tarjetas con archivos de una versión vieja de su plantilla (cards/rerender.py)
+            models.Index(fields=['template', 'template_version'], name='idcard_template_version_idx'),
         ]
         ordering = ['-created_at']
     
+    SEARCH_DOCUMENT_FIELDS = ['person_name', 'card_number', 'id_number', 'employee_id', 'department']
+    
+    # Datos que se envían en los webhooks (companies/webhooks.py)
+    WEBHOOK_FIELDS = [
+        'card_number', 'person_name', 'id_number', 'employee_id', 'department',
+        'card_type', 'status', 'valid_from', 'expiration_date', 'printed', 'printed_at',
+    ]
+    
     def __str__(self):
         return f"{self.card_number} - {self.person_name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recordar el estado leído para detectar cambios sin otra consulta
+        instance._loaded_status = instance.__dict__.get('status')
+        if 'barcode_data' in instance.__dict__ and 'barcode_type' in instance.__dict__:
+            instance._loaded_barcode = (instance.barcode_data, instance.barcode_type)
+        instance._loaded_webhook = instance.webhook_snapshot()
+        return instance
+    
     def save(self, *args, **kwargs):
-        """Guardar tarjeta """
-        from django.db import transaction
-        from .utils import generate_barcode_image
+        """
+        Guardar tarjeta. La transacción solo incluye el INSERT/UPDATE:
+        código de barras, QR y vista previa se generan después del commit
+        (ver cards/assets.py).
+        """
+        from .assets import assets_to_generate, schedule_card_assets
         
-        is_new = self.pk is None  # Verificar si es nueva tarjeta
+        is_new = self._state.adding  # Verificar si es nueva tarjeta
         
         # Generar número de tarjeta si no se proporciona y es nueva
         if is_new and not self.card_number:
@@ -275,30 +465,32 @@ class IDCard(models.Model):
         if not self.barcode_data:
             self.barcode_data = self.id_number or self.card_number
         
-        # Guardar primero (esto crea el ID si es nuevo)
-        with transaction.atomic():
-            super().save(*args, **kwargs)
-            
-            # Generar código de barras si no existe
-            if not self.barcode_image and self.barcode_data:
-                try:
-                    barcode_file = generate_barcode_image(self.barcode_data, self.barcode_type)
-                    # Usar update para evitar otro save() dentro de la transacción
-                    IDCard.objects.filter(pk=self.pk).update(
-                        barcode_image=barcode_file
-                    )
-                    # Refrescar el objeto
-                    self.refresh_from_db()
-                except Exception as e:
-                    print(f"Error generando código de barras: {e}")
-            
-            # Generar vista previa DESPUÉS de la transacción principal
-            # Esto se hará en una señal o manualmente
+        refresh_search_document(self, kwargs)
+        
+        super().save(*args, **kwargs)
+        # Las señales post_save ya vieron el estado anterior
+        self._loaded_status = self.__dict__.get('status')
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & {'barcode_data', 'barcode_type', 'card_number'}:
+            schedule_card_assets(self.pk, assets_to_generate(self, created=is_new))
+        self._loaded_barcode = (self.barcode_data, self.barcode_type)
+        self._loaded_webhook = self.webhook_snapshot()
+    
+    def webhook_snapshot(self):
+        """Valores de WEBHOOK_FIELDS cargados (sin consultar los diferidos)"""
+        return tuple(self.__dict__.get(name) for name in self.WEBHOOK_FIELDS)
 
+    def pin_template_version(self):
+        """Fijar la versión vigente de la plantilla (llamar al generar los archivos)"""
+        self.template_version_id = self.template.current_version_id if self.template_id else None
+    
     @property
     def is_expired(self):
         """Verificar si la tarjeta ha expirado"""
         from datetime import date
+        if self.status == 'expired':
+            return True
         if self.expiration_date:
             return self.expiration_date < date.today()
         return False
@@ -310,4 +502,161 @@ class IDCard(models.Model):
         if self.expiration_date:
             delta = self.expiration_date - date.today()
             return delta.days
-        return None
\ No newline at end of file
+        return None
+
+
+class CardStatusTransition(models.Model):
+    """Historial de cambios de estado de las tarjetas"""
+    
+    REASONS = [
+        ('manual', 'Cambio manual'),
+        ('expiration', 'Expiración automática'),
+        ('bulk', 'Actualización masiva'),
+    ]
+    
+    card = models.ForeignKey(IDCard, on_delete=models.CASCADE, related_name='status_transitions')
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='card_status_transitions')
+    from_status = models.CharField(max_length=20, choices=IDCard.STATUS_CHOICES, blank=True, verbose_name="Estado anterior")
+    to_status = models.CharField(max_length=20, choices=IDCard.STATUS_CHOICES, verbose_name="Estado nuevo")
+    reason = models.CharField(max_length=20, choices=REASONS, default='manual', verbose_name="Motivo")
+    changed_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='card_status_transitions',
+        verbose_name="Cambiado por"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    
+    class Meta:
+        verbose_name = "Cambio de estado"
+        verbose_name_plural = "Cambios de estado"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['card', 'created_at']),
+            models.Index(fields=['company', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.card_id}: {self.from_status} -> {self.to_status}"
+
+
+class PrintJob(models.Model):
+    """Trabajo de impresión: tarjetas enviadas juntas a una impresora"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('rendered', 'Documento generado'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='print_jobs')
+    cards = models.ManyToManyField(IDCard, related_name='print_jobs', blank=True, verbose_name="Tarjetas")
+    printer_name = models.CharField(max_length=100, blank=True, verbose_name="Impresora")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Estado")
+    document = models.FileField(upload_to=ShardedUploadTo('print_jobs'), max_length=255, null=True, blank=True, verbose_name="Documento PDF")
+    
+    # Rendimiento
+    total_cards = models.PositiveIntegerField(default=0, verbose_name="Tarjetas")
+    printed_cards = models.PositiveIntegerField(default=0, verbose_name="Impresas")
+    failed_cards = models.PositiveIntegerField(default=0, verbose_name="Fallidas")
+    
+    created_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='print_jobs',
+        verbose_name="Creado por"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Inicio")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    
+    class Meta:
+        verbose_name = "Trabajo de impresión"
+        verbose_name_plural = "Trabajos de impresión"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['company', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.printer_name or 'Impresora'} - {self.total_cards} tarjetas ({self.get_status_display()})"
+    
+    @property
+    def duration(self):
+        """Duración en segundos desde el inicio hasta el fin"""
+        if not self.started_at or not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+    
+    @property
+    def cards_per_minute(self):
+        """Tarjetas impresas por minuto (para planificar capacidad)"""
+        duration = self.duration
+        if not duration:
+            return None
+        return round(self.printed_cards * 60 / duration, 2)
+
+
+class RerenderRun(models.Model):
+    """
+    Regeneración por bloques de las tarjetas con archivos de una versión
+    vieja de su plantilla. Cada bloque guarda el avance (punto de control):
+    si el proceso se corta, se retoma donde quedó (cards/rerender.py).
+    """
+    
+    STATUS_CHOICES = [
+        ('running', 'En curso'),
+        ('completed', 'Completada'),
+        ('cancelled', 'Cancelada'),
+        ('failed', 'Fallida'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(
+        Company, on_delete=models.CASCADE, null=True, blank=True, related_name='rerender_runs',
+        help_text="Vacío: todas las empresas"
+    )
+    template = models.ForeignKey(
+        CardTemplate, on_delete=models.CASCADE, null=True, blank=True, related_name='rerender_runs',
+        help_text="Vacío: todas las plantillas de la empresa"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running', verbose_name="Estado")
+    chunk_size = models.PositiveIntegerField(default=100, verbose_name="Tarjetas por bloque")
+    
+    # Punto de control
+    total_cards = models.PositiveIntegerField(default=0, verbose_name="Desactualizadas al iniciar")
+    processed_cards = models.PositiveIntegerField(default=0, verbose_name="Regeneradas")
+    failed_cards = models.PositiveIntegerField(default=0, verbose_name="Con error")
+    failed_card_ids = models.JSONField(default=list, blank=True, verbose_name="IDs con error")
+    chunks_done = models.PositiveIntegerField(default=0, verbose_name="Bloques")
+    last_error = models.TextField(blank=True, verbose_name="Último error")
+    
+    created_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='rerender_runs',
+        verbose_name="Creado por"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    checkpoint_at = models.DateTimeField(null=True, blank=True, verbose_name="Último punto de control")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    
+    class Meta:
+        verbose_name = "Regeneración de tarjetas"
+        verbose_name_plural = "Regeneraciones de tarjetas"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        scope = self.template or self.company or 'Todas las empresas'
+        return f"{scope}: {self.processed_cards}/{self.total_cards} ({self.get_status_display()})"
@@ -0,0 +1,114 @@
+# backend/cards/printing.py
+import os
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from companies.generations import bump_queryset_generations
+from companies.webhooks import queue_card_events, webhook_cards
+from .models import IDCard, PrintJob
+
+
+def mark_cards_printed(queryset, user=None, printed_at=None):
+    """
+    Marcar tarjetas como impresas con un solo UPDATE.
+    El contador se incrementa en la base de datos (F), así que las
+    impresiones concurrentes no se pierden. Encola card.printed.
+    """
+    printed_at = printed_at or timezone.now()
+    with transaction.atomic():
+        cards = webhook_cards(queryset)
+        bump_queryset_generations(queryset)
+        updated = queryset.order_by().update(
+            printed=True,
+            printed_at=printed_at,
+            printed_by=user,
+            printed_count=F('printed_count') + 1,
+        )
+        queue_card_events('card.printed', cards, printed=True, printed_at=printed_at)
+    return updated
+
+
+def create_print_job(company, cards, user=None, printer_name=''):
+    """
+    Crear un trabajo de impresión y generar su PDF (una página por tarjeta).
+    Las tarjetas que no se pueden dibujar cuentan como fallidas.
+    """
+    from .utils import generate_batch_pdf
+
+    cards = list(cards)
+    job = PrintJob.objects.create(
+        company=company,
+        printer_name=printer_name,
+        total_cards=len(cards),
+        created_by=user,
+    )
+    PrintJob.cards.through.objects.bulk_create([
+        PrintJob.cards.through(printjob_id=job.pk, idcard_id=card.pk) for card in cards
+    ])
+
+    relative_path = job.document.field.generate_filename(job, f'{job.pk}.pdf')
+    ok, failed = generate_batch_pdf(cards, os.path.join(settings.MEDIA_ROOT, relative_path))
+
+    job.document.name = relative_path
+    job.failed_cards = len(failed)
+    job.status = 'rendered' if ok else 'failed'
+    job.save(update_fields=['document', 'failed_cards', 'status'])
+    return job
+
+
+def start_print_job(job):
+    """Registrar el inicio del envío a la impresora"""
+    if job.started_at is None:
+        job.started_at = timezone.now()
+        job.save(update_fields=['started_at'])
+    return job
+
+
+def complete_print_job(job, failed_card_ids=(), user=None):
+    """
+    Cerrar un trabajo: las tarjetas no fallidas se marcan como impresas
+    con un solo UPDATE y se guardan los contadores de rendimiento.
+    """
+    now = timezone.now()
+    failed_card_ids = {str(pk) for pk in failed_card_ids}
+    with transaction.atomic():
+        printed = job.cards.exclude(pk__in=failed_card_ids)
+        printed_cards = mark_cards_printed(
+            IDCard.objects.filter(pk__in=printed.values('pk')),
+            user=user or job.created_by,
+            printed_at=now,
+        )
+        job.printed_cards = printed_cards
+        job.failed_cards = job.total_cards - printed_cards
+        job.started_at = job.started_at or job.created_at
+        job.finished_at = now
+        job.status = 'completed' if printed_cards else 'failed'
+        job.save(update_fields=['printed_cards', 'failed_cards', 'started_at', 'finished_at', 'status'])
+    return job
+
+
+def print_job_throughput(queryset):
+    """Resumen de capacidad: trabajos, tarjetas, fallos y tarjetas por minuto"""
+    finished = Q(finished_at__isnull=False, started_at__isnull=False)
+    totals = queryset.aggregate(
+        jobs=Count('pk'),
+        completed_jobs=Count('pk', filter=finished),
+        cards=Sum('total_cards'),
+        printed=Sum('printed_cards'),
+        failed=Sum('failed_cards'),
+        printed_finished=Sum('printed_cards', filter=finished),
+        duration=Sum(F('finished_at') - F('started_at'), filter=finished),
+    )
+    seconds = totals['duration'].total_seconds() if totals['duration'] else 0
+    printed = totals['printed'] or 0
+    failed = totals['failed'] or 0
+    return {
+        'jobs': totals['jobs'],
+        'completed_jobs': totals['completed_jobs'],
+        'total_cards': totals['cards'] or 0,
+        'printed_cards': printed,
+        'failed_cards': failed,
+        'failure_rate': round(failed * 100 / (printed + failed), 2) if printed + failed else 0,
+        'cards_per_minute': round(totals['printed_finished'] * 60 / seconds, 2) if seconds else None,
+    }
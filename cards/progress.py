@@ -0,0 +1,198 @@
+# backend/cards/progress.py
+import json
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from rest_framework.renderers import BaseRenderer
+
+PROGRESS_CACHE_KEY = 'progress:{}'
+PROGRESS_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def normalize_progress_id(value):
+    """ID de progreso propuesto por el cliente (uuid hex) o uno nuevo"""
+    if value:
+        value = str(value).replace('-', '').lower()
+        if PROGRESS_ID_RE.match(value):
+            return value
+    return uuid.uuid4().hex
+
+
+class ProgressTracker:
+    """
+    Progreso de una operación larga guardado en la caché (sin tocar la base
+    de datos). Solo escribe cada PROGRESS_UPDATE_EVERY elementos o cada
+    PROGRESS_UPDATE_INTERVAL segundos, así se puede llamar a advance() en
+    cada tarjeta. Con varios procesos la caché debe ser compartida (Redis,
+    Memcached); con LocMemCache solo se ve desde el mismo proceso.
+    """
+
+    def __init__(self, operation, total, user_id=None, company_id=None, progress_id=None):
+        self.id = normalize_progress_id(progress_id)
+        self.operation = operation
+        self.total = total
+        self.user_id = user_id
+        self.company_id = str(company_id) if company_id else None
+        self.processed = 0
+        self.failed = 0
+        self.status = 'running'
+        self.message = ''
+        self.result = None
+        self.started_at = time.time()
+        self._flushed_at = 0.0
+        self._flushed_processed = 0
+        self._flush()
+
+    @property
+    def key(self):
+        return PROGRESS_CACHE_KEY.format(self.id)
+
+    def state(self):
+        return {
+            'id': self.id,
+            'operation': self.operation,
+            'user_id': self.user_id,
+            'company_id': self.company_id,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'failed': self.failed,
+            'started_at': self.started_at,
+            'updated_at': time.time(),
+            'message': self.message,
+            'result': self.result,
+        }
+
+    def _flush(self):
+        cache.set(self.key, self.state(), settings.PROGRESS_TTL)
+        self._flushed_at = time.monotonic()
+        self._flushed_processed = self.processed
+
+    def advance(self, ok=1, failed=0, message=None):
+        """Sumar elementos procesados (correctos y fallidos)"""
+        self.processed += ok + failed
+        self.failed += failed
+        if message is not None:
+            self.message = message
+        if (
+            self.processed - self._flushed_processed >= settings.PROGRESS_UPDATE_EVERY
+            or time.monotonic() - self._flushed_at >= settings.PROGRESS_UPDATE_INTERVAL
+        ):
+            self._flush()
+
+    def finish(self, result=None, message=''):
+        self.status = 'completed'
+        self.result = result
+        self.message = message
+        self._flush()
+
+    def fail(self, message):
+        self.status = 'failed'
+        self.message = message
+        self._flush()
+
+
+def get_progress(progress_id):
+    """Estado de una operación con restantes, velocidad y ETA calculados, o None"""
+    state = cache.get(PROGRESS_CACHE_KEY.format(progress_id))
+    if state is None:
+        return None
+
+    elapsed = max(state['updated_at'] - state['started_at'], 0)
+    remaining = max(state['total'] - state['processed'], 0)
+    rate = state['processed'] / elapsed if elapsed > 0 else 0
+    eta = None
+    if state['status'] == 'running' and rate > 0:
+        eta = round(remaining / rate, 1)
+    elif state['status'] != 'running':
+        eta = 0
+    return {
+        **state,
+        'remaining': remaining,
+        'elapsed_seconds': round(elapsed, 1),
+        'items_per_second': round(rate, 2),
+        'eta_seconds': eta,
+    }
+
+
+def can_view_progress(request, state):
+    return request.user.is_superuser or state.get('user_id') == request.user.pk
+
+
+def event_stream(progress_id, can_view=None, interval=None, timeout=None):
+    """
+    Generador de server-sent events: envía el estado cuando cambia, un
+    comentario cada 15 s para mantener viva la conexión, y termina cuando
+    la operación acaba o pasa `timeout` (el navegador reconecta solo).
+    Se puede abrir antes de que la operación empiece: espera a que aparezca.
+    """
+    interval = interval or settings.PROGRESS_STREAM_INTERVAL
+    deadline = time.monotonic() + (timeout or settings.PROGRESS_STREAM_TIMEOUT)
+    last_sent = None
+    last_ping = time.monotonic()
+
+    yield 'retry: 3000\n\n'
+    while time.monotonic() < deadline:
+        state = get_progress(progress_id)
+        if state is not None and can_view is not None and not can_view(state):
+            yield f'event: error\ndata: {json.dumps({"error": "Operación no encontrada"})}\n\n'
+            return
+        if state is not None and state['updated_at'] != last_sent:
+            last_sent = state['updated_at']
+            yield f'event: progress\ndata: {json.dumps(state)}\n\n'
+            if state['status'] != 'running':
+                yield f'event: end\ndata: {json.dumps({"status": state["status"]})}\n\n'
+                return
+        elif time.monotonic() - last_ping >= 15:
+            yield ': ping\n\n'
+            last_ping = time.monotonic()
+        time.sleep(interval)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Permite que la negociación de DRF acepte Accept: text/event-stream"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f'event: error\ndata: {json.dumps(data)}\n\n'.encode(self.charset)
+
+
+# ========== OPERACIONES EN SEGUNDO PLANO ==========
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PROGRESS_BACKGROUND_WORKERS,
+                thread_name_prefix='card-operations',
+            )
+    return _executor
+
+
+def _run_tracked(tracker, func, args):
+    close_old_connections()
+    try:
+        func(*args, progress=tracker)
+        if tracker.status == 'running':
+            tracker.finish()
+    except Exception as e:
+        tracker.fail(str(e))
+    finally:
+        close_old_connections()
+
+
+def run_in_background(tracker, func, *args):
+    """Ejecutar func(*args, progress=tracker) en un hilo; devuelve el tracker"""
+    _get_executor().submit(_run_tracked, tracker, func, args)
+    return tracker
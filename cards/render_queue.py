@@ -0,0 +1,65 @@
+# backend/cards/render_queue.py
+from companies.generations import bump_generations, bump_queryset_generations
+from .models import IDCard
+
+
+def queue_render(queryset):
+    """Marcar tarjetas para regenerar sus archivos (un solo UPDATE)"""
+    queryset = queryset.filter(render_pending=False)
+    bump_queryset_generations(queryset)
+    return queryset.update(render_pending=True)
+
+
+def pending_renders():
+    """Tarjetas en cola (servida por el índice parcial idcard_render_pending_idx)"""
+    return IDCard.objects.filter(render_pending=True)
+
+
+def render_card_files(card):
+    """Regenerar la vista previa y, si ya tenía, el PDF de una tarjeta"""
+    from .utils import generate_card_pdf, generate_card_preview
+
+    ok = generate_card_preview(card)
+    if ok and card.pdf_file:
+        ok = bool(generate_card_pdf(card))
+    return ok
+
+
+def process_render_queue(limit=None, chunk_size=100, on_progress=None):
+    """
+    Procesar la cola de regeneración por bloques.
+    Devuelve (procesadas, fallidas). Las fallidas se quedan en la cola.
+    """
+    processed = 0
+    failed_pks = set()
+    while limit is None or processed + len(failed_pks) < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - processed - len(failed_pks))
+        pks = list(
+            pending_renders()
+            .exclude(pk__in=failed_pks)
+            .order_by('created_at')
+            .values_list('pk', flat=True)[:size]
+        )
+        if not pks:
+            break
+
+        done = []
+        company_ids = set()
+        cards = IDCard.objects.filter(pk__in=pks).select_related('template', 'company')
+        for card in cards:
+            try:
+                ok = render_card_files(card)
+            except Exception as e:
+                print(f"Error regenerando {card.card_number}: {e}")
+                ok = False
+            if ok:
+                done.append(card.pk)
+                company_ids.add(card.company_id)
+            else:
+                failed_pks.add(card.pk)
+        IDCard.objects.filter(pk__in=done).update(render_pending=False)
+        bump_generations(company_ids)
+        processed += len(done)
+        if on_progress:
+            on_progress(processed, len(failed_pks))
+    return processed, len(failed_pks)
@@ -0,0 +1,189 @@
+# backend/cards/rendering.py
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from django.conf import settings
+from PIL import Image
+
+# Formato -> tipo de contenido
+RENDER_FORMATS = {
+    'png': 'image/png',
+    'pdf': 'application/pdf',
+}
+
+# Formatos de imagen que se derivan del PNG a resolución completa
+IMAGE_FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+SIDES = ('front', 'back')
+
+# Subir al cambiar el dibujo de utils.render_card_*: invalida todo lo cacheado
+RENDERER_VERSION = '1'
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+# Renderizados en curso por clave: las peticiones iguales esperan al primero
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class RenderBusy(Exception):
+    """Todos los huecos del pool de renderizado están ocupados"""
+
+
+def _init_worker(settings_module):
+    # Los procesos se crean con 'spawn' (seguro con servidores multihilo)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def render_bytes(card, fmt, side='front'):
+    """
+    Dibujar la tarjeta en el formato pedido. La tarjeta llega con la
+    plantilla y la empresa cargadas: aquí no se consulta la base de datos.
+    """
+    from .utils import render_card_back_png, render_card_pdf, render_card_png
+
+    if fmt == 'pdf':
+        return render_card_pdf(card, side)
+    png, _ = render_card_back_png(card) if side == 'back' else render_card_png(card)
+    return png
+
+
+def _file_signature(field_file):
+    """Nombre, tamaño y fecha del archivo: detecta que se reemplazó con el mismo nombre"""
+    if not field_file:
+        return ''
+    try:
+        stat = os.stat(field_file.path)
+    except (OSError, ValueError, NotImplementedError):
+        return field_file.name
+    return f'{field_file.name}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def render_fingerprint(card):
+    """
+    Huella de todo lo que entra en el dibujo de la tarjeta: si cambia un
+    dato, la plantilla (content_hash), la empresa o un archivo, cambia la
+    huella y nunca se sirve un archivo cacheado viejo.
+    """
+    template = card.template
+    company = card.company
+    parts = [
+        RENDERER_VERSION,
+        card.pk, card.person_name, card.person_title, card.id_number, card.card_number,
+        card.barcode_data, card.barcode_type, card.valid_from, card.expiration_date,
+        _file_signature(card.photo), _file_signature(card.barcode_image), _file_signature(card.qr_code),
+        template.pk if template else '', template.content_hash if template else '',
+        template.background_color if template else '',
+        company.name if company else '', _file_signature(company.logo) if company else '',
+    ]
+    return hashlib.sha256('|'.join(map(str, parts)).encode('utf-8')).hexdigest()
+
+
+def derive_image(png, fmt, width=None, dpi=None):
+    """
+    Reducir el PNG a resolución completa (utils.DPI) al ancho o a los DPI
+    pedidos y convertirlo a png/webp/jpeg. Nunca se amplía.
+    """
+    from .utils import DPI
+
+    image = Image.open(BytesIO(png))
+    if dpi and not width:
+        width = round(image.width * dpi / DPI)
+    dpi = DPI
+    if width and width < image.width:
+        dpi = max(round(DPI * width / image.width), 1)
+        image = image.resize((width, max(round(image.height * width / image.width), 1)), Image.Resampling.LANCZOS)
+    pil_format = IMAGE_FORMATS[fmt][0]
+    if pil_format == 'JPEG':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    options = {'quality': 90} if pil_format in ('JPEG', 'WEBP') else {'optimize': True}
+    image.save(buffer, format=pil_format, dpi=(dpi, dpi), **options)
+    return buffer.getvalue()
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(max(settings.RENDER_MAX_PENDING, 1))
+        if _pool is None and settings.RENDER_WORKERS > 0:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'),),
+            )
+    return _pool
+
+
+def _discard_pool(pool):
+    """Un proceso murió: el pool queda inservible y se crea otro en la siguiente petición"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def render_card(card, fmt, side='front'):
+    """
+    Renderizar sin bloquear el bucle de eventos: el dibujo (CPU) va a un
+    pool de RENDER_WORKERS procesos. Como mucho RENDER_MAX_PENDING
+    renderizados en curso o en cola; por encima se lanza RenderBusy.
+    Con RENDER_WORKERS=0 se usa un hilo (desarrollo).
+    """
+    pool = _get_pool()
+    if not _slots.acquire(blocking=False):
+        raise RenderBusy()
+    try:
+        if pool is None:
+            return await asyncio.to_thread(render_bytes, card, fmt, side)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(pool, render_bytes, card, fmt, side)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise
+    finally:
+        _slots.release()
+
+
+async def render_once(key, render):
+    """
+    Ejecutar `await render()` una sola vez por clave en este proceso:
+    si llegan varias peticiones en frío para la misma tarjeta, las demás
+    esperan el resultado de la primera en lugar de dibujar otra vez.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        return await asyncio.wrap_future(future)
+
+    try:
+        data = await render()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(data)
+        return data
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
@@ -0,0 +1,166 @@
+# backend/cards/rerender.py
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from companies.generations import bump_generations
+from .models import IDCard, RerenderRun
+from .render_queue import render_card_files
+
+# Primero las tarjetas en uso; el resto de estados (expiradas, revocadas...) al final
+STATUS_PRIORITY = {
+    'active': 0,
+    'draft': 1,
+}
+LOW_PRIORITY = 2
+
+
+def stale_cards(company_id=None, template_id=None):
+    """
+    Tarjetas con archivos generados con una versión de su plantilla que ya
+    no es la vigente (o sin versión registrada): se compara
+    IDCard.template_version con CardTemplate.current_version, por plantilla
+    con el índice idcard_template_version_idx.
+    Las tarjetas sin vista previa ni PDF no cuentan: no hay nada que rehacer.
+    """
+    queryset = (
+        IDCard.objects.filter(template__current_version__isnull=False)
+        .filter(Q(composite_image__gt='') | Q(pdf_file__gt=''))
+        .exclude(template_version=F('template__current_version'))
+    )
+    if company_id:
+        queryset = queryset.filter(company_id=company_id)
+    if template_id:
+        queryset = queryset.filter(template_id=template_id)
+    return queryset
+
+
+def prioritized(queryset):
+    """Ordenar por estado (activas primero) y por último acceso más reciente"""
+    return queryset.annotate(
+        render_priority=Case(
+            *[When(status=status, then=Value(priority)) for status, priority in STATUS_PRIORITY.items()],
+            default=Value(LOW_PRIORITY),
+            output_field=IntegerField(),
+        )
+    ).order_by('render_priority', F('last_accessed').desc(nulls_last=True), 'pk')
+
+
+def stale_summary(company_id=None, template_id=None):
+    """Cuántas tarjetas hay que regenerar, en total y por estado (una consulta)"""
+    rows = (
+        stale_cards(company_id, template_id)
+        .order_by()
+        .values('status')
+        .annotate(total=Count('pk'))
+    )
+    by_status = {row['status']: row['total'] for row in rows}
+    return {'total': sum(by_status.values()), 'by_status': by_status}
+
+
+def is_stalled(run):
+    """Una regeneración en curso sin punto de control reciente (su proceso murió)"""
+    last = run.checkpoint_at or run.created_at
+    return run.status == 'running' and last < timezone.now() - timedelta(seconds=settings.RERENDER_STALL_SECONDS)
+
+
+def start_rerender(company=None, template=None, user=None, chunk_size=None):
+    """
+    Crear una regeneración para el alcance (todas, una empresa o una
+    plantilla) o devolver la que ya está en curso. Devuelve (run, creada).
+    """
+    if template is not None:
+        company = template.company
+    chunk_size = chunk_size or settings.RERENDER_CHUNK_SIZE
+    existing = RerenderRun.objects.filter(status='running', company=company, template=template).first()
+    if existing is not None:
+        return existing, False
+
+    total = stale_cards(company.pk if company else None, template.pk if template else None).count()
+    run = RerenderRun.objects.create(
+        company=company,
+        template=template,
+        created_by=user,
+        chunk_size=chunk_size,
+        total_cards=total,
+        status='running' if total else 'completed',
+        finished_at=None if total else timezone.now(),
+    )
+    return run, True
+
+
+def process_rerender_run(run_id, max_chunks=None, progress=None):
+    """
+    Regenerar por bloques de run.chunk_size, siempre las tarjetas
+    desactualizadas de mayor prioridad. Al regenerarse dejan de estar
+    desactualizadas, así que retomar solo es volver a llamar: tras cada
+    bloque se guarda el avance y las fallidas (que se saltan).
+    `max_chunks` limita el trabajo de una llamada (ej. un cron cada pocos minutos).
+    """
+    run = RerenderRun.objects.get(pk=run_id)
+    if run.status != 'running':
+        return run
+    if progress is not None:
+        progress.total = run.total_cards
+        progress.advance(ok=run.processed_cards, failed=run.failed_cards)
+
+    failed_ids = set(run.failed_card_ids)
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        # Cancelada desde la API o el admin
+        if RerenderRun.objects.filter(pk=run.pk, status='cancelled').exists():
+            break
+
+        pks = list(
+            prioritized(stale_cards(run.company_id, run.template_id))
+            .exclude(pk__in=failed_ids)
+            .values_list('pk', flat=True)[:run.chunk_size]
+        )
+        if not pks:
+            RerenderRun.objects.filter(pk=run.pk, status='running').update(
+                status='completed', finished_at=timezone.now()
+            )
+            break
+
+        done, failed, last_error = [], [], ''
+        cards = IDCard.objects.filter(pk__in=pks).select_related('template', 'company')
+        for card in cards:
+            try:
+                ok = render_card_files(card)
+            except Exception as e:
+                ok = False
+                last_error = f'{card.card_number}: {e}'
+            if ok:
+                done.append(card)
+            else:
+                failed.append(str(card.pk))
+                last_error = last_error or f'{card.card_number}: no se pudo generar'
+            if progress is not None:
+                progress.advance(ok=1 if ok else 0, failed=0 if ok else 1)
+
+        # Ya no necesitan la cola de render_pending_cards
+        if done:
+            IDCard.objects.filter(pk__in=[card.pk for card in done]).update(render_pending=False)
+            bump_generations({card.company_id for card in done})
+        failed_ids.update(failed)
+
+        # Punto de control
+        checkpoint = {
+            'processed_cards': F('processed_cards') + len(done),
+            'failed_cards': F('failed_cards') + len(failed),
+            'failed_card_ids': sorted(failed_ids),
+            'chunks_done': F('chunks_done') + 1,
+            'checkpoint_at': timezone.now(),
+        }
+        if last_error:
+            checkpoint['last_error'] = last_error
+        RerenderRun.objects.filter(pk=run.pk).update(**checkpoint)
+        chunks += 1
+
+    run.refresh_from_db()
+    if progress is not None and run.status != 'running':
+        progress.finish(
+            result={'run_id': str(run.pk), 'processed': run.processed_cards, 'failed': run.failed_cards},
+            message=f'{run.processed_cards} tarjetas regeneradas, {run.failed_cards} con error',
+        )
+    return run
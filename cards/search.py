@@ -0,0 +1,77 @@
+# backend/cards/search.py
+import unicodedata
+from django.db import connections
+from django.db.models import Q
+from rest_framework import filters
+
+
+def normalize_search_text(*values):
+    """
+    Texto normalizado para búsqueda: minúsculas, sin acentos ni espacios repetidos.
+    'José Peña  García' -> 'jose pena garcia'
+    """
+    text = ' '.join(str(value) for value in values if value)
+    decomposed = unicodedata.normalize('NFKD', text)
+    without_accents = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(without_accents.lower().split())
+
+
+class NormalizedSearchFilter(filters.SearchFilter):
+    """
+    Búsqueda (?search=) sobre la columna `search_document` del modelo.
+
+    La columna guarda los campos de búsqueda ya normalizados, así que cada
+    término es un solo LIKE '%term%' que en PostgreSQL sirve un índice
+    GIN con pg_trgm (ver migraciones). En PostgreSQL también se aceptan
+    coincidencias aproximadas por similitud de trigramas (errores de tecleo).
+    En SQLite (pruebas) se hace el mismo LIKE sin índice.
+
+    Si la vista define `search_document_field = None` o el modelo no tiene la
+    columna, se usa el SearchFilter normal de DRF sobre `search_fields`.
+    """
+    document_field = 'search_document'
+    fuzzy_min_length = 4
+
+    def get_document_field(self, view, queryset):
+        field = getattr(view, 'search_document_field', self.document_field)
+        if not field:
+            return None
+        try:
+            queryset.model._meta.get_field(field)
+        except Exception:
+            return None
+        return field
+
+    def filter_queryset(self, request, queryset, view):
+        document_field = self.get_document_field(view, queryset)
+        if document_field is None:
+            return super().filter_queryset(request, queryset, view)
+
+        terms = [normalize_search_text(term) for term in self.get_search_terms(request)]
+        terms = [term for term in terms if term]
+        if not terms:
+            return queryset
+
+        fuzzy = connections[queryset.db].vendor == 'postgresql'
+        for term in terms:
+            condition = Q(**{f'{document_field}__contains': term})
+            if fuzzy and len(term) >= self.fuzzy_min_length:
+                condition |= Q(**{f'{document_field}__trigram_word_similar': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+def refresh_search_document(instance, save_kwargs):
+    """
+    Recalcular `search_document` antes de guardar.
+    Si el save() usa update_fields y no toca campos de búsqueda, no hace nada.
+    """
+    source_fields = instance.SEARCH_DOCUMENT_FIELDS
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None:
+        if not set(update_fields) & set(source_fields):
+            return
+        save_kwargs['update_fields'] = set(update_fields) | {'search_document'}
+    instance.search_document = normalize_search_text(
+        *(getattr(instance, field) for field in source_fields)
+    )
@@ -1,7 +1,8 @@
 from rest_framework import serializers
-from .models import CardTemplate, IDCard
+from config.fieldsets import SparseFieldsetsSerializerMixin
+from .models import CardTemplate, CardTemplateVersion, IDCard, PrintJob, RerenderRun
 
-class CardTemplateSerializer(serializers.ModelSerializer):
+class CardTemplateSerializer(SparseFieldsetsSerializerMixin, serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
     width_px = serializers.IntegerField(read_only=True)
@@ -9,10 +10,23 @@ class CardTemplateSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = CardTemplate
-        fields = '__all__'
+        exclude = ['search_document']
         read_only_fields = ['created_by', 'created_at', 'updated_at', 'version']
+        # Columnas que necesitan los campos calculados (ver config/fieldsets.py)
+        sparse_field_sources = {
+            'width_px': ['width_mm', 'dpi'],
+            'height_px': ['height_mm', 'dpi'],
+        }
 
-class IDCardSerializer(serializers.ModelSerializer):
+class CardTemplateVersionSerializer(serializers.ModelSerializer):
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+    
+    class Meta:
+        model = CardTemplateVersion
+        fields = ['id', 'template', 'version', 'content_hash', 'snapshot', 'created_by', 'created_by_name', 'created_at']
+        read_only_fields = fields
+
+class IDCardSerializer(SparseFieldsetsSerializerMixin, serializers.ModelSerializer):
     template_name = serializers.CharField(source='template.name', read_only=True)
     company_name = serializers.CharField(source='company.name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
@@ -21,8 +35,117 @@ class IDCardSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = IDCard
-        fields = '__all__'
+        exclude = ['search_document']
         read_only_fields = [
             'barcode_image', 'qr_code', 'composite_image', 'pdf_file',
             'created_at', 'updated_at', 'last_accessed', 'printed_count'
-        ]
\ No newline at end of file
+        ]
+        # Columnas que necesitan los campos calculados (ver config/fieldsets.py)
+        sparse_field_sources = {
+            'days_to_expire': ['expiration_date'],
+            'is_expired': ['status', 'expiration_date'],
+        }
+
+class CardBulkFilterSerializer(serializers.Serializer):
+    """Filtro de IDCardViewSet.bulk_update: valores tipados antes de llegar al ORM"""
+    
+    company_id = serializers.UUIDField(required=False)
+    status = serializers.ChoiceField(choices=IDCard.STATUS_CHOICES, required=False)
+    card_type = serializers.ChoiceField(choices=IDCard.CARD_TYPES, required=False)
+    department = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    template = serializers.UUIDField(required=False)
+    
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            unknown = set(data) - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError(f"Filtros no permitidos: {', '.join(sorted(unknown))}")
+        return super().to_internal_value(data)
+
+
+class CardBulkUpdateSerializer(serializers.Serializer):
+    """Entrada de IDCardViewSet.bulk_update"""
+    
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    filter = CardBulkFilterSerializer(required=False)
+    changes = serializers.DictField()
+    
+    def validate_changes(self, value):
+        from .bulk import BULK_UPDATE_FIELDS
+        
+        if not value:
+            raise serializers.ValidationError('No hay cambios que aplicar')
+        unknown = set(value) - set(BULK_UPDATE_FIELDS)
+        if unknown:
+            raise serializers.ValidationError(f"Campos no permitidos: {', '.join(sorted(unknown))}")
+        
+        # Validar cada valor con el campo correspondiente de IDCardSerializer
+        card_fields = IDCardSerializer().fields
+        validated = {}
+        errors = {}
+        for name, raw in value.items():
+            try:
+                validated[name] = card_fields[name].run_validation(raw)
+            except serializers.ValidationError as e:
+                errors[name] = e.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        return validated
+    
+    def validate(self, attrs):
+        if not attrs.get('ids') and not attrs.get('filter'):
+            raise serializers.ValidationError('Se requiere ids o filter')
+        return attrs
+
+
+class PrintJobSerializer(serializers.ModelSerializer):
+    company_name = serializers.CharField(source='company.name', read_only=True)
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+    duration = serializers.FloatField(read_only=True)
+    cards_per_minute = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = PrintJob
+        fields = [
+            'id', 'company', 'company_name', 'printer_name', 'status', 'document',
+            'total_cards', 'printed_cards', 'failed_cards', 'duration', 'cards_per_minute',
+            'created_by', 'created_by_name', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
+
+
+class PrintJobCreateSerializer(serializers.Serializer):
+    """Entrada de PrintJobViewSet.create"""
+    
+    company_id = serializers.UUIDField()
+    card_ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+    printer_name = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+
+
+class PrintJobCompleteSerializer(serializers.Serializer):
+    """Entrada de PrintJobViewSet.complete"""
+    
+    failed_card_ids = serializers.ListField(child=serializers.UUIDField(), required=False, default=list)
+
+
+class RerenderRunSerializer(serializers.ModelSerializer):
+    company_name = serializers.CharField(source='company.name', read_only=True, default=None)
+    template_name = serializers.CharField(source='template.name', read_only=True, default=None)
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True, default=None)
+    
+    class Meta:
+        model = RerenderRun
+        fields = [
+            'id', 'company', 'company_name', 'template', 'template_name', 'status', 'chunk_size',
+            'total_cards', 'processed_cards', 'failed_cards', 'failed_card_ids', 'chunks_done',
+            'last_error', 'created_by', 'created_by_name', 'created_at', 'checkpoint_at', 'finished_at',
+        ]
+        read_only_fields = fields
+
+
+class RerenderRunCreateSerializer(serializers.Serializer):
+    """Entrada de RerenderRunViewSet.create"""
+    
+    company_id = serializers.UUIDField(required=False)
+    template_id = serializers.UUIDField(required=False)
+    chunk_size = serializers.IntegerField(min_value=1, max_value=1000, required=False)
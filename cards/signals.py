@@ -0,0 +1,22 @@
+# backend/cards/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import CardStatusTransition, IDCard
+
+
+@receiver(post_save, sender=IDCard)
+def record_status_transition(sender, instance, created, raw=False, **kwargs):
+    """Guardar en el historial los cambios de estado hechos con save()"""
+    if raw or created:
+        return
+    old_status = getattr(instance, '_loaded_status', None)
+    new_status = instance.__dict__.get('status')
+    if old_status and new_status and old_status != new_status:
+        CardStatusTransition.objects.create(
+            card=instance,
+            company_id=instance.company_id,
+            from_status=old_status,
+            to_status=new_status,
+            reason='manual',
+            changed_by=getattr(instance, '_changed_by', None),
+        )
@@ -1,3 +1,108 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from companies.models import Company
+from users.models import CompanyUser
+from .models import CardTemplate, IDCard
+from .search import normalize_search_text
 
-# Create your tests here.
+
+class CardAPITestCase(TestCase):
+    """Empresa con una plantilla y un usuario administrador autenticado"""
+
+    def setUp(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.company = Company.objects.create(
+            name='Acme', contact_email='acme@example.com', created_by=admin, subscription_plan='premium'
+        )
+        self.template = CardTemplate.objects.create(company=self.company, name='Básica', created_by=admin)
+        self.user = User.objects.create_user('ed', 'ed@example.com', 'x')
+        CompanyUser.objects.create(user=self.user, company=self.company, role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_card(self, number, **kwargs):
+        fields = {
+            'person_name': f'Persona {number}',
+            'id_number': f'ID{number}',
+            'card_number': f'C{number}',
+            **kwargs,
+        }
+        return IDCard.objects.create(company=self.company, template=self.template, **fields)
+
+    def card_numbers(self, response):
+        return [card['card_number'] for card in response.data['results']]
+
+
+class KeysetPaginationTests(CardAPITestCase):
+    """?pagination=cursor: recorrer hacia delante y hacia atrás sin saltos ni repetidos"""
+
+    def setUp(self):
+        super().setUp()
+        for number in range(7):
+            self.create_card(number)
+        # Misma fecha para todas: el desempate es el id
+        IDCard.objects.update(created_at=timezone.now())
+        self.expected = [
+            card.card_number for card in IDCard.objects.order_by('-created_at', '-pk')
+        ]
+
+    def test_round_trip(self):
+        response = self.client.get('/api/cards/?pagination=cursor&page_size=3')
+        self.assertIsNone(response.data['previous'])
+        pages = [self.card_numbers(response)]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(self.card_numbers(response))
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.expected)
+
+        # Hacia atrás desde la última página
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(self.card_numbers(response), pages[1])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(self.card_numbers(response), pages[0])
+        self.assertIsNone(response.data['previous'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/cards/?cursor=no-es-un-cursor')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class NormalizedSearchTests(CardAPITestCase):
+    """?search= sobre search_document (en SQLite, LIKE sin índice ni trigramas)"""
+
+    def setUp(self):
+        super().setUp()
+        self.create_card(1, person_name='José Peña  García', department='Tecnología')
+        self.create_card(2, person_name='Ana Ruiz', employee_id='EMP-77')
+        self.create_card(3, person_name='Jose Luis')
+
+    def search(self, term):
+        return sorted(self.card_numbers(self.client.get('/api/cards/', {'search': term})))
+
+    def test_normalize_search_text(self):
+        self.assertEqual(normalize_search_text('José Peña  García', None, 'TI'), 'jose pena garcia ti')
+
+    def test_search_ignores_accents_and_case(self):
+        self.assertEqual(self.search('jose'), ['C1', 'C3'])
+        self.assertEqual(self.search('PEÑA'), ['C1'])
+        self.assertEqual(self.search('tecnologia'), ['C1'])
+        self.assertEqual(self.search('emp-77'), ['C2'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('jose garcia'), ['C1'])
+        self.assertEqual(self.search('jose zzz'), [])
+
+    def test_document_follows_partial_saves(self):
+        card = IDCard.objects.get(card_number='C2')
+        card.department = 'Ventas'
+        card.save(update_fields=['department'])
+
+        card.refresh_from_db()
+        self.assertIn('ventas', card.search_document)
+        self.assertEqual(self.search('ventas'), ['C2'])
@@ -1,12 +1,21 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'templates', views.CardTemplateViewSet, basename='template')
+router.register(r'print-jobs', views.PrintJobViewSet, basename='print-job')
+router.register(r'rerender-runs', views.RerenderRunViewSet, basename='rerender-run')
 router.register(r'', views.IDCardViewSet, basename='card')
 
 urlpatterns = [
+    # Antes del router: el prefijo r'' de las tarjetas captura cualquier segmento
+    re_path(r'^progress/(?P<progress_id>[0-9a-f]{32})/$', views.OperationProgressView.as_view(), name='card-progress'),
+    re_path(r'^progress/(?P<progress_id>[0-9a-f]{32})/stream/$', views.OperationProgressStreamView.as_view(), name='card-progress-stream'),
+    # Vistas async (ASGI): dibujo en el pool de procesos
+    path('<uuid:pk>/render/<str:fmt>/', async_views.render_card, name='card-render'),
+    path('<uuid:pk>/download/<str:fmt>/', async_views.download_card, name='card-download'),
+    path('<uuid:pk>/image/', async_views.card_image, name='card-image'),
     path('', include(router.urls)),
     path('export/csv/', views.IDCardViewSet.as_view({'get': 'export_csv'}), name='export-csv'),
     path('batch/create/', views.IDCardViewSet.as_view({'post': 'batch_create'}), name='batch-create'),
@@ -2,8 +2,10 @@
 import os
 import json
 import hashlib
+import logging
 from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
+from django.conf import settings
 from django.core.files.base import ContentFile
 
 # --- REPORTLAB IMPORTS ---
@@ -11,9 +13,12 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
 from reportlab.lib.colors import HexColor, white, black, grey
 from reportlab.lib.pagesizes import A4, landscape, portrait
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
+logger = logging.getLogger(__name__)
+
 # --- CONSTANTES CR80 ---
 CR80_LARGO_MM = 85.6  # Ancho estándar
 CR80_CORTO_MM = 53.98 # Alto estándar
@@ -60,7 +65,7 @@ def generate_barcode_image(barcode_data, barcode_type='code128'):
         return ContentFile(buffer.read(), name=f'barcode_{barcode_data}.png')
         
     except Exception as e:
-        print(f"⚠️  Error generando barcode, usando simple: {e}")
+        logger.warning("Error generando código de barras, se usa el simple: %s", e)
         return generate_simple_barcode(barcode_data)
 
 def generate_simple_barcode(data):
@@ -84,169 +89,275 @@ def generate_simple_barcode(data):
     
     return ContentFile(buffer.read(), name=f'simple_barcode_{data}.png')
 
-def generate_card_preview(card):
-    """Genera imagen de la tarjeta en tamaño CR80 exacto"""
-    print(f"\n🎨 GENERANDO TARJETA para {card.person_name}")
-    
+def generate_qr_code(data):
+    """Genera código QR (requiere el paquete opcional qrcode[pil])"""
     try:
-        # 1. OBTENER CONFIGURACIÓN
-        template = card.template
-        orientation = "vertical"  # Por defecto vertical
-        
-        if template and hasattr(template, 'elements'):
-            try:
-                elements = json.loads(template.elements) if isinstance(template.elements, str) else template.elements
-                if elements.get('orientation'):
-                    orientation = elements.get('orientation')
-            except:
-                pass
-        
-        # 2. DIMENSIONES EXACTAS CR80
-        ancho_px, alto_px = get_card_dimensions(orientation)
-        print(f"  📏 Dimensiones: {ancho_px}×{alto_px}px ({'horizontal' if orientation == 'horizontal' else 'vertical'})")
-        
-        # 3. CREAR FONDO
-        bg_color = '#1E3A8A'  # Azul oscuro por defecto
-        if template and template.background_color:
-            bg_color = template.background_color
-        
-        print(f"  🎨 Fondo: {bg_color}")
-        bg = Image.new('RGB', (ancho_px, alto_px), bg_color)
-        draw = ImageDraw.Draw(bg)
-        
-        # 4. AGREGAR ELEMENTOS BÁSICOS (siempre visibles)
-        
-        # --- NOMBRE DE LA COMPAÑÍA ---
-        company_name = card.company.name if card.company else "EMPRESA"
+        import qrcode
+    except ImportError:
+        logger.warning("qrcode no instalado. Instala: pip install qrcode[pil]")
+        return None
+    
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    img = qr.make_image(fill_color="black", back_color="white")
+    
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    
+    file_name = f"qr_{hashlib.md5(data.encode()).hexdigest()[:8]}.png"
+    return ContentFile(buffer.getvalue(), name=file_name)
+
+def get_preview_orientation(card):
+    """Orientación de la imagen según la plantilla (vertical por defecto)"""
+    template = card.template
+    orientation = "vertical"  # Por defecto vertical
+    
+    if template and hasattr(template, 'elements'):
         try:
-            # Intentar cargar fuente Helvetica-Bold
-            font_large = ImageFont.truetype("arialbd.ttf", 16)  # 16px ≈ 12pt
+            elements = json.loads(template.elements) if isinstance(template.elements, str) else template.elements
+            if elements.get('orientation'):
+                orientation = elements.get('orientation')
         except:
-            font_large = ImageFont.load_default()
-        
-        # Posición según orientación
-        if orientation == "horizontal":
-            # Logo/header en esquina superior izquierda
-            draw.text((mm_a_px(4), alto_px - mm_a_px(16)), 
-                     company_name[:20], fill='#FFFFFF', font=font_large)
-            
-            # Foto
-            photo_x = mm_a_px(4)
-            photo_y = alto_px - mm_a_px(32 + 28)  # 32mm desde arriba + altura foto
-            photo_w = mm_a_px(22)
-            photo_h = mm_a_px(28)
-        else:  # vertical
-            # Logo/header centrado arriba
-            text_width = draw.textlength(company_name[:20], font=font_large)
-            draw.text((ancho_px/2 - text_width/2, alto_px - mm_a_px(16)), 
-                     company_name[:20], fill='#FFFFFF', font=font_large)
-            
-            # Foto centrada
-            photo_w = mm_a_px(30)
-            photo_h = mm_a_px(38)
-            photo_x = (ancho_px - photo_w) / 2
-            photo_y = alto_px - mm_a_px(45)  # 45mm desde arriba
-        
-        # --- AGREGAR FOTO ---
-        if card.photo and os.path.exists(card.photo.path):
-            try:
-                photo = Image.open(card.photo.path).convert('RGB')
-                photo = photo.resize((photo_w, photo_h), Image.Resampling.LANCZOS)
-                bg.paste(photo, (int(photo_x), int(photo_y)))
-                print(f"  📸 Foto agregada: {photo_w}×{photo_h}px")
-            except Exception as e:
-                print(f"  ⚠️  Error foto: {e}")
-                # Placeholder gris
-                draw.rectangle([photo_x, photo_y, photo_x+photo_w, photo_y+photo_h], 
-                             fill='#666666')
-        else:
-            # Placeholder
+            pass
+    return orientation
+
+def render_card_png(card):
+    """
+    Dibuja la tarjeta en tamaño CR80 y devuelve (PNG en bytes, orientación).
+    No guarda nada: con la plantilla y la empresa ya cargadas no toca la
+    base de datos, así que puede ejecutarse en otro proceso (cards/rendering.py).
+    """
+    # 1. OBTENER CONFIGURACIÓN
+    template = card.template
+    orientation = get_preview_orientation(card)
+    
+    # 2. DIMENSIONES EXACTAS CR80
+    ancho_px, alto_px = get_card_dimensions(orientation)
+    logger.debug("Dimensiones: %s×%spx (%s)", ancho_px, alto_px, orientation)
+    
+    # 3. CREAR FONDO
+    bg_color = '#1E3A8A'  # Azul oscuro por defecto
+    if template and template.background_color:
+        bg_color = template.background_color
+    
+    logger.debug("Fondo: %s", bg_color)
+    bg = Image.new('RGB', (ancho_px, alto_px), bg_color)
+    draw = ImageDraw.Draw(bg)
+    
+    # 4. AGREGAR ELEMENTOS BÁSICOS (siempre visibles)
+    
+    # --- NOMBRE DE LA COMPAÑÍA ---
+    company_name = card.company.name if card.company else "EMPRESA"
+    try:
+        # Intentar cargar fuente Helvetica-Bold
+        font_large = ImageFont.truetype("arialbd.ttf", 16)  # 16px ≈ 12pt
+    except:
+        font_large = ImageFont.load_default()
+    
+    # Posición según orientación
+    if orientation == "horizontal":
+        # Logo/header en esquina superior izquierda
+        draw.text((mm_a_px(4), alto_px - mm_a_px(16)), 
+                 company_name[:20], fill='#FFFFFF', font=font_large)
+        
+        # Foto
+        photo_x = mm_a_px(4)
+        photo_y = alto_px - mm_a_px(32 + 28)  # 32mm desde arriba + altura foto
+        photo_w = mm_a_px(22)
+        photo_h = mm_a_px(28)
+    else:  # vertical
+        # Logo/header centrado arriba
+        text_width = draw.textlength(company_name[:20], font=font_large)
+        draw.text((ancho_px/2 - text_width/2, alto_px - mm_a_px(16)), 
+                 company_name[:20], fill='#FFFFFF', font=font_large)
+        
+        # Foto centrada
+        photo_w = mm_a_px(30)
+        photo_h = mm_a_px(38)
+        photo_x = (ancho_px - photo_w) / 2
+        photo_y = alto_px - mm_a_px(45)  # 45mm desde arriba
+    
+    # --- AGREGAR FOTO ---
+    if card.photo and os.path.exists(card.photo.path):
+        try:
+            photo = Image.open(card.photo.path).convert('RGB')
+            photo = photo.resize((photo_w, photo_h), Image.Resampling.LANCZOS)
+            bg.paste(photo, (int(photo_x), int(photo_y)))
+            logger.debug("Foto agregada: %s×%spx", photo_w, photo_h)
+        except Exception as e:
+            logger.warning("Error con la foto de %s: %s", card.card_number, e)
+            # Placeholder gris
             draw.rectangle([photo_x, photo_y, photo_x+photo_w, photo_y+photo_h], 
                          fill='#666666')
-            print(f"  ⚠️  Sin foto, usando placeholder")
-        
-        # --- AGREGAR TEXTO PERSONAL ---
-        espaciado_px = mm_a_px(6)
-        
-        # Nombre debajo de la foto
-        nombre_y = photo_y - espaciado_px
+    else:
+        # Placeholder
+        draw.rectangle([photo_x, photo_y, photo_x+photo_w, photo_y+photo_h], 
+                     fill='#666666')
+        logger.debug("Sin foto, se usa un recuadro")
+    
+    # --- AGREGAR TEXTO PERSONAL ---
+    espaciado_px = mm_a_px(6)
+    
+    # Nombre debajo de la foto
+    nombre_y = photo_y - espaciado_px
+    try:
+        font_nombre = ImageFont.truetype("arialbd.ttf", 14)  # 14px ≈ 10.5pt
+    except:
+        font_nombre = ImageFont.load_default()
+    
+    # Centrar texto según orientación
+    if orientation == "horizontal":
+        nombre_x = ancho_px / 2
+        text_align = "center"
+    else:
+        nombre_x = ancho_px / 2
+        text_align = "center"
+    
+    draw.text((nombre_x - draw.textlength(card.person_name[:25], font=font_nombre)/2, 
+              nombre_y), 
+             card.person_name[:25], fill='#FFFFFF', font=font_nombre)
+    
+    # Cargo debajo del nombre
+    if card.person_title:
+        cargo_y = nombre_y - espaciado_px
         try:
-            font_nombre = ImageFont.truetype("arialbd.ttf", 14)  # 14px ≈ 10.5pt
+            font_cargo = ImageFont.truetype("arial.ttf", 10)  # 10px ≈ 7.5pt
         except:
-            font_nombre = ImageFont.load_default()
-        
-        # Centrar texto según orientación
-        if orientation == "horizontal":
-            nombre_x = ancho_px / 2
-            text_align = "center"
-        else:
-            nombre_x = ancho_px / 2
-            text_align = "center"
-        
-        draw.text((nombre_x - draw.textlength(card.person_name[:25], font=font_nombre)/2, 
-                  nombre_y), 
-                 card.person_name[:25], fill='#FFFFFF', font=font_nombre)
-        
-        # Cargo debajo del nombre
-        if card.person_title:
-            cargo_y = nombre_y - espaciado_px
-            try:
-                font_cargo = ImageFont.truetype("arial.ttf", 10)  # 10px ≈ 7.5pt
-            except:
-                font_cargo = ImageFont.load_default()
-            
-            draw.text((nombre_x - draw.textlength(card.person_title[:30], font=font_cargo)/2,
-                      cargo_y),
-                     card.person_title[:30], fill='#E5E7EB', font=font_cargo)
-        
-        # --- AGREGAR CÓDIGO DE BARRAS ---
-        barcode_y = mm_a_px(15)  # 15mm desde abajo
-        barcode_h = mm_a_px(15)  # 15mm de alto
-        barcode_w = mm_a_px(50)  # 50mm de ancho
-        barcode_x = (ancho_px - barcode_w) / 2  # Centrado
+            font_cargo = ImageFont.load_default()
         
-        if card.barcode_image and os.path.exists(card.barcode_image.path):
-            try:
-                barcode_img = Image.open(card.barcode_image.path).convert('RGB')
-                barcode_img = barcode_img.resize((int(barcode_w), int(barcode_h)), 
-                                                Image.Resampling.LANCZOS)
-                bg.paste(barcode_img, (int(barcode_x), int(barcode_y)))
-                print(f"  📊 Código de barras agregado")
-            except Exception as e:
-                print(f"  ⚠️  Error barcode imagen: {e}")
-                # Dibujar barcode simple
-                draw.rectangle([barcode_x, barcode_y, barcode_x+barcode_w, barcode_y+barcode_h], 
-                             fill='#FFFFFF')
-                barcode_text = card.barcode_data or card.id_number or card.card_number
-                if barcode_text:
-                    draw.text((barcode_x + 10, barcode_y + barcode_h/2 - 5), 
-                             barcode_text[:20], fill='#000000')
-        else:
-            # Generar barcode simple
+        draw.text((nombre_x - draw.textlength(card.person_title[:30], font=font_cargo)/2,
+                  cargo_y),
+                 card.person_title[:30], fill='#E5E7EB', font=font_cargo)
+    
+    # --- AGREGAR CÓDIGO DE BARRAS ---
+    barcode_y = mm_a_px(15)  # 15mm desde abajo
+    barcode_h = mm_a_px(15)  # 15mm de alto
+    barcode_w = mm_a_px(50)  # 50mm de ancho
+    barcode_x = (ancho_px - barcode_w) / 2  # Centrado
+    
+    if card.barcode_image and os.path.exists(card.barcode_image.path):
+        try:
+            barcode_img = Image.open(card.barcode_image.path).convert('RGB')
+            barcode_img = barcode_img.resize((int(barcode_w), int(barcode_h)), 
+                                            Image.Resampling.LANCZOS)
+            bg.paste(barcode_img, (int(barcode_x), int(barcode_y)))
+            logger.debug("Código de barras agregado")
+        except Exception as e:
+            logger.warning("Error con el código de barras de %s: %s", card.card_number, e)
+            # Dibujar barcode simple
+            draw.rectangle([barcode_x, barcode_y, barcode_x+barcode_w, barcode_y+barcode_h], 
+                         fill='#FFFFFF')
             barcode_text = card.barcode_data or card.id_number or card.card_number
             if barcode_text:
-                draw.rectangle([barcode_x, barcode_y, barcode_x+barcode_w, barcode_y+barcode_h], 
-                             fill='#FFFFFF')
                 draw.text((barcode_x + 10, barcode_y + barcode_h/2 - 5), 
                          barcode_text[:20], fill='#000000')
-                print(f"  📊 Barcode simple: {barcode_text[:20]}")
-        
-        # --- ID EN PARTE INFERIOR ---
-        id_text = f"ID: {card.id_number}" if card.id_number else f"ID: {card.card_number}"
+    else:
+        # Generar barcode simple
+        barcode_text = card.barcode_data or card.id_number or card.card_number
+        if barcode_text:
+            draw.rectangle([barcode_x, barcode_y, barcode_x+barcode_w, barcode_y+barcode_h], 
+                         fill='#FFFFFF')
+            draw.text((barcode_x + 10, barcode_y + barcode_h/2 - 5), 
+                     barcode_text[:20], fill='#000000')
+            logger.debug("Código de barras simple: %s", barcode_text[:20])
+    
+    # --- ID EN PARTE INFERIOR ---
+    id_text = f"ID: {card.id_number}" if card.id_number else f"ID: {card.card_number}"
+    try:
+        font_id = ImageFont.truetype("arialbd.ttf", 9)  # 9px ≈ 6.75pt
+    except:
+        font_id = ImageFont.load_default()
+    
+    id_y = mm_a_px(5)
+    text_width = draw.textlength(id_text, font=font_id)
+    draw.text((ancho_px/2 - text_width/2, id_y), 
+             id_text, fill='#FFFFFF', font=font_id)
+    
+    # 5. IMAGEN CON METADATA DPI
+    buffer = BytesIO()
+    bg.save(buffer, format='PNG', dpi=(DPI, DPI))
+    return buffer.getvalue(), orientation
+
+def render_card_back_png(card):
+    """
+    Dibuja el reverso de la tarjeta (empresa, QR o código de barras, número
+    y vigencia) y devuelve (PNG en bytes, orientación). Igual que
+    render_card_png, no guarda nada.
+    """
+    template = card.template
+    orientation = get_preview_orientation(card)
+    ancho_px, alto_px = get_card_dimensions(orientation)
+    
+    bg_color = '#1E3A8A'
+    if template and template.background_color:
+        bg_color = template.background_color
+    bg = Image.new('RGB', (ancho_px, alto_px), bg_color)
+    draw = ImageDraw.Draw(bg)
+    
+    # Texto claro u oscuro según el fondo (igual que en el PDF)
+    try:
+        brightness = (int(bg_color[1:3], 16) * 299 + int(bg_color[3:5], 16) * 587 + int(bg_color[5:7], 16) * 114) / 1000
+        color_texto = '#FFFFFF' if brightness < 128 else '#111827'
+    except:
+        color_texto = '#FFFFFF'
+    
+    try:
+        font_titulo = ImageFont.truetype("arialbd.ttf", 16)
+        font_texto = ImageFont.truetype("arial.ttf", 10)
+    except:
+        font_titulo = font_texto = ImageFont.load_default()
+    
+    def centrado(texto, y, font):
+        draw.text((ancho_px/2 - draw.textlength(texto, font=font)/2, y), texto, fill=color_texto, font=font)
+    
+    company_name = card.company.name if card.company else "EMPRESA"
+    centrado(company_name[:25], mm_a_px(5), font_titulo)
+    
+    # --- QR (o código de barras) sobre un recuadro blanco ---
+    lado = mm_a_px(30 if orientation == "vertical" else 26)
+    code_x = int((ancho_px - lado) / 2)
+    code_y = int(alto_px / 2 - lado / 2)
+    draw.rectangle([code_x, code_y, code_x + lado, code_y + lado], fill='#FFFFFF')
+    code_file = card.qr_code or card.barcode_image
+    if code_file and os.path.exists(code_file.path):
         try:
-            font_id = ImageFont.truetype("arialbd.ttf", 9)  # 9px ≈ 6.75pt
-        except:
-            font_id = ImageFont.load_default()
-        
-        id_y = mm_a_px(5)
-        text_width = draw.textlength(id_text, font=font_id)
-        draw.text((ancho_px/2 - text_width/2, id_y), 
-                 id_text, fill='#FFFFFF', font=font_id)
-        
-        # 5. GUARDAR IMAGEN CON METADATA DPI
-        buffer = BytesIO()
-        bg.save(buffer, format='PNG', dpi=(DPI, DPI))
-        buffer.seek(0)
+            code_img = Image.open(code_file.path).convert('RGB')
+            code_img.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+            bg.paste(code_img, (code_x + (lado - code_img.width) // 2, code_y + (lado - code_img.height) // 2))
+        except Exception as e:
+            logger.warning("Error con el código del reverso de %s: %s", card.card_number, e)
+    
+    # --- NÚMERO Y VIGENCIA ---
+    texto_y = code_y + lado + mm_a_px(3)
+    centrado(f"Tarjeta {card.card_number}", texto_y, font_texto)
+    if card.valid_from or card.expiration_date:
+        desde = card.valid_from.strftime('%d/%m/%Y') if card.valid_from else '-'
+        hasta = card.expiration_date.strftime('%d/%m/%Y') if card.expiration_date else '-'
+        centrado(f"Vigencia: {desde} - {hasta}", texto_y + mm_a_px(4), font_texto)
+    
+    centrado("Tarjeta personal e intransferible", alto_px - mm_a_px(6), font_texto)
+    
+    buffer = BytesIO()
+    bg.save(buffer, format='PNG', dpi=(DPI, DPI))
+    return buffer.getvalue(), orientation
+
+def generate_card_preview(card):
+    """Genera imagen de la tarjeta en tamaño CR80 exacto"""
+    from cards.models import IDCard
+    from companies.generations import bump_generation
+    from companies.stats import sync_card_media_bytes
+    
+    logger.debug("Generando vista previa de %s", card.card_number)
+    
+    try:
+        png, orientation = render_card_png(card)
         
         # Eliminar anterior si existe
         if card.composite_image:
@@ -255,195 +366,262 @@ def generate_card_preview(card):
             except:
                 pass
         
-        # Guardar nueva imagen
+        # Guardar nueva imagen (con la versión de plantilla usada): solo estas
+        # columnas, sin pisar cambios hechos mientras se dibujaba
+        card.pin_template_version()
         card.composite_image.save(f'card_{card.id}_{orientation}.png', 
-                                 ContentFile(buffer.read()))
-        card.save()
+                                 ContentFile(png), save=False)
+        IDCard.objects.filter(pk=card.pk).update(
+            composite_image=card.composite_image.name,
+            template_version=card.template_version_id,
+        )
+        bump_generation(card.company_id)
+        sync_card_media_bytes(card)
         
-        print(f"✅ Tarjeta generada exitosamente: {ancho_px}×{alto_px}px")
+        ancho_px, alto_px = get_card_dimensions(orientation)
+        logger.debug("Vista previa generada: %s×%spx", ancho_px, alto_px)
         
         # pdf_path = generate_card_pdf(card, os.path.join(output_dir, f"{card.card_number}.pdf"))
         
         return True
         
-    except Exception as e:
-        print(f"❌ ERROR en generate_card_preview: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error generando la vista previa de %s", card.card_number)
         return False
 
+def get_pdf_orientation(card):
+    """Orientación del PDF según la plantilla (horizontal por defecto)"""
+    template = card.template
+    # orientation = "vertical"  # Por defecto
+    orientation = "horizontal"  # Por defecto
+    
+    if template and hasattr(template, 'elements'):
+        try:
+            elements = json.loads(template.elements) if isinstance(template.elements, str) else template.elements
+            if elements.get('orientation'):
+                orientation = elements.get('orientation')
+        except:
+            pass
+    return orientation
+
+def get_pdf_page_size(orientation):
+    """Tamaño de página CR80 en puntos (ancho, alto)"""
+    MEDIDA_LARGA = CR80_LARGO_MM * mm  # 85.6mm
+    MEDIDA_CORTA = CR80_CORTO_MM * mm  # 53.98mm
+    
+    if orientation == "horizontal":
+        return MEDIDA_LARGA, MEDIDA_CORTA
+    return MEDIDA_CORTA, MEDIDA_LARGA  # Vertical
+
+def draw_card_pdf_page(c, card, ancho_util, alto_util, orientation):
+    """Dibuja una tarjeta en la página actual del canvas"""
+    template = card.template
+    
+    # 5. FONDO
+    bg_color = '#1E3A8A'  # Por defecto
+    if template and template.background_color:
+        bg_color = template.background_color
+
+    c.setFillColor(HexColor(bg_color))
+    c.rect(0, 0, ancho_util, alto_util, fill=1, stroke=0)
+
+    # 6. FOTO PERSONAL (USANDO TU CÓDIGO EXACTO)
+    if orientation == "horizontal":
+        tam_foto_w, tam_foto_h = 22 * mm, 28 * mm
+        pos_y_foto = alto_util - 32 * mm  # Posición desde abajo
+    else:  # vertical
+        tam_foto_w, tam_foto_h = 30 * mm, 38 * mm
+        pos_y_foto = alto_util - 45 * mm
+
+    pos_x_foto = (ancho_util - tam_foto_w) / 2  # Centrado
+
+    if card.photo and os.path.exists(card.photo.path):
+        try:
+            c.drawImage(card.photo.path, pos_x_foto, pos_y_foto, 
+                      width=tam_foto_w, height=tam_foto_h, 
+                      preserveAspectRatio=True, mask='auto')
+            logger.debug("Foto en PDF: %.1f×%.1fmm", tam_foto_w / mm, tam_foto_h / mm)
+        except Exception as e:
+            logger.warning("Error con la foto en el PDF de %s: %s", card.card_number, e)
+            c.setFillColor(grey)
+            c.rect(pos_x_foto, pos_y_foto, tam_foto_w, tam_foto_h, fill=1, stroke=0)
+    else:
+        c.setFillColor(grey)
+        c.rect(pos_x_foto, pos_y_foto, tam_foto_w, tam_foto_h, fill=1, stroke=0)
+
+    # 7. LOGO DE COMPAÑÍA (opcional)
+    if card.company and card.company.logo and os.path.exists(card.company.logo.path):
+        try:
+            logo_w = 12 * mm
+            c.drawImage(card.company.logo.path, 4 * mm, alto_util - 16 * mm, 
+                      width=logo_w, height=logo_w, 
+                      preserveAspectRatio=True, mask='auto')
+            logger.debug("Logo en PDF")
+        except Exception as e:
+            logger.warning("Error con el logo en el PDF de %s: %s", card.card_number, e)
+
+    # 8. TEXTOS (USANDO TU CÓDIGO EXACTO)
+    # Decidir color de texto según fondo
+    try:
+        # Convertir hex a RGB para determinar brillo
+        bg_r = int(bg_color[1:3], 16)
+        bg_g = int(bg_color[3:5], 16)
+        bg_b = int(bg_color[5:7], 16)
+        brightness = (bg_r * 299 + bg_g * 587 + bg_b * 114) / 1000
+        es_oscuro = brightness < 128
+    except:
+        es_oscuro = True  # Por defecto texto blanco
+
+    c.setFillColor(white if es_oscuro else black)
+
+    # El nombre se ubica debajo de la foto
+    espaciado = 6 * mm
+    pos_y_nombre = pos_y_foto - espaciado
+
+    # Nombre
+    c.setFont("Helvetica-Bold", 14 if orientation == "vertical" else 12)
+    c.drawCentredString(ancho_util / 2, pos_y_nombre, card.person_name[:25])
+
+    # Cargo
+    if card.person_title:
+        pos_y_cargo = pos_y_nombre - espaciado
+        c.setFont("Helvetica", 10 if orientation == "vertical" else 9)
+        c.drawCentredString(ancho_util / 2, pos_y_cargo, card.person_title[:30])
+
+    # ID en la parte inferior
+    id_text = f"ID: {card.id_number}" if card.id_number else f"ID: {card.card_number}"
+    c.setFont("Helvetica-Bold", 9)
+    c.drawCentredString(ancho_util / 2, 5 * mm, id_text)
+
+    # 9. CÓDIGO DE BARRAS EN PDF
+    if card.barcode_image and os.path.exists(card.barcode_image.path):
+        try:
+            barcode_w = 50 * mm
+            barcode_h = 15 * mm
+            barcode_x = (ancho_util - barcode_w) / 2
+            barcode_y = 15 * mm  # 15mm desde abajo
+
+            c.drawImage(card.barcode_image.path, barcode_x, barcode_y,
+                      width=barcode_w, height=barcode_h,
+                      preserveAspectRatio=True, mask='auto')
+            logger.debug("Código de barras en PDF: %.1f×%.1fmm", barcode_w / mm, barcode_h / mm)
+        except Exception as e:
+            logger.warning("Error con el código de barras en el PDF de %s: %s", card.card_number, e)
+            # Dibujar texto simple
+            barcode_text = card.barcode_data or card.id_number or card.card_number
+            if barcode_text:
+                c.setFillColor(white if es_oscuro else black)
+                c.setFont("Helvetica", 8)
+                c.drawCentredString(ancho_util / 2, 10 * mm, barcode_text[:20])
+
+    # 10. MARCAS DE CORTE (opcional, para imprenta)
+    c.setLineWidth(0.25)
+    c.setStrokeColor(black)
+
+    # Esquinas
+    marca_largo = 5 * mm
+    for corner in [(0, 0), (ancho_util, 0), (0, alto_util), (ancho_util, alto_util)]:
+        x, y = corner
+        # Línea horizontal
+        c.line(x, y, x + (marca_largo if x == 0 else -marca_largo), y)
+        # Línea vertical
+        c.line(x, y, x, y + (marca_largo if y == 0 else -marca_largo))
+
+def render_card_pdf(card, side='front'):
+    """
+    PDF CR80 de una página en bytes, sin guardarlo (ver render_card_png).
+    El reverso se dibuja como imagen a página completa.
+    """
+    if side == 'back':
+        png, orientation = render_card_back_png(card)
+    else:
+        orientation = get_pdf_orientation(card)
+    ancho_util, alto_util = get_pdf_page_size(orientation)
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(ancho_util, alto_util))
+    if side == 'back':
+        c.drawImage(ImageReader(BytesIO(png)), 0, 0, width=ancho_util, height=alto_util)
+    else:
+        draw_card_pdf_page(c, card, ancho_util, alto_util, orientation)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
 def generate_card_pdf(card, output_path=None):
     """Genera PDF de la tarjeta en tamaño CR80 exacto - BASADO EN TU CÓDIGO"""
-    print(f"\n📄 GENERANDO PDF para {card.person_name}")
+    logger.debug("Generando PDF de %s", card.card_number)
     
     try:
         # 1. OBTENER CONFIGURACIÓN
-        template = card.template
-        # orientation = "vertical"  # Por defecto
-        orientation = "horizontal"  # Por defecto
-        
-        if template and hasattr(template, 'elements'):
-            try:
-                elements = json.loads(template.elements) if isinstance(template.elements, str) else template.elements
-                if elements.get('orientation'):
-                    orientation = elements.get('orientation')
-            except:
-                pass
+        orientation = get_pdf_orientation(card)
         
         # 2. CONFIGURAR DIMENSIONES (USANDO TU CÓDIGO EXACTO)
-        MEDIDA_LARGA = CR80_LARGO_MM * mm  # 85.6mm
-        MEDIDA_CORTA = CR80_CORTO_MM * mm  # 53.98mm
+        ancho_util, alto_util = get_pdf_page_size(orientation)
         
-        if orientation == "horizontal":
-            ancho_util = MEDIDA_LARGA
-            alto_util = MEDIDA_CORTA
-        else:  # Vertical (default)
-            ancho_util = MEDIDA_CORTA
-            alto_util = MEDIDA_LARGA
-        
-        print(f"  📏 PDF Dimensiones: {CR80_LARGO_MM}×{CR80_CORTO_MM}mm ({orientation})")
-        print(f"  📏 PDF Puntos: {ancho_util/mm:.1f}×{alto_util/mm:.1f}mm")
+        logger.debug("PDF: %s×%smm (%s)", CR80_LARGO_MM, CR80_CORTO_MM, orientation)
         
         # 3. CREAR NOMBRE DE ARCHIVO
         if not output_path:
-            output_dir = os.path.join('media', 'card_pdfs')
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, f"carnet_{card.card_number}.pdf")
+            # Ruta repartida por empresa/hash (ver companies/uploads.py)
+            relative_path = card.pdf_file.field.generate_filename(card, f"carnet_{card.card_number}.pdf")
+            output_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        else:
+            relative_path = output_path.replace('media/', '')
         
         # 4. CREAR CANVAS (USANDO TU CÓDIGO)
         c = canvas.Canvas(output_path, pagesize=(ancho_util, alto_util))
         
-        # 5. FONDO
-        bg_color = '#1E3A8A'  # Por defecto
-        if template and template.background_color:
-            bg_color = template.background_color
-        
-        c.setFillColor(HexColor(bg_color))
-        c.rect(0, 0, ancho_util, alto_util, fill=1, stroke=0)
-        
-        # 6. FOTO PERSONAL (USANDO TU CÓDIGO EXACTO)
-        if orientation == "horizontal":
-            tam_foto_w, tam_foto_h = 22 * mm, 28 * mm
-            pos_y_foto = alto_util - 32 * mm  # Posición desde abajo
-        else:  # vertical
-            tam_foto_w, tam_foto_h = 30 * mm, 38 * mm
-            pos_y_foto = alto_util - 45 * mm
-        
-        pos_x_foto = (ancho_util - tam_foto_w) / 2  # Centrado
-        
-        if card.photo and os.path.exists(card.photo.path):
-            try:
-                c.drawImage(card.photo.path, pos_x_foto, pos_y_foto, 
-                          width=tam_foto_w, height=tam_foto_h, 
-                          preserveAspectRatio=True, mask='auto')
-                print(f"  📸 Foto en PDF: {tam_foto_w/mm:.1f}×{tam_foto_h/mm:.1f}mm")
-            except Exception as e:
-                print(f"  ⚠️  Error foto PDF: {e}")
-                c.setFillColor(grey)
-                c.rect(pos_x_foto, pos_y_foto, tam_foto_w, tam_foto_h, fill=1, stroke=0)
-        else:
-            c.setFillColor(grey)
-            c.rect(pos_x_foto, pos_y_foto, tam_foto_w, tam_foto_h, fill=1, stroke=0)
-        
-        # 7. LOGO DE COMPAÑÍA (opcional)
-        if card.company and card.company.logo and os.path.exists(card.company.logo.path):
-            try:
-                logo_w = 12 * mm
-                c.drawImage(card.company.logo.path, 4 * mm, alto_util - 16 * mm, 
-                          width=logo_w, height=logo_w, 
-                          preserveAspectRatio=True, mask='auto')
-                print(f"  🏢 Logo en PDF")
-            except Exception as e:
-                print(f"  ⚠️  Error logo PDF: {e}")
-        
-        # 8. TEXTOS (USANDO TU CÓDIGO EXACTO)
-        # Decidir color de texto según fondo
-        try:
-            # Convertir hex a RGB para determinar brillo
-            bg_r = int(bg_color[1:3], 16)
-            bg_g = int(bg_color[3:5], 16)
-            bg_b = int(bg_color[5:7], 16)
-            brightness = (bg_r * 299 + bg_g * 587 + bg_b * 114) / 1000
-            es_oscuro = brightness < 128
-        except:
-            es_oscuro = True  # Por defecto texto blanco
-        
-        c.setFillColor(white if es_oscuro else black)
-        
-        # El nombre se ubica debajo de la foto
-        espaciado = 6 * mm
-        pos_y_nombre = pos_y_foto - espaciado
-        
-        # Nombre
-        c.setFont("Helvetica-Bold", 14 if orientation == "vertical" else 12)
-        c.drawCentredString(ancho_util / 2, pos_y_nombre, card.person_name[:25])
-        
-        # Cargo
-        if card.person_title:
-            pos_y_cargo = pos_y_nombre - espaciado
-            c.setFont("Helvetica", 10 if orientation == "vertical" else 9)
-            c.drawCentredString(ancho_util / 2, pos_y_cargo, card.person_title[:30])
-        
-        # ID en la parte inferior
-        id_text = f"ID: {card.id_number}" if card.id_number else f"ID: {card.card_number}"
-        c.setFont("Helvetica-Bold", 9)
-        c.drawCentredString(ancho_util / 2, 5 * mm, id_text)
-        
-        # 9. CÓDIGO DE BARRAS EN PDF
-        if card.barcode_image and os.path.exists(card.barcode_image.path):
-            try:
-                barcode_w = 50 * mm
-                barcode_h = 15 * mm
-                barcode_x = (ancho_util - barcode_w) / 2
-                barcode_y = 15 * mm  # 15mm desde abajo
-                
-                c.drawImage(card.barcode_image.path, barcode_x, barcode_y,
-                          width=barcode_w, height=barcode_h,
-                          preserveAspectRatio=True, mask='auto')
-                print(f"  📊 Barcode en PDF: {barcode_w/mm:.1f}×{barcode_h/mm:.1f}mm")
-            except Exception as e:
-                print(f"  ⚠️  Error barcode PDF: {e}")
-                # Dibujar texto simple
-                barcode_text = card.barcode_data or card.id_number or card.card_number
-                if barcode_text:
-                    c.setFillColor(white if es_oscuro else black)
-                    c.setFont("Helvetica", 8)
-                    c.drawCentredString(ancho_util / 2, 10 * mm, barcode_text[:20])
-        
-        # 10. MARCAS DE CORTE (opcional, para imprenta)
-        c.setLineWidth(0.25)
-        c.setStrokeColor(black)
-        
-        # Esquinas
-        marca_largo = 5 * mm
-        for corner in [(0, 0), (ancho_util, 0), (0, alto_util), (ancho_util, alto_util)]:
-            x, y = corner
-            # Línea horizontal
-            c.line(x, y, x + (marca_largo if x == 0 else -marca_largo), y)
-            # Línea vertical
-            c.line(x, y, x, y + (marca_largo if y == 0 else -marca_largo))
+        # 5-10. CONTENIDO DE LA TARJETA
+        draw_card_pdf_page(c, card, ancho_util, alto_util, orientation)
         
         # 11. GUARDAR PDF
         c.showPage()
         c.save()
         
-        print(f"✅ PDF bar code generado: {output_path}")
-        print(f"   Tamaño físico: {ancho_util/mm:.1f}×{alto_util/mm:.1f}mm")
+        logger.debug("PDF generado: %s (%.1f×%.1fmm)", output_path, ancho_util / mm, alto_util / mm)
         
-        # Guardar referencia en el modelo
-        card.pdf_file.name = output_path.replace('media/', '')
+        # Guardar referencia en el modelo (con la versión de plantilla usada)
+        card.pdf_file.name = relative_path
+        card.pin_template_version()
         card.save()
         
         return output_path
         
-    except Exception as e:
-        print(f"❌ ERROR generando PDF: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error generando el PDF de %s", card.card_number)
         return None
 
-def export_cards_to_pdf_batch(card_ids=None, output_dir=None):
-    """Exporta múltiples tarjetas a PDF en lote"""
+def generate_batch_pdf(cards, output_path):
+    """
+    Genera un solo PDF con una página CR80 por tarjeta (trabajo de impresión).
+    Devuelve (ids_ok, ids_fallidos).
+    """
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    c = canvas.Canvas(output_path)
+    ok, failed = [], []
+    
+    for card in cards:
+        try:
+            orientation = get_pdf_orientation(card)
+            ancho_util, alto_util = get_pdf_page_size(orientation)
+            c.setPageSize((ancho_util, alto_util))
+            draw_card_pdf_page(c, card, ancho_util, alto_util, orientation)
+            c.showPage()
+            ok.append(card.pk)
+        except Exception:
+            logger.exception("Error en la página de %s", card.card_number)
+            failed.append(card.pk)
+    
+    c.save()
+    logger.info("PDF de impresión generado: %s (%s páginas)", output_path, len(ok))
+    return ok, failed
+
+def export_cards_to_pdf_batch(card_ids=None, output_dir=None, progress=None):
+    """
+    Exporta múltiples tarjetas a PDF en lote.
+    `progress` (cards.progress.ProgressTracker) recibe el avance por tarjeta.
+    """
     from cards.models import IDCard
     
     if not output_dir:
@@ -454,8 +632,11 @@ def export_cards_to_pdf_batch(card_ids=None, output_dir=None):
         cards = IDCard.objects.filter(id__in=card_ids)
     else:
         cards = IDCard.objects.filter(status='active')
+    cards = list(cards.select_related('template', 'company'))
     
-    print(f"\n📦 Exportando {cards.count()} tarjetas a PDF...")
+    print(f"\n📦 Exportando {len(cards)} tarjetas a PDF...")
+    if progress is not None:
+        progress.total = len(cards)
     
     pdf_files = []
     for i, card in enumerate(cards, 1):
@@ -464,8 +645,41 @@ def export_cards_to_pdf_batch(card_ids=None, output_dir=None):
         pdf_path = generate_card_pdf(card, os.path.join(output_dir, f"{card.card_number}.pdf"))
         if pdf_path:
             pdf_files.append(pdf_path)
+        if progress is not None:
+            progress.advance(ok=1 if pdf_path else 0, failed=0 if pdf_path else 1)
     
     print(f"\n🎉 Exportación completada: {len(pdf_files)} PDFs generados")
     print(f"📁 Carpeta: {os.path.abspath(output_dir)}")
     
-    return pdf_files
\ No newline at end of file
+    if progress is not None:
+        progress.finish(
+            result={'pdf_files': len(pdf_files), 'output_dir': os.path.abspath(output_dir)},
+            message=f'{len(pdf_files)} PDFs generados',
+        )
+    return pdf_files
+
+def generate_cards_batch(card_ids, generator, progress=None):
+    """
+    Aplicar generate_card_preview o generate_card_pdf a varias tarjetas
+    (acciones del admin). Devuelve (correctas, fallidas).
+    """
+    from cards.models import IDCard
+    
+    ok = failed = 0
+    cards = IDCard.objects.filter(pk__in=card_ids).select_related('template', 'company')
+    for card in cards.iterator(chunk_size=200):
+        try:
+            result = generator(card)
+        except Exception as e:
+            logger.warning("Error con %s: %s", card.card_number, e)
+            result = None
+        if result:
+            ok += 1
+        else:
+            failed += 1
+        if progress is not None:
+            progress.advance(ok=1 if result else 0, failed=0 if result else 1)
+    
+    if progress is not None:
+        progress.finish(result={'ok': ok, 'failed': failed}, message=f'{ok} correctas, {failed} con error')
+    return ok, failed
@@ -1,32 +1,55 @@
 from rest_framework import viewsets, status, filters, generics
-from rest_framework.decorators import action, permission_classes
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.db.models import Count, Q
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 import uuid
-import barcode
-from barcode.writer import ImageWriter
-from io import BytesIO
-from django.core.files.base import ContentFile
-from PIL import Image, ImageDraw, ImageFont
 import os
-from datetime import date
+from datetime import timedelta
 
-from .models import CardTemplate, IDCard
-from .serializers import CardTemplateSerializer, IDCardSerializer
+from .models import CardTemplate, IDCard, PrintJob, RerenderRun
+from .search import NormalizedSearchFilter
+from .serializers import (
+    CardTemplateSerializer, CardTemplateVersionSerializer, IDCardSerializer, CardBulkUpdateSerializer,
+    PrintJobSerializer, PrintJobCreateSerializer, PrintJobCompleteSerializer,
+    RerenderRunSerializer, RerenderRunCreateSerializer,
+)
+from .archives import ARCHIVE_FILES, stream_cards_zip
+from .assets import generate_card_assets
+from .bulk import bulk_update_cards
+from .progress import (
+    EventStreamRenderer, ProgressTracker, can_view_progress, event_stream, get_progress, run_in_background,
+)
+from .rerender import is_stalled, process_rerender_run, stale_summary, start_rerender
+from .printing import (
+    mark_cards_printed, create_print_job, start_print_job, complete_print_job, print_job_throughput,
+)
 from companies.models import Company
-from users.models import CompanyUser
+from companies.quotas import QuotaExceeded, reserve_quota
+from config.db_routers import ReplicaReadMixin, replica_iterator
+from config.fieldsets import SparseFieldsetsViewMixin
+from config.response_cache import cache_response
+from users.authentication import CompanyAPIKeyAuthentication
+from users.permissions import user_company_ids, has_company_permission, get_memberships
 
-class CardTemplateViewSet(viewsets.ModelViewSet):
+class CardTemplateViewSet(ReplicaReadMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar plantillas de tarjetas.
     """
     serializer_class = CardTemplateSerializer
+    # También acepta la API Key de empresa (sincronización servidor a servidor)
+    authentication_classes = [CompanyAPIKeyAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES]
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [NormalizedSearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at', 'version']
     parser_classes = [MultiPartParser, FormParser, JSONParser]
@@ -35,13 +58,13 @@ class CardTemplateViewSet(viewsets.ModelViewSet):
         """
         Filtrar plantillas por empresa y permisos del usuario.
         """
-        user = self.request.user
-        
         # Obtener todas las empresas a las que pertenece el usuario
-        user_companies = CompanyUser.objects.filter(user=user).values_list('company_id', flat=True)
+        user_companies = user_company_ids(self.request)
         
         # Filtrar plantillas de esas empresas
-        queryset = CardTemplate.objects.filter(company_id__in=user_companies)
+        queryset = CardTemplate.objects.filter(company_id__in=user_companies).select_related(
+            'company', 'created_by'
+        )
         
         # Filtrar por empresa si se especifica
         company_id = self.request.query_params.get('company_id')
@@ -65,11 +88,9 @@ class CardTemplateViewSet(viewsets.ModelViewSet):
             
             if company_id:
                 # Verificar si el usuario puede crear/editar plantillas en esta empresa
-                user_permission = CompanyUser.objects.filter(
-                    user=self.request.user,
-                    company_id=company_id,
-                    can_create_templates=True
-                ).exists()
+                user_permission = has_company_permission(
+                    self.request, company_id, 'can_create_templates'
+                )
                 
                 if not user_permission and not self.request.user.is_superuser:
                     from rest_framework.permissions import IsAdminUser
@@ -77,30 +98,28 @@ class CardTemplateViewSet(viewsets.ModelViewSet):
         
         return [IsAuthenticated()]
     
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except QuotaExceeded as e:
+            return e.as_response()
+    
     def perform_create(self, serializer):
         """
         Al crear una plantilla, asignar el usuario actual como creador.
+        El límite del plan se comprueba reservando en el contador de la empresa.
         """
-        company_id = self.request.data.get('company')
-        
-        # Verificar límites de la empresa
-        if company_id:
-            company = Company.objects.get(id=company_id)
-            current_templates = CardTemplate.objects.filter(company=company).count()
-            
-            # Límites por plan (ejemplo)
-            plan_limits = {
-                'free': 3,
-                'basic': 10,
-                'premium': 50,
-                'enterprise': 1000
-            }
-            
-            limit = plan_limits.get(company.subscription_plan, 3)
-            if current_templates >= limit and not self.request.user.is_superuser:
-                raise PermissionError(f'Límite de plantillas alcanzado. Plan actual: {limit} plantillas')
-        
-        serializer.save(created_by=self.request.user)
+        company = serializer.validated_data['company']
+        with reserve_quota(company.id, 'templates', enforce=not self.request.user.is_superuser):
+            serializer.save(created_by=self.request.user)
     
     @action(detail=True, methods=['post'])
     def duplicate(self, request, pk=None):
@@ -110,11 +129,9 @@ class CardTemplateViewSet(viewsets.ModelViewSet):
         original = self.get_object()
         
         # Verificar permisos para crear plantillas en esta empresa
-        user_permission = CompanyUser.objects.filter(
-            user=request.user,
-            company=original.company,
-            can_create_templates=True
-        ).exists()
+        user_permission = has_company_permission(
+            request, original.company_id, 'can_create_templates'
+        )
         
         if not user_permission and not request.user.is_superuser:
             return Response(
@@ -128,12 +145,28 @@ class CardTemplateViewSet(viewsets.ModelViewSet):
         original.name = f"{original.name} (Copia)"
         original.is_default = False
         original.version = 1
+        original.content_hash = ''  # La copia empieza su propio historial de versiones
+        original.current_version = None
         original.created_by = request.user
-        original.save()
+        try:
+            with reserve_quota(original.company_id, 'templates', enforce=not request.user.is_superuser):
+                original.save()
+        except QuotaExceeded as e:
+            return e.as_response()
         
         serializer = self.get_serializer(original)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    @action(detail=True, methods=['get'])
+    def versions(self, request, pk=None):
+        """
+        Historial inmutable del diseño de la plantilla (más reciente primero).
+        """
+        template = self.get_object()
+        versions = template.versions.select_related('created_by')
+        serializer = CardTemplateVersionSerializer(versions, many=True)
+        return Response(serializer.data)
+    
     @action(detail=True, methods=['get'])
     def preview(self, request, pk=None):
         """
@@ -174,13 +207,15 @@ class CardTemplateViewSet(viewsets.ModelViewSet):
         
         return Response(preview_info)
 
-class IDCardViewSet(viewsets.ModelViewSet):
+class IDCardViewSet(ReplicaReadMixin, SparseFieldsetsViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar tarjetas de identificación.
     """
     serializer_class = IDCardSerializer
+    # También acepta la API Key de empresa (sincronización servidor a servidor)
+    authentication_classes = [CompanyAPIKeyAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES]
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [NormalizedSearchFilter, filters.OrderingFilter]
     search_fields = ['card_number', 'person_name', 'id_number', 'employee_id', 'department']
     ordering_fields = ['card_number', 'person_name', 'created_at', 'expiration_date']
     parser_classes = [MultiPartParser, FormParser, JSONParser]
@@ -191,12 +226,11 @@ class IDCardViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         
-        if user.is_superuser:
-            queryset = IDCard.objects.all()
-        else:
+        queryset = IDCard.objects.select_related('template', 'company', 'created_by')
+        if not user.is_superuser:
             # Obtener empresas del usuario
-            user_companies = CompanyUser.objects.filter(user=user).values_list('company_id', flat=True)
-            queryset = IDCard.objects.filter(company_id__in=user_companies)
+            user_companies = user_company_ids(self.request)
+            queryset = queryset.filter(company_id__in=user_companies)
         
         # Filtros adicionales
         company_id = self.request.query_params.get('company_id')
@@ -213,20 +247,43 @@ class IDCardViewSet(viewsets.ModelViewSet):
         
         expired = self.request.query_params.get('expired')
         if expired is not None:
-            today = date.today()
+            # El estado 'expired' lo mantiene el comando expire_cards; las activas
+            # vencidas que aún no procesa salen del índice parcial por fecha
+            today = timezone.localdate()
             if expired.lower() == 'true':
-                queryset = queryset.filter(expiration_date__lt=today)
+                queryset = queryset.filter(
+                    Q(status='expired') | Q(status='active', expiration_date__lt=today)
+                )
             else:
-                queryset = queryset.filter(Q(expiration_date__gte=today) | Q(expiration_date__isnull=True))
+                queryset = queryset.exclude(status='expired').filter(
+                    Q(expiration_date__gte=today) | Q(expiration_date__isnull=True)
+                )
         
         return queryset
     
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except QuotaExceeded as e:
+            return e.as_response()
+    
     def perform_create(self, serializer):
         """
         Crear tarjeta con generación automática de códigos de barras.
         """
-        # Generar número de tarjeta único si no se proporciona
         card_data = serializer.validated_data
+        
+        # Verificar permisos
+        if not self.request.user.is_superuser and not has_company_permission(
+            self.request, card_data['company'].id, 'can_create_cards'
+        ):
+            raise PermissionDenied('No tienes permiso para crear tarjetas en esta empresa')
+        
+        # Generar número de tarjeta único si no se proporciona
         if not card_data.get('card_number'):
             # Generar número basado en empresa y timestamp
             import datetime
@@ -235,85 +292,25 @@ class IDCardViewSet(viewsets.ModelViewSet):
             card_number = f"{company_prefix}-{timestamp}"
             card_data['card_number'] = card_number
         
-        # Generar código de barras
+        # Datos del código de barras (la imagen se genera después del commit, ver cards/assets.py)
         barcode_data = card_data.get('barcode_data') or card_data.get('id_number') or card_data['card_number']
-        barcode_image = self._generate_barcode(barcode_data, card_data.get('barcode_type', 'code128'))
         
         # Asignar usuario creador
         card_data['created_by'] = self.request.user
         
-        # Guardar tarjeta
-        card = serializer.save(
-            barcode_data=barcode_data,
-            barcode_image=barcode_image,
-            created_by=self.request.user
-        )
-        
-        # Generar imagen compuesta (opcional, podría ser tarea en segundo plano)
-        # self._generate_composite_image(card)
-    
-    def _generate_barcode(self, data, barcode_type='code128'):
-        """
-        Generar imagen de código de barras.
-        """
-        try:
-            # Obtener clase de código de barras
-            barcode_class = barcode.get_barcode_class(barcode_type)
-            
-            # Configurar escritor
-            writer = ImageWriter()
-            writer.set_options({
-                'module_width': 0.2,
-                'module_height': 10,
-                'font_size': 8,
-                'text_distance': 5,
-                'quiet_zone': 5,
-            })
-            
-            # Generar código de barras
-            barcode_obj = barcode_class(data, writer=writer)
-            
-            # Guardar en buffer
-            buffer = BytesIO()
-            barcode_obj.write(buffer)
-            
-            # Crear archivo para Django
-            image_file = ContentFile(buffer.getvalue(), name=f'{data}_{barcode_type}.png')
-            return image_file
-            
-        except Exception as e:
-            # Si falla, generar un código de barras simple
-            print(f"Error generando código de barras: {e}")
-            return self._generate_simple_barcode(data)
+        # Guardar tarjeta (reservando cuota en el contador de la empresa)
+        with reserve_quota(card_data['company'].id, 'cards', enforce=not self.request.user.is_superuser):
+            serializer.save(
+                barcode_data=barcode_data,
+                created_by=self.request.user
+            )
     
-    def _generate_simple_barcode(self, data):
+    def perform_update(self, serializer):
         """
-        Generar un código de barras simple como fallback.
+        Guardar cambios registrando quién hizo el cambio de estado.
         """
-        from PIL import Image, ImageDraw
-        import hashlib
-        
-        # Crear imagen simple basada en hash de los datos
-        img = Image.new('RGB', (200, 100), color='white')
-        draw = ImageDraw.Draw(img)
-        
-        # Dibujar barras simples
-        hash_val = hashlib.md5(data.encode()).hexdigest()
-        x = 10
-        
-        for i in range(0, len(hash_val), 2):
-            height = int(hash_val[i:i+2], 16) % 80 + 20
-            draw.rectangle([x, 10, x + 4, 10 + height], fill='black')
-            x += 6
-        
-        # Agregar texto
-        draw.text((50, 80), data, fill='black')
-        
-        # Guardar en buffer
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        
-        return ContentFile(buffer.getvalue(), name=f'simple_barcode_{data}.png')
+        serializer.instance._changed_by = self.request.user
+        serializer.save()
     
     @action(detail=True, methods=['post'])
     def print_card(self, request, pk=None):
@@ -323,10 +320,7 @@ class IDCardViewSet(viewsets.ModelViewSet):
         card = self.get_object()
         
         # Verificar permisos
-        user_companies = CompanyUser.objects.filter(
-            user=request.user,
-            company=card.company
-        ).exists()
+        user_companies = has_company_permission(request, card.company_id)
         
         if not user_companies and not request.user.is_superuser:
             return Response(
@@ -334,11 +328,9 @@ class IDCardViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        card.printed = True
-        card.printed_at = timezone.now()
-        card.printed_by = request.user
-        card.printed_count += 1
-        card.save()
+        # Incremento atómico en la base de datos (sin leer-modificar-escribir)
+        mark_cards_printed(IDCard.objects.filter(pk=card.pk), user=request.user)
+        card.refresh_from_db(fields=['printed', 'printed_at', 'printed_by', 'printed_count'])
         
         return Response({
             'message': 'Tarjeta marcada como impresa',
@@ -346,6 +338,50 @@ class IDCardViewSet(viewsets.ModelViewSet):
             'printed_at': card.printed_at
         })
     
+    @action(detail=False, methods=['post'])
+    def bulk_update(self, request):
+        """
+        Actualizar muchas tarjetas en una sola petición.
+        Body: {"ids": [...]} o {"filter": {"company_id": ..., "department": ...}}
+              y {"changes": {"status": "revoked", ...}}
+        """
+        serializer = CardBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        queryset = self.get_queryset()
+        if data.get('ids'):
+            queryset = queryset.filter(pk__in=data['ids'])
+        if data.get('filter'):
+            queryset = queryset.filter(**data['filter'])
+        
+        # Verificar permiso de edición en todas las empresas afectadas
+        if not request.user.is_superuser:
+            editable = [
+                company_id for company_id, membership in get_memberships(request).items()
+                if membership['can_edit_cards']
+            ]
+            if queryset.exclude(company_id__in=editable).exists():
+                return Response(
+                    {'error': 'No tienes permiso para editar tarjetas en alguna de las empresas'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        # La plantilla nueva debe ser de la misma empresa que las tarjetas
+        template = data['changes'].get('template')
+        if template is not None and queryset.exclude(company_id=template.company_id).exists():
+            return Response(
+                {'error': 'La plantilla no pertenece a la empresa de todas las tarjetas'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        updated = bulk_update_cards(queryset, data['changes'], user=request.user)
+        
+        return Response({
+            'message': f'{updated} tarjetas actualizadas',
+            'updated': updated,
+        })
+    
     @action(detail=True, methods=['post'])
     def regenerate_barcode(self, request, pk=None):
         """
@@ -353,11 +389,8 @@ class IDCardViewSet(viewsets.ModelViewSet):
         """
         card = self.get_object()
         
-        # Generar nuevo código de barras
-        barcode_image = self._generate_barcode(card.barcode_data, card.barcode_type)
-        
-        card.barcode_image = barcode_image
-        card.save()
+        # Generar nuevo código de barras (fuera de transacción, un UPDATE de la columna)
+        generate_card_assets(card.pk, ['barcode'])
         
         return Response({
             'message': 'Código de barras regenerado',
@@ -371,7 +404,6 @@ class IDCardViewSet(viewsets.ModelViewSet):
         Exportar tarjetas a CSV.
         """
         import csv
-        from django.http import HttpResponse
         
         # Obtener tarjetas filtradas
         queryset = self.filter_queryset(self.get_queryset())
@@ -379,11 +411,7 @@ class IDCardViewSet(viewsets.ModelViewSet):
         # Verificar permiso de exportación
         company_id = request.query_params.get('company_id')
         if company_id and not request.user.is_superuser:
-            user_permission = CompanyUser.objects.filter(
-                user=request.user,
-                company_id=company_id,
-                can_export_data=True
-            ).exists()
+            user_permission = has_company_permission(request, company_id, 'can_export_data')
             
             if not user_permission:
                 return Response(
@@ -412,6 +440,46 @@ class IDCardViewSet(viewsets.ModelViewSet):
         
         return response
     
+    @action(detail=False, methods=['get'])
+    def export_zip(self, request):
+        """
+        Descargar en un ZIP las vistas previas, PDFs y códigos de barras
+        de las tarjetas filtradas (mismos filtros que el listado).
+        ?include=previews,pdfs,barcodes (por defecto todos).
+        El ZIP se genera mientras se descarga (ver cards/archives.py).
+        """
+        include = request.query_params.get('include')
+        kinds = [kind.strip() for kind in include.split(',') if kind.strip()] if include else list(ARCHIVE_FILES)
+        invalid = [kind for kind in kinds if kind not in ARCHIVE_FILES]
+        if invalid or not kinds:
+            return Response(
+                {'error': f'include no válido. Usa: {", ".join(ARCHIVE_FILES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        # Solo las empresas donde el usuario puede exportar
+        if not request.user.is_superuser:
+            exportable = [
+                company_id for company_id, membership in get_memberships(request).items()
+                if membership['can_export_data']
+            ]
+            if not exportable:
+                return Response(
+                    {'error': 'No tienes permiso para exportar datos'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            queryset = queryset.filter(company_id__in=exportable)
+        
+        # El cuerpo se genera después de la vista: conservar la réplica elegida
+        response = StreamingHttpResponse(
+            replica_iterator(stream_cards_zip(queryset, kinds)),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = 'attachment; filename="tarjetas.zip"'
+        return response
+    
     @action(detail=False, methods=['post'])
     def batch_create(self, request):
         """
@@ -432,11 +500,7 @@ class IDCardViewSet(viewsets.ModelViewSet):
         
         # Verificar permisos
         if not request.user.is_superuser:
-            user_permission = CompanyUser.objects.filter(
-                user=request.user,
-                company_id=company_id,
-                can_create_cards=True
-            ).exists()
+            user_permission = has_company_permission(request, company_id, 'can_create_cards')
             
             if not user_permission:
                 return Response(
@@ -444,47 +508,302 @@ class IDCardViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
         
+        progress = None
         try:
             # Leer CSV
             csv_text = csv_file.read().decode('utf-8')
-            csv_reader = csv.DictReader(StringIO(csv_text))
+            rows = list(csv.DictReader(StringIO(csv_text)))
             
             created_cards = []
             errors = []
             
-            for i, row in enumerate(csv_reader, 1):
-                try:
-                    # Validar y crear tarjeta
-                    card_data = {
-                        'company': company_id,
-                        'template': template_id,
-                        'person_name': row.get('nombre', '').strip(),
-                        'person_title': row.get('puesto', '').strip(),
-                        'department': row.get('departamento', '').strip(),
-                        'employee_id': row.get('numero_empleado', '').strip(),
-                        'id_number': row.get('numero_id', '').strip(),
-                        'card_type': row.get('tipo', 'employee'),
-                        'status': 'active',
-                    }
-                    
-                    serializer = self.get_serializer(data=card_data)
-                    if serializer.is_valid():
-                        card = serializer.save()
-                        created_cards.append(card.card_number)
-                    else:
-                        errors.append(f"Línea {i}: {serializer.errors}")
+            # Progreso consultable mientras dura (GET progress/<id>/ o progress/<id>/stream/)
+            progress = ProgressTracker(
+                'batch_create', total=len(rows), user_id=request.user.pk,
+                company_id=company_id, progress_id=request.data.get('progress_id'),
+            )
+            
+            # Reservar cuota para todo el archivo; lo que no se crea se devuelve
+            with reserve_quota(company_id, 'cards', count=len(rows), enforce=not request.user.is_superuser):
+                for i, row in enumerate(rows, 1):
+                    try:
+                        # Validar y crear tarjeta
+                        card_data = {
+                            'company': company_id,
+                            'template': template_id,
+                            'person_name': row.get('nombre', '').strip(),
+                            'person_title': row.get('puesto', '').strip(),
+                            'department': row.get('departamento', '').strip(),
+                            'employee_id': row.get('numero_empleado', '').strip(),
+                            'id_number': row.get('numero_id', '').strip(),
+                            'card_type': row.get('tipo', 'employee'),
+                            'status': 'active',
+                        }
                         
-                except Exception as e:
-                    errors.append(f"Línea {i}: Error - {str(e)}")
+                        serializer = self.get_serializer(data=card_data)
+                        if serializer.is_valid():
+                            card = serializer.save()
+                            created_cards.append(card.card_number)
+                            progress.advance()
+                        else:
+                            errors.append(f"Línea {i}: {serializer.errors}")
+                            progress.advance(ok=0, failed=1)
+                            
+                    except Exception as e:
+                        errors.append(f"Línea {i}: Error - {str(e)}")
+                        progress.advance(ok=0, failed=1)
             
+            progress.finish(
+                result={'created': len(created_cards), 'errors': len(errors)},
+                message=f'{len(created_cards)} tarjetas creadas',
+            )
             return Response({
                 'message': f'Proceso completado. {len(created_cards)} tarjetas creadas.',
+                'progress_id': progress.id,
                 'created_cards': created_cards,
                 'errors': errors if errors else None
             })
             
+        except QuotaExceeded as e:
+            if progress is not None:
+                progress.fail('Cuota excedida')
+            return e.as_response()
         except Exception as e:
+            if progress is not None:
+                progress.fail(str(e))
             return Response(
                 {'error': f'Error procesando CSV: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class OperationProgressView(APIView):
+    """
+    Progreso de una operación larga (batch_create, acciones del admin,
+    exportaciones): procesadas, fallidas, restantes y ETA. Para sondeo.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, progress_id):
+        state = get_progress(progress_id)
+        if state is None or not can_view_progress(request, state):
+            return Response({'error': 'Operación no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(state)
+
+
+class OperationProgressStreamView(APIView):
+    """
+    El mismo progreso como server-sent events (text/event-stream).
+    Solo lee la caché: no consulta la base de datos mientras transmite.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+    
+    def get(self, request, progress_id):
+        state = get_progress(progress_id)
+        if state is not None and not can_view_progress(request, state):
+            return Response({'error': 'Operación no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+        
+        response = StreamingHttpResponse(
+            event_stream(progress_id, can_view=lambda state: can_view_progress(request, state)),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx: no acumular los eventos
+        return response
+
+
+class PrintJobViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Trabajos de impresión: agrupan las tarjetas enviadas a una impresora
+    y guardan el rendimiento (tarjetas por minuto, fallos).
+    """
+    serializer_class = PrintJobSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['created_at', 'total_cards', 'finished_at']
+    keyset_ordering = ('-created_at', '-pk')
+    
+    def get_queryset(self):
+        queryset = PrintJob.objects.select_related('company', 'created_by')
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(company_id__in=user_company_ids(self.request))
+        
+        company_id = self.request.query_params.get('company_id')
+        if company_id:
+            queryset = queryset.filter(company_id=company_id)
+        job_status = self.request.query_params.get('status')
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        return queryset
+    
+    def create(self, request):
+        """
+        Crear un trabajo y generar su PDF (una página por tarjeta).
+        Body: {"company_id": ..., "card_ids": [...], "printer_name": "..."}
+        """
+        serializer = PrintJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        company = get_object_or_404(Company, id=data['company_id'])
+        if not request.user.is_superuser and not has_company_permission(request, company.id):
+            return Response(
+                {'error': 'No tienes permiso para imprimir tarjetas de esta empresa'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        cards = list(
+            IDCard.objects.filter(company=company, pk__in=data['card_ids'])
+            .select_related('template', 'company')
+        )
+        if len(cards) != len(set(data['card_ids'])):
+            return Response(
+                {'error': 'Algunas tarjetas no existen o no pertenecen a la empresa'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        job = create_print_job(company, cards, user=request.user, printer_name=data['printer_name'])
+        return Response(self.get_serializer(job).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def start(self, request, pk=None):
+        """Registrar el envío del trabajo a la impresora"""
+        job = start_print_job(self.get_object())
+        return Response(self.get_serializer(job).data)
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """
+        Cerrar el trabajo. Las tarjetas no listadas en failed_card_ids se
+        marcan como impresas (un solo UPDATE con contador atómico).
+        """
+        job = self.get_object()
+        serializer = PrintJobCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        # Bloquear la fila: dos cierres simultáneos no cuentan la impresión dos veces
+        with transaction.atomic():
+            job = PrintJob.objects.select_for_update().get(pk=job.pk)
+            if job.status == 'completed':
+                return Response(
+                    {'error': 'El trabajo ya está completado'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            job = complete_print_job(job, serializer.validated_data['failed_card_ids'], user=request.user)
+        return Response(self.get_serializer(job).data)
+    
+    @action(detail=False, methods=['get'])
+    def throughput(self, request):
+        """Resumen de capacidad de impresión (?company_id=, ?days=30)"""
+        queryset = self.get_queryset()
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            days = 30
+        queryset = queryset.filter(created_at__gte=timezone.now() - timedelta(days=days))
+        
+        summary = print_job_throughput(queryset)
+        summary['days'] = days
+        return Response(summary)
+
+
+class RerenderRunViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Regeneración de las tarjetas cuyos archivos salieron de una versión
+    vieja de su plantilla: solo las desactualizadas, por bloques y con
+    punto de control (cards/rerender.py).
+    """
+    serializer_class = RerenderRunSerializer
+    permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-created_at', '-pk')
+    
+    def get_queryset(self):
+        queryset = RerenderRun.objects.select_related('company', 'template', 'created_by')
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(company_id__in=user_company_ids(self.request))
+        
+        company_id = self.request.query_params.get('company_id')
+        if company_id:
+            queryset = queryset.filter(company_id=company_id)
+        run_status = self.request.query_params.get('status')
+        if run_status:
+            queryset = queryset.filter(status=run_status)
+        return queryset
+    
+    def _resolve_scope(self, request, data):
+        """(empresa, plantilla) pedidas o una respuesta de error"""
+        company = template = None
+        if data.get('template_id'):
+            template = get_object_or_404(CardTemplate, id=data['template_id'])
+            company = template.company
+        elif data.get('company_id'):
+            company = get_object_or_404(Company, id=data['company_id'])
+        elif not request.user.is_superuser:
+            return None, None, Response(
+                {'error': 'Se requiere company_id o template_id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not request.user.is_superuser and not has_company_permission(request, company.id, 'can_edit_cards'):
+            return None, None, Response(
+                {'error': 'No tienes permiso para regenerar tarjetas de esta empresa'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return company, template, None
+    
+    def create(self, request):
+        """
+        Iniciar la regeneración en segundo plano (o retomar la que está en curso).
+        Body: {"company_id": ..., "template_id": ..., "chunk_size": 100}
+        Devuelve la regeneración y el progress_id para GET progress/<id>/.
+        """
+        serializer = RerenderRunCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        company, template, error = self._resolve_scope(request, serializer.validated_data)
+        if error is not None:
+            return error
+        
+        run, created = start_rerender(
+            company, template, user=request.user, chunk_size=serializer.validated_data.get('chunk_size')
+        )
+        data = self.get_serializer(run).data
+        # Una en curso con avance reciente ya tiene quien la procese
+        if run.status == 'running' and (created or is_stalled(run)):
+            tracker = ProgressTracker(
+                'rerender_stale', total=run.total_cards, user_id=request.user.pk,
+                company_id=run.company_id, progress_id=request.data.get('progress_id'),
+            )
+            run_in_background(tracker, process_rerender_run, run.pk)
+            data['progress_id'] = tracker.id
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Detener la regeneración tras el bloque en curso"""
+        run = self.get_object()
+        if run.company_id and not request.user.is_superuser and not has_company_permission(request, run.company_id, 'can_edit_cards'):
+            return Response(
+                {'error': 'No tienes permiso para regenerar tarjetas de esta empresa'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if run.status != 'running':
+            return Response(
+                {'error': 'La regeneración ya terminó'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        RerenderRun.objects.filter(pk=run.pk, status='running').update(
+            status='cancelled', finished_at=timezone.now()
+        )
+        run.refresh_from_db()
+        return Response(self.get_serializer(run).data)
+    
+    @action(detail=False, methods=['get'])
+    def stale(self, request):
+        """Tarjetas desactualizadas por estado (?company_id=, ?template_id=)"""
+        serializer = RerenderRunCreateSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        company, template, error = self._resolve_scope(request, serializer.validated_data)
+        if error is not None:
+            return error
+        return Response(stale_summary(company.pk if company else None, template.pk if template else None))
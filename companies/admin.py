@@ -1,12 +1,13 @@
 # backend/companies/admin.py
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Company
+from .generations import bump_generations
+from .models import Company, WebhookDelivery, WebhookEvent
 
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
     # Configuración de listado
-    list_display = ['name', 'contact_email', 'subscription_plan', 'is_active', 'created_at_preview']
+    list_display = ['name', 'contact_email', 'subscription_plan', 'card_count', 'is_active', 'created_at_preview']
     list_filter = ['subscription_plan', 'is_active', 'is_verified']
     search_fields = ['name', 'contact_email', 'tax_id']
     list_per_page = 25
@@ -14,8 +15,9 @@ class CompanyAdmin(admin.ModelAdmin):
     
     # Campos de solo lectura (siempre)
     readonly_fields = [
-        'api_key', 'created_at', 'updated_at', 
-        'subscription_start', 'created_by_display'
+        'api_key', 'webhook_secret', 'created_at', 'updated_at', 
+        'subscription_start', 'created_by_display',
+        'card_count', 'user_count', 'template_count'
     ]
     
     # Campos editables en formulario
@@ -42,11 +44,14 @@ class CompanyAdmin(admin.ModelAdmin):
             ),
         }),
         ('Configuración', {
-            'fields': ('webhook_url', 'is_verified', 'is_active'),
+            'fields': ('webhook_url', 'webhook_secret', 'is_verified', 'is_active'),
         }),
         ('Información del Sistema', {
             'fields': (
                 'api_key', 
+                'card_count',
+                'user_count',
+                'template_count',
                 'created_by_display',  # Campo personalizado
                 'created_at', 
                 'updated_at'
@@ -68,11 +73,13 @@ class CompanyAdmin(admin.ModelAdmin):
     
     # Acciones personalizadas
     def activate_companies(self, request, queryset):
+        bump_generations(queryset.values_list('pk', flat=True))
         updated = queryset.update(is_active=True)
         self.message_user(request, f'{updated} empresas activadas.')
     activate_companies.short_description = "Activar empresas seleccionadas"
     
     def deactivate_companies(self, request, queryset):
+        bump_generations(queryset.values_list('pk', flat=True))
         updated = queryset.update(is_active=False)
         self.message_user(request, f'{updated} empresas desactivadas.')
     deactivate_companies.short_description = "Desactivar empresas seleccionadas"
@@ -86,4 +93,37 @@ class CompanyAdmin(admin.ModelAdmin):
     # Prepopulate slug field
     prepopulated_fields = {
         'slug': ('name',)
-    }
\ No newline at end of file
+    }
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'company', 'event_type', 'status', 'attempts', 'next_attempt_at', 'created_at']
+    list_filter = ['status', 'event_type']
+    list_select_related = ['company']
+    search_fields = ['company__name']
+    readonly_fields = [
+        'company', 'event_type', 'payload', 'attempts',
+        'last_error', 'created_at', 'delivered_at',
+    ]
+    actions = ['retry_events']
+    
+    def retry_events(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.exclude(status='delivered').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} eventos se reenviarán.')
+    retry_events.short_description = "Reintentar eventos seleccionados"
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['company', 'url', 'attempt', 'success', 'status_code', 'duration_ms', 'created_at']
+    list_filter = ['success']
+    list_select_related = ['company']
+    search_fields = ['company__name', 'url']
+    readonly_fields = [
+        'company', 'url', 'event_ids', 'attempt', 'success',
+        'status_code', 'error', 'duration_ms', 'created_at',
+    ]
@@ -0,0 +1,46 @@
+# backend/companies/checks.py
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+# Cachés entre peticiones que se invalidan con señales: con LocMemCache la
+# invalidación solo llega al proceso que hizo la escritura
+INVALIDATED_CACHES = {
+    'RESPONSE_CACHE_TIMEOUT': 'los demás procesos sirven respuestas viejas',
+    'COMPANY_PERMISSIONS_CACHE_TIMEOUT': 'los demás procesos mantienen permisos retirados',
+    'AUTH_TOKEN_CACHE_TIMEOUT': 'los demás procesos aceptan tokens revocados',
+    'COMPANY_API_KEY_CACHE_TIMEOUT': 'los demás procesos aceptan API Keys regeneradas',
+    'WEBHOOK_ENABLED_CACHE_TIMEOUT': 'los demás procesos descartan o encolan eventos según la URL vieja',
+}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Las generaciones por empresa (caché de respuestas), los permisos, las credenciales, el
+    progreso de las operaciones y la fijación al primario tras escribir
+    viven en la caché: con LocMemCache cada proceso tiene la suya y no se
+    ven entre sí.
+    """
+    if settings.CACHES['default']['BACKEND'] != LOCMEM_BACKEND:
+        return []
+    errors = [
+        Error(
+            f'{name} activo con LocMemCache: una escritura solo invalida su propio proceso y {effect}.',
+            hint=f'Usa CACHE_BACKEND=redis o file, o {name}=0.',
+            id='companies.E001',
+        )
+        for name, effect in INVALIDATED_CACHES.items()
+        if getattr(settings, name)
+    ]
+    if errors:
+        return errors
+    if not settings.DEBUG:
+        return [Warning(
+            'LocMemCache en producción: el progreso de operaciones y la fijación al primario '
+            'tras escribir no se comparten entre procesos.',
+            hint='Usa CACHE_BACKEND=redis o file.',
+            id='companies.W001',
+        )]
+    return []
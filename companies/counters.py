@@ -0,0 +1,41 @@
+# backend/companies/counters.py
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from .models import Company
+
+
+def adjust_counter(company_id, field, delta):
+    """Sumar (o restar) al contador de una empresa en un solo UPDATE"""
+    if not company_id or not delta:
+        return
+    Company.objects.filter(pk=company_id).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def _count_subquery(model):
+    counts = (
+        model.objects.filter(company=OuterRef('pk'))
+        .order_by()
+        .values('company')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def reconcile_counters(queryset=None):
+    """
+    Recalcular los contadores desde las tablas reales.
+    Un solo UPDATE con subconsultas correlacionadas; devuelve filas actualizadas.
+    """
+    from cards.models import CardTemplate, IDCard
+    from users.models import CompanyUser
+
+    if queryset is None:
+        queryset = Company.objects.all()
+    return queryset.update(
+        card_count=_count_subquery(IDCard),
+        user_count=_count_subquery(CompanyUser),
+        template_count=_count_subquery(CardTemplate),
+    )
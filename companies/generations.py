@@ -0,0 +1,65 @@
+# backend/companies/generations.py
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_CACHE_KEY = 'gen:company:{}'
+
+# Generación que cambia con cualquier escritura (respuestas de superusuarios)
+GLOBAL_GENERATION = 'all'
+
+
+def _generation_key(company_id):
+    return GENERATION_CACHE_KEY.format(company_id)
+
+
+def _initial_generation():
+    # Si la clave se perdió (reinicio, expulsión de la caché) se vuelve a
+    # crear con la hora en ns: nunca coincide con una generación anterior
+    return time.time_ns()
+
+
+def _bump(company_id):
+    key = _generation_key(company_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_generation(), None)
+
+
+def bump_generations(company_ids):
+    """
+    Invalidar en O(1) todo lo cacheado de estas empresas: se incrementa un
+    contador por empresa (y el global) y las claves viejas dejan de usarse.
+    Dentro de una transacción se hace al confirmarla, así nadie vuelve a
+    cachear datos que todavía no son visibles.
+    """
+    company_ids = {str(company_id) for company_id in company_ids if company_id}
+    if not company_ids:
+        return
+
+    def bump():
+        for company_id in company_ids:
+            _bump(company_id)
+        _bump(GLOBAL_GENERATION)
+
+    transaction.on_commit(bump)
+
+
+def bump_generation(company_id):
+    bump_generations([company_id])
+
+
+def get_generations(company_ids):
+    """{company_id: generación} con un solo get_many; crea las que falten"""
+    keys = {_generation_key(company_id): str(company_id) for company_id in company_ids}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, _initial_generation(), None)
+        found[key] = cache.get(key)
+    return {company_id: found[key] for key, company_id in keys.items()}
+
+
+def bump_queryset_generations(queryset):
+    """Igual que bump_generations con las empresas de un queryset (antes de un UPDATE masivo)"""
+    bump_generations(queryset.order_by().values_list('company_id', flat=True).distinct())
@@ -0,0 +1,57 @@
+# backend/companies/management/commands/deliver_webhooks.py
+import time
+from django.core.management.base import BaseCommand
+from companies.webhooks import deliver_pending, purge_delivered_events
+
+class Command(BaseCommand):
+    help = (
+        'Envía los webhooks pendientes (bandeja WebhookEvent): un lote por empresa, firmado con '
+        'HMAC-SHA256, con reintentos y espera exponencial. Se ejecuta en bucle salvo con --once.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Hacer una sola pasada y salir (útil en cron)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Envíos simultáneos (por defecto WEBHOOK_WORKERS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Eventos por envío (por defecto WEBHOOK_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando no hay eventos pendientes'
+        )
+        parser.add_argument(
+            '--purge-days',
+            type=int,
+            help='Borrar antes los eventos entregados hace más de N días'
+        )
+    
+    def handle(self, *args, **options):
+        if options.get('purge_days'):
+            deleted = purge_delivered_events(options['purge_days'])
+            self.stdout.write(f'{deleted} eventos entregados borrados.')
+        
+        try:
+            while True:
+                deliveries = deliver_pending(workers=options.get('workers'), batch_size=options.get('batch_size'))
+                for delivery in deliveries:
+                    line = f'  {delivery.company_id}: {len(delivery.event_ids)} eventos -> {delivery.status_code or delivery.error}'
+                    self.stdout.write(self.style.SUCCESS(line) if delivery.success else self.style.WARNING(line))
+                
+                if options['once']:
+                    break
+                if not deliveries:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
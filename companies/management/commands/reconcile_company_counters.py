@@ -0,0 +1,32 @@
+# backend/companies/management/commands/reconcile_company_counters.py
+from django.core.management.base import BaseCommand
+from companies.counters import reconcile_counters
+from companies.models import Company
+from companies.stats import rebuild_stats
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores y estadísticas de cada empresa desde las tablas reales'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company-ids',
+            type=str,
+            help='IDs de empresas específicas (separados por coma)'
+        )
+        parser.add_argument(
+            '--measure-media',
+            action='store_true',
+            help='Volver a medir en disco los archivos de todas las tarjetas'
+        )
+    
+    def handle(self, *args, **options):
+        queryset = Company.objects.all()
+        company_ids_str = options.get('company_ids')
+        if company_ids_str:
+            queryset = queryset.filter(id__in=[cid.strip() for cid in company_ids_str.split(',')])
+        
+        updated = reconcile_counters(queryset)
+        self.stdout.write(self.style.SUCCESS(f'Contadores recalculados para {updated} empresas.'))
+        
+        rebuilt = rebuild_stats(queryset, measure_media=options['measure_media'])
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas reconstruidas para {rebuilt} empresas.'))
@@ -0,0 +1,43 @@
+# backend/companies/management/commands/shard_media.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from companies.uploads import shard_existing_files, sharded_file_fields
+
+class Command(BaseCommand):
+    help = (
+        'Mueve los archivos subidos con carpetas planas (card_photos/, barcodes/...) al esquema '
+        '<carpeta>/<empresa>/ab/cd/<hash> y reescribe las rutas en la base de datos por bloques.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Filas por UPDATE'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo contar los archivos que se moverían'
+        )
+    
+    def handle(self, *args, **options):
+        total_moved = total_missing = 0
+        for model, field in sharded_file_fields():
+            moved, missing = shard_existing_files(
+                model, field, settings.MEDIA_ROOT,
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run'],
+            )
+            if moved or missing:
+                self.stdout.write(f'  {model._meta.label}.{field.name}: {moved} archivos, {missing} no encontrados')
+            total_moved += moved
+            total_missing += missing
+        
+        if options['dry_run']:
+            self.stdout.write(f'{total_moved} archivos se moverían ({total_missing} no encontrados).')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'{total_moved} archivos movidos ({total_missing} no encontrados; ver check_integrity).'
+            ))
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:36
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Company = apps.get_model('companies', 'Company')
+
+    def count_subquery(app_label, model_name):
+        model = apps.get_model(app_label, model_name)
+        counts = (
+            model.objects.filter(company=OuterRef('pk'))
+            .order_by()
+            .values('company')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    Company.objects.update(
+        card_count=count_subquery('cards', 'IDCard'),
+        user_count=count_subquery('users', 'CompanyUser'),
+        template_count=count_subquery('cards', 'CardTemplate'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('cards', '0002_alter_idcard_barcode_image'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='card_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Tarjetas'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='template_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Plantillas'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='user_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Usuarios'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_company_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyStats',
+            fields=[
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='companies.company', verbose_name='Empresa')),
+                ('cards_draft', models.PositiveIntegerField(default=0)),
+                ('cards_active', models.PositiveIntegerField(default=0)),
+                ('cards_expired', models.PositiveIntegerField(default=0)),
+                ('cards_revoked', models.PositiveIntegerField(default=0)),
+                ('cards_lost', models.PositiveIntegerField(default=0)),
+                ('cards_damaged', models.PositiveIntegerField(default=0)),
+                ('users_owner', models.PositiveIntegerField(default=0)),
+                ('users_admin', models.PositiveIntegerField(default=0)),
+                ('users_editor', models.PositiveIntegerField(default=0)),
+                ('users_viewer', models.PositiveIntegerField(default=0)),
+                ('users_printer', models.PositiveIntegerField(default=0)),
+                ('templates_active', models.PositiveIntegerField(default=0)),
+                ('media_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Bytes en disco')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+            ],
+            options={
+                'verbose_name': 'Estadísticas de empresa',
+                'verbose_name_plural': 'Estadísticas de empresas',
+            },
+        ),
+        migrations.CreateModel(
+            name='CompanyDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('cards_created', models.PositiveIntegerField(default=0, verbose_name='Tarjetas creadas')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='companies.company')),
+            ],
+            options={
+                'verbose_name': 'Estadística diaria',
+                'verbose_name_plural': 'Estadísticas diarias',
+                'ordering': ['company', '-day'],
+                'unique_together': {('company', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:12
+
+import companies.uploads
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0003_company_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='company',
+            name='logo',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to=companies.uploads.ShardedUploadTo('company_logos', tenant_field='pk'), verbose_name='Logotipo'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:31
+
+import secrets
+
+import companies.models
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def assign_webhook_secrets(apps, schema_editor):
+    """AddField usa el mismo valor por defecto en todas las filas: un secreto por empresa"""
+    Company = apps.get_model('companies', 'Company')
+    companies = list(Company.objects.only('pk'))
+    for company in companies:
+        company.webhook_secret = secrets.token_hex(32)
+    Company.objects.bulk_update(companies, ['webhook_secret'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0004_sharded_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='webhook_secret',
+            field=models.CharField(default=companies.models.generate_webhook_secret, editable=False, help_text='Clave con la que se firma cada envío (cabecera X-Webhook-Signature)', max_length=64, verbose_name='Secreto de Webhooks'),
+        ),
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(verbose_name='URL')),
+                ('event_ids', models.JSONField(default=list, verbose_name='Eventos')),
+                ('attempt', models.PositiveIntegerField(default=1, verbose_name='Intento')),
+                ('success', models.BooleanField(default=False, verbose_name='Correcto')),
+                ('status_code', models.PositiveIntegerField(blank=True, null=True, verbose_name='Código HTTP')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('duration_ms', models.PositiveIntegerField(default=0, verbose_name='Duración (ms)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_deliveries', to='companies.company')),
+            ],
+            options={
+                'verbose_name': 'Envío de webhook',
+                'verbose_name_plural': 'Envíos de webhook',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['company', '-created_at'], name='companies_w_company_832564_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('card.created', 'Tarjeta creada'), ('card.updated', 'Tarjeta actualizada'), ('card.revoked', 'Tarjeta revocada'), ('card.printed', 'Tarjeta impresa'), ('card.expired', 'Tarjeta expirada')], max_length=30, verbose_name='Evento')),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Datos')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('delivered', 'Entregado'), ('failed', 'Fallido')], default='pending', max_length=20, verbose_name='Estado')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próximo intento')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Entregado')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_events', to='companies.company')),
+            ],
+            options={
+                'verbose_name': 'Evento de webhook',
+                'verbose_name_plural': 'Eventos de webhook',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['company', 'next_attempt_at'], name='webhook_event_pending_idx'), models.Index(fields=['status', 'created_at'], name='companies_w_status_f31d70_idx')],
+            },
+        ),
+        migrations.RunPython(assign_webhook_secrets, migrations.RunPython.noop),
+    ]
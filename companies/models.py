@@ -2,10 +2,36 @@ from django.db import models
 
 # Create your models here.
 # backend/companies/models.py
+import secrets
 import uuid
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import MinLengthValidator
+from .uploads import ShardedUploadTo
+
+# Límites por plan (None = ilimitado), ver companies/quotas.py
+PLAN_CARD_LIMITS = {
+    'free': 100,
+    'basic': 1000,
+    'premium': 10000,
+    'enterprise': None,
+}
+
+PLAN_TEMPLATE_LIMITS = {
+    'free': 3,
+    'basic': 10,
+    'premium': 50,
+    'enterprise': 1000,
+}
+DEFAULT_TEMPLATE_LIMIT = 3
+
+
+def generate_webhook_secret():
+    """Secreto para firmar (HMAC-SHA256) los webhooks de una empresa"""
+    return secrets.token_hex(32)
+
 
 class Company(models.Model):
     """Modelo para empresas/clientes del sistema"""
@@ -33,7 +59,7 @@ class Company(models.Model):
     country = models.CharField(max_length=100, blank=True, default="México")
     
     # Configuración del sistema
-    logo = models.ImageField(upload_to='company_logos/', null=True, blank=True, verbose_name="Logotipo")
+    logo = models.ImageField(upload_to=ShardedUploadTo('company_logos', tenant_field='pk'), max_length=255, null=True, blank=True, verbose_name="Logotipo")
     primary_color = models.CharField(max_length=7, default='#3B82F6', verbose_name="Color primario")
     secondary_color = models.CharField(max_length=7, default='#1E40AF', verbose_name="Color secundario")
     
@@ -50,11 +76,24 @@ class Company(models.Model):
     # API Access
     api_key = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name="Clave API")
     webhook_url = models.URLField(blank=True, verbose_name="URL para Webhooks")
+    webhook_secret = models.CharField(
+        max_length=64,
+        default=generate_webhook_secret,
+        editable=False,
+        verbose_name="Secreto de Webhooks",
+        help_text="Clave con la que se firma cada envío (cabecera X-Webhook-Signature)"
+    )
     
     # Estado
     is_active = models.BooleanField(default=True, verbose_name="Activa")
     is_verified = models.BooleanField(default=False, verbose_name="Verificada")
     
+    # Contadores desnormalizados (mantenidos por señales, ver companies/signals.py)
+    COUNTER_FIELDS = ('card_count', 'user_count', 'template_count')
+    card_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Tarjetas")
+    user_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Usuarios")
+    template_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Plantillas")
+    
     # Auditoría
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
@@ -84,15 +123,154 @@ class Company(models.Model):
         if not self.slug:
             from django.utils.text import slugify
             self.slug = slugify(self.name)
+        
+        # Los contadores se mantienen con UPDATE atómicos (companies/counters.py):
+        # un save() completo no debe sobrescribirlos con valores viejos
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
     
     @property
     def card_limit(self):
         """Límite de tarjetas según el plan"""
-        limits = {
-            'free': 100,
-            'basic': 1000,
-            'premium': 10000,
-            'enterprise': None,  # Ilimitado
-        }
-        return limits.get(self.subscription_plan)
\ No newline at end of file
+        return PLAN_CARD_LIMITS.get(self.subscription_plan)
+    
+    @property
+    def template_limit(self):
+        """Límite de plantillas según el plan"""
+        return PLAN_TEMPLATE_LIMITS.get(self.subscription_plan, DEFAULT_TEMPLATE_LIMIT)
+
+class CompanyStats(models.Model):
+    """Estadísticas de una empresa mantenidas incrementalmente (ver companies/stats.py)"""
+    
+    company = models.OneToOneField(
+        Company,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="Empresa"
+    )
+    
+    # Tarjetas por estado (IDCard.STATUS_CHOICES)
+    cards_draft = models.PositiveIntegerField(default=0)
+    cards_active = models.PositiveIntegerField(default=0)
+    cards_expired = models.PositiveIntegerField(default=0)
+    cards_revoked = models.PositiveIntegerField(default=0)
+    cards_lost = models.PositiveIntegerField(default=0)
+    cards_damaged = models.PositiveIntegerField(default=0)
+    
+    # Usuarios por rol (CompanyUser.ROLES)
+    users_owner = models.PositiveIntegerField(default=0)
+    users_admin = models.PositiveIntegerField(default=0)
+    users_editor = models.PositiveIntegerField(default=0)
+    users_viewer = models.PositiveIntegerField(default=0)
+    users_printer = models.PositiveIntegerField(default=0)
+    
+    # Plantillas
+    templates_active = models.PositiveIntegerField(default=0)
+    
+    # Almacenamiento real (suma de IDCard.media_bytes)
+    media_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Bytes en disco")
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
+    
+    class Meta:
+        verbose_name = "Estadísticas de empresa"
+        verbose_name_plural = "Estadísticas de empresas"
+    
+    def __str__(self):
+        return f"Estadísticas de {self.company_id}"
+
+
+class CompanyDailyStats(models.Model):
+    """Tarjetas creadas por día y empresa (para ventanas de N días)"""
+    
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField(verbose_name="Día")
+    cards_created = models.PositiveIntegerField(default=0, verbose_name="Tarjetas creadas")
+    
+    class Meta:
+        verbose_name = "Estadística diaria"
+        verbose_name_plural = "Estadísticas diarias"
+        unique_together = ['company', 'day']
+        ordering = ['company', '-day']
+    
+    def __str__(self):
+        return f"{self.company_id} {self.day}: {self.cards_created}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Bandeja de salida de webhooks: cada evento se guarda en la misma
+    transacción que el cambio que lo produce y lo envía deliver_webhooks
+    (ver companies/webhooks.py).
+    """
+    
+    EVENT_TYPES = [
+        ('card.created', 'Tarjeta creada'),
+        ('card.updated', 'Tarjeta actualizada'),
+        ('card.revoked', 'Tarjeta revocada'),
+        ('card.printed', 'Tarjeta impresa'),
+        ('card.expired', 'Tarjeta expirada'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('delivered', 'Entregado'),
+        ('failed', 'Fallido'),
+    ]
+    
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='webhook_events')
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPES, verbose_name="Evento")
+    payload = models.JSONField(encoder=DjangoJSONEncoder, verbose_name="Datos")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Estado")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Próximo intento")
+    last_error = models.TextField(blank=True, verbose_name="Último error")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    delivered_at = models.DateTimeField(null=True, blank=True, verbose_name="Entregado")
+    
+    class Meta:
+        verbose_name = "Evento de webhook"
+        verbose_name_plural = "Eventos de webhook"
+        ordering = ['id']
+        indexes = [
+            # Solo los pendientes: es lo único que consulta el worker
+            models.Index(
+                fields=['company', 'next_attempt_at'],
+                condition=models.Q(status='pending'),
+                name='webhook_event_pending_idx',
+            ),
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} #{self.pk} ({self.status})"
+
+
+class WebhookDelivery(models.Model):
+    """Registro de cada envío (un POST con un lote de eventos de una empresa)"""
+    
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='webhook_deliveries')
+    url = models.URLField(verbose_name="URL")
+    event_ids = models.JSONField(default=list, verbose_name="Eventos")
+    attempt = models.PositiveIntegerField(default=1, verbose_name="Intento")
+    success = models.BooleanField(default=False, verbose_name="Correcto")
+    status_code = models.PositiveIntegerField(null=True, blank=True, verbose_name="Código HTTP")
+    error = models.TextField(blank=True, verbose_name="Error")
+    duration_ms = models.PositiveIntegerField(default=0, verbose_name="Duración (ms)")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    
+    class Meta:
+        verbose_name = "Envío de webhook"
+        verbose_name_plural = "Envíos de webhook"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['company', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.url} ({len(self.event_ids)} eventos, {self.status_code or self.error})"
@@ -0,0 +1,135 @@
+# backend/companies/quotas.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db.models import Case, F, Q, Value, When
+from rest_framework import status
+from rest_framework.response import Response
+from .counters import adjust_counter
+from .models import Company, DEFAULT_TEMPLATE_LIMIT, PLAN_CARD_LIMITS, PLAN_TEMPLATE_LIMITS
+
+# Recurso -> (contador de Company, límites por plan, límite para planes desconocidos)
+QUOTAS = {
+    'cards': ('card_count', PLAN_CARD_LIMITS, None),
+    'templates': ('template_count', PLAN_TEMPLATE_LIMITS, DEFAULT_TEMPLATE_LIMIT),
+}
+
+# Reservas hechas en este contexto: {(company_id, contador): pendientes}.
+# Las señales de companies/signals.py las consumen en lugar de volver a sumar.
+_reservations = ContextVar('company_quota_reservations', default=None)
+
+
+class QuotaExceeded(Exception):
+    """No queda capacidad en el plan de la empresa"""
+
+    def __init__(self, resource, limit, used, requested):
+        self.resource = resource
+        self.limit = limit
+        self.used = used
+        self.requested = requested
+        self.remaining = max(limit - used, 0)
+        super().__init__(f'Límite de {resource} alcanzado ({used}/{limit})')
+
+    def as_response(self):
+        """
+        Respuesta 403 con la capacidad restante. No es 429: reintentar no sirve
+        hasta que la empresa libere capacidad o cambie de plan.
+        """
+        return Response({
+            'error': f'Límite de {self.resource} del plan alcanzado',
+            'resource': self.resource,
+            'limit': self.limit,
+            'used': self.used,
+            'requested': self.requested,
+            'remaining': self.remaining,
+        }, status=status.HTTP_403_FORBIDDEN)
+
+
+def _limit_expression(limits, default):
+    whens = [When(subscription_plan=plan, then=Value(limit)) for plan, limit in limits.items() if limit is not None]
+    return Case(*whens, default=Value(default))
+
+
+def _unlimited_condition(limits, default):
+    unlimited = [plan for plan, limit in limits.items() if limit is None]
+    condition = Q(subscription_plan__in=unlimited)
+    if default is None:
+        condition |= ~Q(subscription_plan__in=list(limits))
+    return condition
+
+
+def _reserve(company_id, resource, count, enforce):
+    """
+    Sumar `count` al contador solo si cabe en el límite del plan.
+    Es un único UPDATE condicional: dos peticiones concurrentes no pueden
+    pasar las dos del límite. Lanza QuotaExceeded si no hay capacidad.
+    """
+    field, limits, default = QUOTAS[resource]
+    queryset = Company.objects.filter(pk=company_id)
+    if enforce:
+        queryset = queryset.filter(
+            _unlimited_condition(limits, default)
+            | Q(**{f'{field}__lte': _limit_expression(limits, default) - count})
+        )
+    if queryset.update(**{field: F(field) + count}):
+        return
+
+    company = Company.objects.only('subscription_plan', field).get(pk=company_id)
+    limit = limits.get(company.subscription_plan, default)
+    raise QuotaExceeded(resource, limit, getattr(company, field), count)
+
+
+@contextmanager
+def reserve_quota(company_id, resource, count=1, enforce=True):
+    """
+    Reservar capacidad antes de crear objetos:
+
+        with reserve_quota(company.id, 'cards', count=len(rows)):
+            ...crear tarjetas...
+
+    Cada objeto creado dentro del bloque consume una unidad de la reserva
+    (ver consume_reservation). Lo que no se usa se devuelve al salir.
+    Con enforce=False (superusuarios) se reserva sin comprobar el límite.
+    """
+    field = QUOTAS[resource][0]
+    key = (str(company_id), field)
+    _reserve(company_id, resource, count, enforce)
+
+    reservations = _reservations.get()
+    token = None
+    if reservations is None:
+        reservations = {}
+        token = _reservations.set(reservations)
+    reservations[key] = reservations.get(key, 0) + count
+    try:
+        yield
+    finally:
+        leftover = min(reservations.get(key, 0), count)
+        reservations[key] -= leftover
+        if token is not None:
+            _reservations.reset(token)
+        if leftover:
+            adjust_counter(company_id, field, -leftover)
+
+
+def consume_reservation(company_id, field):
+    """True si el objeto creado ya estaba contado por una reserva"""
+    reservations = _reservations.get()
+    key = (str(company_id), field)
+    if not reservations or not reservations.get(key):
+        return False
+    reservations[key] -= 1
+    return True
+
+
+def quota_usage(company):
+    """Uso y capacidad restante de cada recurso de la empresa"""
+    usage = {}
+    for resource, (field, limits, default) in QUOTAS.items():
+        limit = limits.get(company.subscription_plan, default)
+        used = getattr(company, field)
+        usage[resource] = {
+            'limit': limit,
+            'used': used,
+            'remaining': None if limit is None else max(limit - used, 0),
+        }
+    return usage
@@ -1,22 +1,23 @@
 from rest_framework import serializers
-from .models import Company
+from .models import Company, WebhookDelivery
 
 class CompanySerializer(serializers.ModelSerializer):
     card_limit = serializers.IntegerField(read_only=True)
-    card_count = serializers.SerializerMethodField()
-    user_count = serializers.SerializerMethodField()
-    template_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Company
-        fields = '__all__'
-        read_only_fields = ['api_key', 'created_at', 'updated_at', 'created_by']
-    
-    def get_card_count(self, obj):
-        return obj.cards.count()
-    
-    def get_user_count(self, obj):
-        return obj.company_users.count()
-    
-    def get_template_count(self, obj):
-        return obj.templates.count()
\ No newline at end of file
+        # El secreto de webhooks solo se muestra al regenerarlo
+        exclude = ['webhook_secret']
+        read_only_fields = [
+            'api_key', 'created_at', 'updated_at', 'created_by',
+            'card_count', 'user_count', 'template_count'
+        ]
+
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookDelivery
+        fields = [
+            'id', 'url', 'event_ids', 'attempt', 'success',
+            'status_code', 'error', 'duration_ms', 'created_at',
+        ]
@@ -0,0 +1,166 @@
+# backend/companies/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from cards.models import CardTemplate, IDCard
+from users.models import CompanyUser
+from .counters import adjust_counter
+from .generations import bump_generation
+from .models import Company
+from .quotas import consume_reservation
+from .stats import (
+    CARD_FILE_FIELDS, record_card_created, record_card_deleted, record_card_status_change,
+    record_template_active_change, record_user_role_change, sync_card_media_bytes,
+)
+from .webhooks import STATUS_EVENTS, invalidate_webhooks_enabled, queue_card_event
+
+# Modelo -> contador de Company que lo representa
+COUNTER_FIELDS = {
+    IDCard: 'card_count',
+    CompanyUser: 'user_count',
+    CardTemplate: 'template_count',
+}
+
+
+def _deleted_with_company(origin):
+    """True si el borrado viene de eliminar la propia empresa (cascada)"""
+    if isinstance(origin, Company):
+        return True
+    return getattr(origin, 'model', None) is Company
+
+
+@receiver(post_save, sender=IDCard)
+@receiver(post_save, sender=CompanyUser)
+@receiver(post_save, sender=CardTemplate)
+def increment_company_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        field = COUNTER_FIELDS[sender]
+        # Si se reservó cuota antes de crear (companies/quotas.py), ya está contado
+        if not consume_reservation(instance.company_id, field):
+            adjust_counter(instance.company_id, field, 1)
+
+
+@receiver(post_delete, sender=IDCard)
+@receiver(post_delete, sender=CompanyUser)
+@receiver(post_delete, sender=CardTemplate)
+def decrement_company_counter(sender, instance, origin=None, **kwargs):
+    if _deleted_with_company(origin):
+        return
+    adjust_counter(instance.company_id, COUNTER_FIELDS[sender], -1)
+
+
+# ========== ESTADÍSTICAS ==========
+
+@receiver(post_save, sender=IDCard)
+def update_card_stats(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    status = instance.__dict__.get('status')
+    if created:
+        record_card_created(instance.company_id, status, instance.created_at)
+    else:
+        old_status = getattr(instance, '_loaded_status', None)
+        if old_status and status:
+            record_card_status_change(instance.company_id, old_status, status)
+    
+    # Medir archivos solo si pudieron cambiar y están cargados
+    if update_fields is not None and not set(update_fields) & set(CARD_FILE_FIELDS):
+        return
+    if set(instance.get_deferred_fields()) & set(CARD_FILE_FIELDS + ['media_bytes']):
+        return
+    sync_card_media_bytes(instance)
+
+
+@receiver(post_delete, sender=IDCard)
+def remove_card_stats(sender, instance, origin=None, **kwargs):
+    if _deleted_with_company(origin):
+        return
+    record_card_deleted(instance.company_id, instance.status, instance.media_bytes)
+
+
+@receiver(post_save, sender=CompanyUser)
+def update_user_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_role = None if created else getattr(instance, '_loaded_role', None)
+    if created or old_role:
+        record_user_role_change(instance.company_id, old_role, instance.role)
+
+
+@receiver(post_delete, sender=CompanyUser)
+def remove_user_stats(sender, instance, origin=None, **kwargs):
+    if _deleted_with_company(origin):
+        return
+    record_user_role_change(instance.company_id, instance.role, None)
+
+
+@receiver(post_save, sender=CardTemplate)
+def update_template_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        if instance.is_active:
+            record_template_active_change(instance.company_id, 1)
+    else:
+        old_is_active = getattr(instance, '_loaded_is_active', None)
+        if old_is_active is not None and old_is_active != instance.is_active:
+            record_template_active_change(instance.company_id, 1 if instance.is_active else -1)
+
+
+@receiver(post_delete, sender=CardTemplate)
+def remove_template_stats(sender, instance, origin=None, **kwargs):
+    if _deleted_with_company(origin) or not instance.is_active:
+        return
+    record_template_active_change(instance.company_id, -1)
+
+
+# ========== WEBHOOKS ==========
+
+@receiver(post_save, sender=IDCard)
+def queue_card_webhook(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Encolar el evento en la misma transacción que el save() (companies/webhooks.py)"""
+    if raw:
+        return
+    if created:
+        queue_card_event(instance, 'card.created')
+        return
+    
+    old_status = getattr(instance, '_loaded_status', None)
+    status = instance.__dict__.get('status')
+    if old_status and status != old_status and status in STATUS_EVENTS:
+        queue_card_event(instance, STATUS_EVENTS[status])
+        return
+    
+    # Solo si cambió algo de lo que se envía (no al regenerar archivos)
+    loaded = getattr(instance, '_loaded_webhook', None)
+    if loaded is None:
+        changed = update_fields is None or bool(set(update_fields) & set(IDCard.WEBHOOK_FIELDS))
+    else:
+        changed = loaded != instance.webhook_snapshot()
+    if changed:
+        queue_card_event(instance, 'card.updated')
+
+
+@receiver(post_save, sender=Company)
+def refresh_webhooks_enabled(sender, instance, **kwargs):
+    invalidate_webhooks_enabled(instance.pk)
+
+
+# ========== CACHÉ DE RESPUESTAS ==========
+
+@receiver(post_save, sender=IDCard)
+@receiver(post_save, sender=CompanyUser)
+@receiver(post_save, sender=CardTemplate)
+@receiver(post_delete, sender=IDCard)
+@receiver(post_delete, sender=CompanyUser)
+@receiver(post_delete, sender=CardTemplate)
+def bump_company_generation(sender, instance, raw=False, **kwargs):
+    """Invalidar las respuestas cacheadas de la empresa (config/response_cache.py)"""
+    if not raw:
+        bump_generation(instance.company_id)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def bump_own_generation(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_generation(instance.pk)
@@ -0,0 +1,210 @@
+# backend/companies/stats.py
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Company, CompanyStats, CompanyDailyStats
+
+# Archivos de IDCard que cuentan como almacenamiento
+CARD_FILE_FIELDS = ['photo', 'signature', 'barcode_image', 'qr_code', 'composite_image', 'pdf_file']
+
+# Días que se conservan en CompanyDailyStats
+DAILY_STATS_RETENTION_DAYS = 90
+
+
+def _update_stats(company_id, deltas):
+    """
+    Aplicar incrementos/decrementos a la fila de estadísticas en un solo UPDATE.
+    La fila se crea la primera vez que se necesita.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not company_id or not deltas:
+        return
+    expressions = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()}
+    if CompanyStats.objects.filter(pk=company_id).update(**expressions):
+        return
+    try:
+        with transaction.atomic():
+            CompanyStats.objects.create(company_id=company_id)
+    except IntegrityError:
+        pass  # Otro proceso la creó al mismo tiempo
+    CompanyStats.objects.filter(pk=company_id).update(**expressions)
+
+
+def record_card_status_change(company_id, old_status, new_status, count=1):
+    """Mover `count` tarjetas de un estado a otro"""
+    if old_status == new_status:
+        return
+    deltas = {}
+    if old_status:
+        deltas[f'cards_{old_status}'] = -count
+    if new_status:
+        deltas[f'cards_{new_status}'] = count
+    _update_stats(company_id, deltas)
+
+
+def record_card_created(company_id, status, created_at=None, count=1):
+    """Registrar tarjetas nuevas (estado y día de creación)"""
+    record_card_status_change(company_id, None, status, count)
+    day = timezone.localdate(created_at) if created_at else timezone.localdate()
+    updated = CompanyDailyStats.objects.filter(company_id=company_id, day=day).update(
+        cards_created=F('cards_created') + count
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                CompanyDailyStats.objects.create(company_id=company_id, day=day, cards_created=count)
+        except IntegrityError:
+            CompanyDailyStats.objects.filter(company_id=company_id, day=day).update(
+                cards_created=F('cards_created') + count
+            )
+
+
+def record_card_deleted(company_id, status, media_bytes=0):
+    _update_stats(company_id, {f'cards_{status}': -1, 'media_bytes': -(media_bytes or 0)})
+
+
+def record_user_role_change(company_id, old_role, new_role):
+    if old_role == new_role:
+        return
+    deltas = {}
+    if old_role:
+        deltas[f'users_{old_role}'] = -1
+    if new_role:
+        deltas[f'users_{new_role}'] = 1
+    _update_stats(company_id, deltas)
+
+
+def record_template_active_change(company_id, delta):
+    _update_stats(company_id, {'templates_active': delta})
+
+
+def record_media_bytes(company_id, delta):
+    _update_stats(company_id, {'media_bytes': delta})
+
+
+def measure_card_media_bytes(card):
+    """Tamaño real en disco de los archivos de una tarjeta"""
+    total = 0
+    for field_name in CARD_FILE_FIELDS:
+        field_file = getattr(card, field_name, None)
+        if not field_file:
+            continue
+        try:
+            total += field_file.storage.size(field_file.name)
+        except (OSError, NotImplementedError):
+            pass  # El archivo no existe en disco
+    return total
+
+
+def sync_card_media_bytes(card):
+    """
+    Medir los archivos de la tarjeta y aplicar la diferencia a su empresa.
+    Usa update() para no disparar otra vez las señales de guardado.
+    """
+    from cards.models import IDCard
+
+    measured = measure_card_media_bytes(card)
+    delta = measured - (card.media_bytes or 0)
+    if delta:
+        IDCard.objects.filter(pk=card.pk).update(media_bytes=measured)
+        card.media_bytes = measured
+        record_media_bytes(card.company_id, delta)
+    return measured
+
+
+def cards_created_since(company_id, days):
+    """Tarjetas creadas en los últimos `days` días (incluye hoy)"""
+    since = timezone.localdate() - timedelta(days=days)
+    result = CompanyDailyStats.objects.filter(company_id=company_id, day__gte=since).aggregate(
+        total=Sum('cards_created')
+    )
+    return result['total'] or 0
+
+
+def prune_daily_stats(today=None):
+    """Borrar los días fuera de DAILY_STATS_RETENTION_DAYS (se llama desde expire_cards, a diario)"""
+    today = today or timezone.localdate()
+    since = today - timedelta(days=DAILY_STATS_RETENTION_DAYS)
+    deleted, _ = CompanyDailyStats.objects.filter(day__lt=since).delete()
+    return deleted
+
+
+def rebuild_stats(queryset=None, measure_media=False):
+    """
+    Recalcular las estadísticas desde las tablas reales.
+    Con measure_media=True se vuelven a medir los archivos de todas las tarjetas.
+    """
+    from cards.models import CardTemplate, IDCard
+    from users.models import CompanyUser
+
+    if queryset is None:
+        queryset = Company.objects.all()
+    company_ids = list(queryset.values_list('pk', flat=True))
+
+    if measure_media:
+        cards = IDCard.objects.filter(company_id__in=company_ids).only(
+            'pk', 'company_id', 'media_bytes', *CARD_FILE_FIELDS
+        )
+        batch = []
+        for card in cards.iterator(chunk_size=2000):
+            measured = measure_card_media_bytes(card)
+            if measured != card.media_bytes:
+                card.media_bytes = measured
+                batch.append(card)
+            if len(batch) >= 2000:
+                IDCard.objects.bulk_update(batch, ['media_bytes'])
+                batch = []
+        if batch:
+            IDCard.objects.bulk_update(batch, ['media_bytes'])
+
+    statuses = [value for value, _ in IDCard.STATUS_CHOICES]
+    roles = [value for value, _ in CompanyUser.ROLES]
+
+    card_rows = IDCard.objects.filter(company_id__in=company_ids).order_by().values('company_id').annotate(
+        media=Sum('media_bytes'),
+        **{f'cards_{s}': Count('pk', filter=Q(status=s)) for s in statuses}
+    )
+    user_rows = CompanyUser.objects.filter(company_id__in=company_ids).order_by().values('company_id').annotate(
+        **{f'users_{r}': Count('pk', filter=Q(role=r)) for r in roles}
+    )
+    template_rows = CardTemplate.objects.filter(
+        company_id__in=company_ids, is_active=True
+    ).order_by().values('company_id').annotate(total=Count('pk'))
+
+    stats = {company_id: CompanyStats(company_id=company_id) for company_id in company_ids}
+    for row in card_rows:
+        item = stats[row.pop('company_id')]
+        item.media_bytes = row.pop('media') or 0
+        for field, value in row.items():
+            setattr(item, field, value)
+    for row in user_rows:
+        item = stats[row.pop('company_id')]
+        for field, value in row.items():
+            setattr(item, field, value)
+    for row in template_rows:
+        stats[row['company_id']].templates_active = row['total']
+
+    with transaction.atomic():
+        CompanyStats.objects.filter(pk__in=company_ids).delete()
+        CompanyStats.objects.bulk_create(stats.values())
+
+        # Reconstruir los últimos días de creación
+        since = timezone.localdate() - timedelta(days=DAILY_STATS_RETENTION_DAYS)
+        CompanyDailyStats.objects.filter(company_id__in=company_ids).delete()
+        daily_rows = (
+            IDCard.objects.filter(
+                company_id__in=company_ids,
+                created_at__gte=timezone.make_aware(datetime.combine(since, time.min)),
+            )
+            .order_by()
+            .values('company_id', 'created_at__date')
+            .annotate(total=Count('pk'))
+        )
+        CompanyDailyStats.objects.bulk_create([
+            CompanyDailyStats(company_id=row['company_id'], day=row['created_at__date'], cards_created=row['total'])
+            for row in daily_rows
+        ])
+
+    return len(stats)
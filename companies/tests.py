@@ -1,3 +1,258 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from cards.bulk import bulk_update_cards
+from cards.models import CardTemplate, IDCard
+from users.models import CompanyUser
+from .counters import adjust_counter, reconcile_counters
+from .models import Company, WebhookDelivery, WebhookEvent
+from .quotas import QuotaExceeded, reserve_quota
+from .webhooks import deliver_company_events, sign_payload
 
-# Create your tests here.
+
+def create_company(plan='premium', **kwargs):
+    admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+    company = Company.objects.create(
+        name='Acme', contact_email='acme@example.com', created_by=admin, subscription_plan=plan, **kwargs
+    )
+    template = CardTemplate.objects.create(company=company, name='Básica', created_by=admin)
+    return company, template
+
+
+def create_card(company, template, number, **kwargs):
+    return IDCard.objects.create(
+        company=company,
+        template=template,
+        person_name=f'Persona {number}',
+        id_number=f'ID{number}',
+        card_number=f'C{number}',
+        **kwargs,
+    )
+
+
+class WebhookStubHandler(BaseHTTPRequestHandler):
+    """Receptor de webhooks: guarda cada POST y responde con `status_code`"""
+    status_code = 200
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.received.append((dict(self.headers), body))
+        self.send_response(self.status_code)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookOutboxTests(TestCase):
+    """Eventos en la bandeja de salida al guardar tarjetas"""
+
+    def setUp(self):
+        self.company, self.template = create_company()
+
+    def enable_webhooks(self):
+        self.company.webhook_url = 'http://127.0.0.1:9/hook'
+        self.company.save()
+
+    def test_no_events_without_webhook_url(self):
+        create_card(self.company, self.template, 1)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_card_save_queues_events(self):
+        self.enable_webhooks()
+        card = create_card(self.company, self.template, 1)
+        card.department = 'Ventas'
+        card.save()
+        card.status = 'revoked'
+        card.save()
+
+        events = list(WebhookEvent.objects.order_by('id').values_list('event_type', flat=True))
+        self.assertEqual(events, ['card.created', 'card.updated', 'card.revoked'])
+        self.assertEqual(WebhookEvent.objects.last().payload['id'], str(card.pk))
+
+    def test_bulk_update_queues_one_event_per_card(self):
+        self.enable_webhooks()
+        for number in range(3):
+            create_card(self.company, self.template, number)
+        WebhookEvent.objects.all().delete()
+
+        updated = bulk_update_cards(IDCard.objects.filter(company=self.company), {'department': 'Ventas'})
+
+        self.assertEqual(updated, 3)
+        events = WebhookEvent.objects.filter(event_type='card.updated')
+        self.assertEqual(events.count(), 3)
+        self.assertTrue(all(event.payload['department'] == 'Ventas' for event in events))
+
+
+class WebhookDeliveryTests(TestCase):
+    """Envío a un servidor HTTP local: entregados, reintentos y firma"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(('127.0.0.1', 0), WebhookStubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        WebhookStubHandler.status_code = 200
+        WebhookStubHandler.received = []
+        url = f'http://127.0.0.1:{self.server.server_port}/hook'
+        self.company, self.template = create_company(webhook_url=url)
+        for number in range(2):
+            create_card(self.company, self.template, number)
+
+    def test_success_marks_events_delivered(self):
+        delivery = deliver_company_events(self.company.pk)
+
+        self.assertTrue(delivery.success)
+        self.assertEqual(delivery.status_code, 200)
+        self.assertEqual(len(delivery.event_ids), 2)
+        self.assertFalse(WebhookEvent.objects.exclude(status='delivered').exists())
+        self.assertEqual(len(WebhookStubHandler.received), 1)
+
+    def test_signature_header(self):
+        deliver_company_events(self.company.pk)
+
+        headers, body = WebhookStubHandler.received[0]
+        expected = sign_payload(self.company.webhook_secret, headers['X-Webhook-Timestamp'], body)
+        self.assertEqual(headers['X-Webhook-Signature'], f'sha256={expected}')
+        self.assertEqual(
+            [event['type'] for event in json.loads(body)['events']],
+            ['card.created', 'card.created'],
+        )
+
+    @override_settings(WEBHOOK_RETRY_BASE=30, WEBHOOK_RETRY_MAX=3600, WEBHOOK_MAX_ATTEMPTS=8)
+    def test_server_error_schedules_retry(self):
+        WebhookStubHandler.status_code = 500
+        before = timezone.now()
+
+        delivery = deliver_company_events(self.company.pk)
+
+        self.assertFalse(delivery.success)
+        self.assertEqual(delivery.status_code, 500)
+        for event in WebhookEvent.objects.all():
+            self.assertEqual(event.status, 'pending')
+            self.assertEqual(event.attempts, 1)
+            self.assertEqual(event.last_error, 'HTTP 500')
+            # Primer reintento: 30 s con ±20 % de azar
+            self.assertGreaterEqual(event.next_attempt_at, before + timedelta(seconds=24))
+            self.assertLessEqual(event.next_attempt_at, timezone.now() + timedelta(seconds=36))
+
+        # Hasta entonces no se vuelve a enviar
+        self.assertIsNone(deliver_company_events(self.company.pk))
+        self.assertEqual(len(WebhookStubHandler.received), 1)
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=3)
+    def test_last_attempt_marks_events_failed(self):
+        WebhookStubHandler.status_code = 503
+        WebhookEvent.objects.update(attempts=2)
+
+        delivery = deliver_company_events(self.company.pk)
+
+        self.assertEqual(delivery.attempt, 3)
+        self.assertEqual(WebhookDelivery.objects.count(), 1)
+        self.assertFalse(WebhookEvent.objects.exclude(status='failed').exists())
+        self.assertEqual(WebhookEvent.objects.first().attempts, 3)
+
+
+class QuotaTests(TestCase):
+    """Reserva de cuota con un UPDATE condicional sobre el contador de la empresa"""
+
+    def setUp(self):
+        # Plan free: 3 plantillas, ya hay una
+        self.company, self.template = create_company(plan='free')
+
+    def template_count(self):
+        self.company.refresh_from_db()
+        return self.company.template_count
+
+    def test_reservation_consumed_by_created_objects(self):
+        with reserve_quota(self.company.pk, 'templates', count=2):
+            CardTemplate.objects.create(company=self.company, name='Otra')
+            CardTemplate.objects.create(company=self.company, name='Tercera')
+
+        self.assertEqual(self.template_count(), 3)
+
+    def test_unused_reservation_is_released(self):
+        with reserve_quota(self.company.pk, 'templates', count=2):
+            CardTemplate.objects.create(company=self.company, name='Otra')
+
+        self.assertEqual(self.template_count(), 2)
+
+    def test_exceeding_limit_raises_without_counting(self):
+        with self.assertRaises(QuotaExceeded) as raised:
+            with reserve_quota(self.company.pk, 'templates', count=3):
+                pass
+
+        self.assertEqual(
+            (raised.exception.limit, raised.exception.used, raised.exception.remaining),
+            (3, 1, 2),
+        )
+        self.assertEqual(self.template_count(), 1)
+
+    def test_not_enforced_for_superusers(self):
+        with reserve_quota(self.company.pk, 'templates', count=5, enforce=False):
+            pass
+
+        self.assertEqual(self.template_count(), 1)
+
+    def test_api_answers_403_with_remaining_capacity(self):
+        user = User.objects.create_user('ed', 'ed@example.com', 'x')
+        CompanyUser.objects.create(user=user, company=self.company, role='admin')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        for name in ('Dos', 'Tres'):
+            response = client.post('/api/cards/templates/', {'company': str(self.company.pk), 'name': name}, format='json')
+            self.assertEqual(response.status_code, 201)
+        response = client.post('/api/cards/templates/', {'company': str(self.company.pk), 'name': 'Cuatro'}, format='json')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['resource'], 'templates')
+        self.assertEqual((response.data['limit'], response.data['used'], response.data['remaining']), (3, 3, 0))
+        self.assertEqual(self.template_count(), 3)
+
+
+class CounterTests(TestCase):
+    """Contadores denormalizados de Company (Greatest(F() + delta, 0))"""
+
+    def setUp(self):
+        self.company, self.template = create_company()
+
+    def counts(self):
+        self.company.refresh_from_db()
+        return self.company.card_count, self.company.template_count, self.company.user_count
+
+    def test_signals_keep_counts(self):
+        cards = [create_card(self.company, self.template, number) for number in range(3)]
+        CompanyUser.objects.create(
+            user=User.objects.create_user('ed', 'ed@example.com', 'x'), company=self.company, role='admin'
+        )
+        cards[0].delete()
+
+        self.assertEqual(self.counts(), (2, 1, 1))
+
+    def test_adjust_never_goes_below_zero(self):
+        adjust_counter(self.company.pk, 'card_count', 2)
+        adjust_counter(self.company.pk, 'card_count', -5)
+
+        self.assertEqual(self.counts()[0], 0)
+
+    def test_reconcile_fixes_drift(self):
+        create_card(self.company, self.template, 1)
+        Company.objects.filter(pk=self.company.pk).update(card_count=40, template_count=0, user_count=7)
+
+        self.assertEqual(reconcile_counters(), 1)
+        self.assertEqual(self.counts(), (1, 1, 0))
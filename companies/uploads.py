@@ -0,0 +1,133 @@
+# backend/companies/uploads.py
+import hashlib
+import os
+import re
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ShardedUploadTo:
+    """
+    upload_to que reparte los archivos por empresa y prefijo de hash:
+        card_photos/<empresa>/ab/cd/abcd1234....jpg
+
+    Así ningún directorio acumula millones de entradas. El hash se calcula
+    con el pk del objeto, la carpeta y el nombre original, de modo que el
+    mismo archivo de la misma tarjeta siempre cae en la misma ruta.
+    `tenant_field` es el atributo con el ID de la empresa ('pk' para Company).
+    """
+
+    def __init__(self, prefix, tenant_field='company_id'):
+        self.prefix = prefix.strip('/')
+        self.tenant_field = tenant_field
+
+    def __call__(self, instance, filename):
+        return self.path_for(instance, filename)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ShardedUploadTo)
+            and self.prefix == other.prefix
+            and self.tenant_field == other.tenant_field
+        )
+
+    def tenant(self, instance):
+        value = getattr(instance, self.tenant_field, None)
+        return str(value) if value else 'shared'
+
+    def path_for(self, instance, filename):
+        basename = os.path.basename(filename)
+        extension = os.path.splitext(basename)[1].lower()
+        digest = hashlib.sha1(f'{instance.pk}:{self.prefix}:{basename}'.encode('utf-8')).hexdigest()
+        return f'{self.prefix}/{self.tenant(instance)}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def is_sharded(self, name):
+        """True si la ruta ya sigue el esquema <prefijo>/<empresa>/xx/yy/<hash>"""
+        pattern = rf'^{re.escape(self.prefix)}/[^/]+/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{40}}'
+        return re.match(pattern, name) is not None
+
+
+def sharded_file_fields():
+    """(modelo, campo) de todos los FileField que usan ShardedUploadTo"""
+    from django.apps import apps
+    from django.db import models
+
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and isinstance(field.upload_to, ShardedUploadTo):
+                yield model, field
+
+
+def _flush(model, field, moves):
+    """Guardar las rutas nuevas de un bloque con un solo UPDATE (CASE WHEN)"""
+    from django.db.models import Case, Value, When
+
+    model._base_manager.filter(pk__in=[pk for pk, _ in moves]).update(**{
+        field.attname: Case(*[When(pk=pk, then=Value(path)) for pk, path in moves], output_field=field)
+    })
+
+
+def shard_existing_files(model, field, root, chunk_size=1000, dry_run=False):
+    """
+    Mover los archivos de un campo al esquema repartido y reescribir las rutas.
+    Los archivos se mueven con os.replace (mismo disco) y las rutas se guardan
+    por bloques; si el UPDATE falla, los archivos del bloque vuelven a su sitio.
+    Devuelve (movidos, faltantes).
+    """
+    from types import SimpleNamespace
+
+    upload_to = field.upload_to
+    tenant_field = upload_to.tenant_field
+    columns = ['pk', field.attname] + ([tenant_field] if tenant_field != 'pk' else [])
+    rows = (
+        model._base_manager.exclude(**{field.attname: ''})
+        .exclude(**{f'{field.attname}__isnull': True})
+        .order_by()
+        .values_list(*columns)
+    )
+
+    moved = {}  # ruta vieja -> ruta nueva (archivos compartidos entre filas)
+    pending = []
+    total = missing = 0
+
+    def flush():
+        try:
+            _flush(model, field, [(pk, new) for pk, _, new, _ in pending])
+        except Exception:
+            for _, old, new, did_move in pending:
+                if did_move:
+                    os.replace(os.path.join(root, new), os.path.join(root, old))
+            raise
+        pending.clear()
+
+    for row in rows.iterator(chunk_size=chunk_size):
+        pk, current = row[0], row[1]
+        if upload_to.is_sharded(current):
+            continue
+        old = current[len('media/'):] if current.startswith('media/') else current
+
+        if old in moved:
+            new, did_move = moved[old], False
+        else:
+            tenant = {tenant_field: row[2]} if tenant_field != 'pk' else {}
+            new = upload_to.path_for(SimpleNamespace(pk=pk, **tenant), old)
+            if not os.path.exists(os.path.join(root, old)):
+                missing += 1
+                continue
+            did_move = True
+            if not dry_run:
+                destination = os.path.join(root, new)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                os.replace(os.path.join(root, old), destination)
+            moved[old] = new
+
+        total += 1
+        if dry_run:
+            continue
+        pending.append((pk, old, new, did_move))
+        if len(pending) >= chunk_size:
+            flush()
+
+    if pending:
+        flush()
+    return total, missing
@@ -3,19 +3,27 @@ from rest_framework.decorators import action, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Q
-from .models import Company
-from .serializers import CompanySerializer
+from django.db.models import Q
+from .models import Company, CompanyStats, WebhookDelivery, WebhookEvent, generate_webhook_secret
+from .serializers import CompanySerializer, WebhookDeliverySerializer
+from .quotas import quota_usage
+from .stats import cards_created_since
+from users.authentication import invalidate_api_key
 from users.models import CompanyUser
-from cards.models import CardTemplate, IDCard
+from users.permissions import user_company_ids, get_membership, has_company_permission
+from cards.models import IDCard
+from config.db_routers import ReplicaReadMixin
+from config.response_cache import cache_response
 
-class CompanyViewSet(viewsets.ModelViewSet):
+class CompanyViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar empresas.
     Los superusuarios pueden ver todas las empresas.
     Los usuarios normales solo ven las empresas a las que pertenecen.
     """
     serializer_class = CompanySerializer
+    # GET que guarda la empresa completa: leerla del primario
+    primary_actions = ('regenerate_api_key',)
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'contact_email', 'tax_id']
@@ -26,14 +34,18 @@ class CompanyViewSet(viewsets.ModelViewSet):
         Filtra las empresas según el tipo de usuario.
         """
         user = self.request.user
+        queryset = Company.objects.all()
+        
+        # La acción stats lee la fila de estadísticas en la misma consulta
+        if self.action == 'stats':
+            queryset = queryset.select_related('stats')
         
         # Superusuarios ven todas las empresas
         if user.is_superuser:
-            return Company.objects.all()
+            return queryset
         
         # Usuarios normales ven solo las empresas a las que pertenecen
-        company_ids = CompanyUser.objects.filter(user=user).values_list('company_id', flat=True)
-        return Company.objects.filter(id__in=company_ids)
+        return queryset.filter(id__in=user_company_ids(self.request))
     
     def get_permissions(self):
         """
@@ -48,6 +60,10 @@ class CompanyViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
     
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         """
         Al crear una empresa, se asigna el usuario actual como creador.
@@ -63,58 +79,52 @@ class CompanyViewSet(viewsets.ModelViewSet):
         
         # Verificar que el usuario tenga acceso a esta empresa
         if not request.user.is_superuser:
-            if not CompanyUser.objects.filter(user=request.user, company=company).exists():
+            if not has_company_permission(request, company.id):
                 return Response(
                     {'error': 'No tienes acceso a esta empresa'},
                     status=status.HTTP_403_FORBIDDEN
                 )
         
-        # Estadísticas de tarjetas
-        cards_total = IDCard.objects.filter(company=company).count()
-        cards_by_status = IDCard.objects.filter(company=company).values('status').annotate(
-            count=Count('id')
-        )
-        
-        # Estadísticas de usuarios
-        users_total = CompanyUser.objects.filter(company=company).count()
-        users_by_role = CompanyUser.objects.filter(company=company).values('role').annotate(
-            count=Count('id')
-        )
-        
-        # Estadísticas de plantillas
-        templates_total = CardTemplate.objects.filter(company=company).count()
-        active_templates = CardTemplate.objects.filter(company=company, is_active=True).count()
-        
-        # Estadísticas de uso
-        from datetime import date, timedelta
-        thirty_days_ago = date.today() - timedelta(days=30)
-        cards_created_last_30 = IDCard.objects.filter(
-            company=company,
-            created_at__date__gte=thirty_days_ago
-        ).count()
+        # Estadísticas mantenidas incrementalmente (una sola fila)
+        try:
+            company_stats = company.stats
+        except CompanyStats.DoesNotExist:
+            company_stats = CompanyStats(company=company)
+        
+        cards_by_status = {
+            value: getattr(company_stats, f'cards_{value}') for value, _ in IDCard.STATUS_CHOICES
+        }
+        users_by_role = {
+            value: getattr(company_stats, f'users_{value}') for value, _ in CompanyUser.ROLES
+        }
+        size_mb = round(company_stats.media_bytes / (1024 * 1024), 2)
         
         stats = {
             'company_info': {
                 'name': company.name,
                 'plan': company.subscription_plan,
                 'card_limit': company.card_limit,
+                'template_limit': company.template_limit,
                 'is_active': company.is_active,
             },
+            'quotas': quota_usage(company),
             'cards': {
-                'total': cards_total,
-                'by_status': {item['status']: item['count'] for item in cards_by_status},
-                'created_last_30_days': cards_created_last_30,
+                'total': company.card_count,
+                'by_status': {key: count for key, count in cards_by_status.items() if count},
+                'created_last_30_days': cards_created_since(company.id, 30),
             },
             'users': {
-                'total': users_total,
-                'by_role': {item['role']: item['count'] for item in users_by_role},
+                'total': company.user_count,
+                'by_role': {key: count for key, count in users_by_role.items() if count},
             },
             'templates': {
-                'total': templates_total,
-                'active': active_templates,
+                'total': company.template_count,
+                'active': company_stats.templates_active,
             },
             'storage': {
-                'estimated_size_mb': cards_total * 0.5,  # Estimación: 0.5MB por tarjeta
+                'size_bytes': company_stats.media_bytes,
+                'size_mb': size_mb,
+                'estimated_size_mb': size_mb,  # Compatibilidad con clientes anteriores
             }
         }
         
@@ -129,12 +139,9 @@ class CompanyViewSet(viewsets.ModelViewSet):
         
         # Verificar permisos
         if not request.user.is_superuser:
-            company_user = CompanyUser.objects.filter(
-                user=request.user, 
-                company=company
-            ).first()
+            company_user = get_membership(request, company.id)
             
-            if not company_user or not company_user.can_manage_users:
+            if not company_user or not company_user['can_manage_users']:
                 return Response(
                     {'error': 'No tienes permiso para ver usuarios de esta empresa'},
                     status=status.HTTP_403_FORBIDDEN
@@ -161,16 +168,65 @@ class CompanyViewSet(viewsets.ModelViewSet):
             )
         
         import uuid
+        old_api_key = company.api_key
         new_api_key = uuid.uuid4()
         company.api_key = new_api_key
         company.save()
         
+        # La clave anterior deja de funcionar de inmediato
+        invalidate_api_key(old_api_key)
+        
         return Response({
             'message': 'API Key regenerada exitosamente',
             'new_api_key': str(new_api_key)
         })
     
+    @action(detail=True, methods=['post'])
+    def regenerate_webhook_secret(self, request, pk=None):
+        """
+        Regenerar el secreto con el que se firman los webhooks.
+        """
+        company = self.get_object()
+        
+        if not request.user.is_superuser and company.created_by != request.user:
+            return Response(
+                {'error': 'No tienes permiso para regenerar el secreto de webhooks'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        company.webhook_secret = generate_webhook_secret()
+        company.save(update_fields=['webhook_secret', 'updated_at'])
+        
+        return Response({
+            'message': 'Secreto de webhooks regenerado exitosamente',
+            'webhook_secret': company.webhook_secret
+        })
+    
+    @action(detail=True, methods=['get'])
+    def webhook_deliveries(self, request, pk=None):
+        """
+        Últimos envíos de webhooks de la empresa y eventos pendientes.
+        """
+        company = self.get_object()
+        
+        if not request.user.is_superuser:
+            company_user = get_membership(request, company.id)
+            if not company_user or company_user['role'] not in ['owner', 'admin']:
+                return Response(
+                    {'error': 'No tienes permiso para ver los webhooks de esta empresa'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        deliveries = WebhookDelivery.objects.filter(company=company)[:50]
+        pending = WebhookEvent.objects.filter(company=company, status='pending').count()
+        
+        return Response({
+            'pending_events': pending,
+            'deliveries': WebhookDeliverySerializer(deliveries, many=True).data,
+        })
+    
     @action(detail=False, methods=['get'])
+    @cache_response
     def my_companies(self, request):
         """
         Listar solo las empresas del usuario actual.
@@ -180,8 +236,7 @@ class CompanyViewSet(viewsets.ModelViewSet):
         if user.is_superuser:
             companies = Company.objects.all()
         else:
-            company_ids = CompanyUser.objects.filter(user=user).values_list('company_id', flat=True)
-            companies = Company.objects.filter(id__in=company_ids)
+            companies = Company.objects.filter(id__in=user_company_ids(request))
         
         page = self.paginate_queryset(companies)
         if page is not None:
@@ -0,0 +1,250 @@
+# backend/companies/webhooks.py
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Company, WebhookDelivery, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_ENABLED_CACHE_KEY = 'webhooks:enabled:{}'
+
+# Cambios de estado con evento propio; el resto se envía como card.updated
+STATUS_EVENTS = {
+    'revoked': 'card.revoked',
+    'expired': 'card.expired',
+}
+
+
+# ========== BANDEJA DE SALIDA ==========
+
+def webhooks_enabled(company_id):
+    """True si la empresa tiene URL de webhooks (con caché compartida, se invalida al guardar la empresa)"""
+    timeout = settings.WEBHOOK_ENABLED_CACHE_TIMEOUT
+    key = WEBHOOK_ENABLED_CACHE_KEY.format(company_id)
+    enabled = cache.get(key) if timeout else None
+    if enabled is None:
+        enabled = Company.objects.filter(pk=company_id, is_active=True).exclude(webhook_url='').exists()
+        if timeout:
+            cache.set(key, enabled, timeout)
+    return enabled
+
+
+def invalidate_webhooks_enabled(company_id):
+    cache.delete(WEBHOOK_ENABLED_CACHE_KEY.format(company_id))
+
+
+def card_payload(card):
+    """Datos de una tarjeta para el webhook, desde una instancia o un dict de values()"""
+    from cards.models import IDCard
+
+    if isinstance(card, dict):
+        payload = {name: card.get(name) for name in IDCard.WEBHOOK_FIELDS}
+        payload['id'] = card['id']
+        payload['company_id'] = card['company_id']
+    else:
+        payload = {name: getattr(card, name) for name in IDCard.WEBHOOK_FIELDS}
+        payload['id'] = card.pk
+        payload['company_id'] = card.company_id
+    return payload
+
+
+def queue_card_event(card, event_type):
+    """Encolar un evento de una tarjeta (dentro de la transacción que la guardó)"""
+    if not webhooks_enabled(card.company_id):
+        return None
+    return WebhookEvent.objects.create(
+        company_id=card.company_id,
+        event_type=event_type,
+        payload=card_payload(card),
+    )
+
+
+def webhook_cards(queryset):
+    """
+    Datos de las tarjetas del queryset cuyas empresas tienen webhooks.
+    Una sola consulta; llamar antes de un UPDATE masivo que pueda sacarlas del filtro.
+    """
+    from cards.models import IDCard
+
+    return list(
+        queryset.filter(company__is_active=True).exclude(company__webhook_url='')
+        .order_by()
+        .values('id', 'company_id', *IDCard.WEBHOOK_FIELDS)
+    )
+
+
+def queue_card_events(event_type, cards, **changes):
+    """
+    Encolar un evento por tarjeta con un solo INSERT.
+    `cards` viene de webhook_cards(); `changes` pisa valores ya actualizados.
+    """
+    events = [
+        WebhookEvent(
+            company_id=card['company_id'],
+            event_type=event_type,
+            payload={**card_payload(card), **changes},
+        )
+        for card in cards
+    ]
+    WebhookEvent.objects.bulk_create(events, batch_size=1000)
+    return len(events)
+
+
+# ========== ENVÍO ==========
+
+def sign_payload(secret, timestamp, body):
+    """Firma HMAC-SHA256 de '<timestamp>.<cuerpo>' con el secreto de la empresa"""
+    message = f'{timestamp}.'.encode('utf-8') + body
+    return hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+def retry_delay(attempts):
+    """Espera antes del siguiente intento: exponencial con tope y algo de azar"""
+    delay = min(settings.WEBHOOK_RETRY_BASE * 2 ** max(attempts - 1, 0), settings.WEBHOOK_RETRY_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def post_webhook(url, body, headers, timeout):
+    """POST con urllib; devuelve (código HTTP o None, error)"""
+    request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, ''
+    except urllib.error.HTTPError as e:
+        return e.code, f'HTTP {e.code}'
+    except Exception as e:
+        return None, str(e) or e.__class__.__name__
+
+
+def claim_events(company_id, batch_size):
+    """
+    Tomar un lote de eventos pendientes de una empresa.
+    Se reservan moviendo next_attempt_at más adelante, así otro worker no
+    los envía mientras tanto y el envío ocurre fuera de la transacción.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(company_id=company_id, status='pending', next_attempt_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if events:
+            WebhookEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                next_attempt_at=now + timedelta(seconds=settings.WEBHOOK_TIMEOUT * 2 + 60)
+            )
+    return events
+
+
+def deliver_company_events(company_id, batch_size=None):
+    """Enviar un lote de eventos de una empresa y registrar el resultado"""
+    events = claim_events(company_id, batch_size or settings.WEBHOOK_BATCH_SIZE)
+    if not events:
+        return None
+
+    company = Company.objects.only('webhook_url', 'webhook_secret', 'is_active').get(pk=company_id)
+    ids = [event.pk for event in events]
+    if not company.webhook_url or not company.is_active:
+        WebhookEvent.objects.filter(pk__in=ids).update(
+            status='failed', last_error='La empresa no tiene webhooks activos'
+        )
+        return None
+
+    body = json.dumps({
+        'company_id': str(company_id),
+        'events': [
+            {'id': event.pk, 'type': event.event_type, 'created_at': event.created_at, 'data': event.payload}
+            for event in events
+        ],
+    }, cls=DjangoJSONEncoder).encode('utf-8')
+    timestamp = str(int(time.time()))
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'idcards-webhooks/1.0',
+        'X-Webhook-Timestamp': timestamp,
+        'X-Webhook-Signature': f'sha256={sign_payload(company.webhook_secret, timestamp, body)}',
+    }
+
+    attempt = max(event.attempts for event in events) + 1
+    started = time.monotonic()
+    status_code, error = post_webhook(company.webhook_url, body, headers, settings.WEBHOOK_TIMEOUT)
+    duration_ms = int((time.monotonic() - started) * 1000)
+    success = status_code is not None and 200 <= status_code < 300
+
+    now = timezone.now()
+    if success:
+        WebhookEvent.objects.filter(pk__in=ids).update(
+            status='delivered', delivered_at=now, attempts=F('attempts') + 1, last_error=''
+        )
+    elif attempt >= settings.WEBHOOK_MAX_ATTEMPTS:
+        WebhookEvent.objects.filter(pk__in=ids).update(
+            status='failed', attempts=F('attempts') + 1, last_error=error
+        )
+    else:
+        WebhookEvent.objects.filter(pk__in=ids).update(
+            next_attempt_at=now + retry_delay(attempt), attempts=F('attempts') + 1, last_error=error
+        )
+
+    return WebhookDelivery.objects.create(
+        company_id=company_id,
+        url=company.webhook_url,
+        event_ids=ids,
+        attempt=attempt,
+        success=success,
+        status_code=status_code,
+        error=error,
+        duration_ms=duration_ms,
+    )
+
+
+def companies_with_due_events(limit):
+    return list(
+        WebhookEvent.objects.filter(status='pending', next_attempt_at__lte=timezone.now())
+        .order_by()
+        .values_list('company_id', flat=True)
+        .distinct()[:limit]
+    )
+
+
+def _deliver_in_thread(company_id, batch_size):
+    close_old_connections()
+    try:
+        return deliver_company_events(company_id, batch_size)
+    except Exception:
+        logger.exception('Error enviando webhooks de la empresa %s', company_id)
+    finally:
+        close_old_connections()
+
+
+def deliver_pending(workers=None, batch_size=None, max_companies=100):
+    """
+    Una pasada del worker: un lote por empresa con eventos pendientes,
+    como mucho `workers` envíos en paralelo. Devuelve los WebhookDelivery creados.
+    """
+    company_ids = companies_with_due_events(max_companies)
+    if not company_ids:
+        return []
+    workers = workers or settings.WEBHOOK_WORKERS
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhooks') as executor:
+        results = executor.map(lambda company_id: _deliver_in_thread(company_id, batch_size), company_ids)
+        return [delivery for delivery in results if delivery is not None]
+
+
+def purge_delivered_events(days):
+    """Borrar eventos entregados hace más de `days` días"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = WebhookEvent.objects.filter(status='delivered', delivered_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,170 @@
+# backend/config/db_routers.py
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_CACHE_KEY = 'db-pin:{}'
+
+# Estado por petición/hilo: leer de réplica, fijado al primario, hubo escritura
+_use_replica = ContextVar('use_replica', default=False)
+_pinned = ContextVar('pinned_to_primary', default=False)
+_wrote = ContextVar('wrote_to_primary', default=None)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Enviar las lecturas del bloque a una réplica (si hay y no está fijado al primario)"""
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_iterator(iterable):
+    """
+    Recorrer un generador (ej. StreamingHttpResponse) con el enrutado de la
+    vista que lo creó: el cuerpo se genera después de que la vista y el
+    middleware terminan, cuando el contexto ya se restableció.
+    """
+    use, pinned = _use_replica.get(), _pinned.get()
+
+    def iterate():
+        token = _use_replica.set(use)
+        pin_token = _pinned.set(pinned)
+        try:
+            yield from iterable
+        finally:
+            _pinned.reset(pin_token)
+            _use_replica.reset(token)
+    return iterate()
+
+
+def pin_key(user_id):
+    return PIN_CACHE_KEY.format(user_id)
+
+
+def is_pinned_user(user):
+    return bool(user and user.is_authenticated and cache.get(pin_key(user.pk)))
+
+
+class ReplicaRouter:
+    """
+    Lecturas a réplica solo donde se pide (ReplicaReadMixin, use_replica) y
+    nunca si la petición está fijada al primario o dentro de una
+    transacción. Las escrituras y las migraciones siempre van al primario.
+    Sin DATABASE_REPLICAS configuradas todo va a 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or not _use_replica.get() or _pinned.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        wrote = _wrote.get()
+        if wrote is not None:
+            wrote.append(model._meta.label)  # PrimaryPinningMiddleware fija al cliente
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas y primario tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware:
+    """
+    Tras una escritura, el cliente lee del primario durante
+    DATABASE_REPLICA_PIN_SECONDS: cookie para navegadores/sesión y marca en
+    caché por usuario para clientes con token (sin cookies). Así nadie lee
+    una réplica atrasada justo después de guardar.
+    Funciona en WSGI y en ASGI (no obliga a las vistas async a usar un hilo).
+    """
+    cookie_name = 'db_pin'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        pinned_token = _pinned.set(self.cookie_name in request.COOKIES)
+        wrote = []
+        wrote_token = _wrote.set(wrote)
+        try:
+            response = self.get_response(request)
+        finally:
+            _wrote.reset(wrote_token)
+            _pinned.reset(pinned_token)
+
+        if wrote or request.method not in SAFE_METHODS:
+            self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        pinned_token = _pinned.set(self.cookie_name in request.COOKIES)
+        wrote = []
+        wrote_token = _wrote.set(wrote)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _wrote.reset(wrote_token)
+            _pinned.reset(pinned_token)
+
+        if wrote or request.method not in SAFE_METHODS:
+            # request.user puede necesitar la base de datos: en un hilo
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def pin(self, request, response):
+        seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+        response.set_cookie(self.cookie_name, '1', max_age=seconds, httponly=True, samesite='Lax')
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            cache.set(pin_key(user.pk), True, seconds)
+
+
+class ReplicaReadMixin:
+    """
+    Para ViewSets: las peticiones GET/HEAD/OPTIONS leen de réplica, salvo
+    las acciones de `primary_actions` o si el usuario escribió hace poco.
+    La autenticación y los permisos se resuelven antes, en el primario.
+    """
+    primary_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and replica_aliases()
+            and getattr(self, 'action', None) not in self.primary_actions
+            and not is_pinned_user(request.user)
+        ):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,92 @@
+# backend/config/fieldsets.py
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+
+
+def _split(value):
+    return {item.strip() for item in (value or '').split(',') if item.strip()}
+
+
+def get_requested_fieldset(request):
+    """
+    Leer ?fields= y ?omit= de la petición.
+    Solo aplica a lecturas (GET/HEAD/OPTIONS); devuelve (fields, omit).
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return set(), set()
+    params = request.query_params
+    return _split(params.get(FIELDS_QUERY_PARAM)), _split(params.get(OMIT_QUERY_PARAM))
+
+
+class SparseFieldsetsSerializerMixin:
+    """
+    Permite al cliente elegir los campos de la respuesta:
+    ?fields=id,card_number,person_name,status  o  ?omit=metadata,elements
+    El campo 'id' siempre se incluye.
+    """
+    always_included_fields = ('id',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, omit = get_requested_fieldset(self.context.get('request'))
+        if not fields and not omit:
+            return
+        for name in list(self.fields):
+            if name in self.always_included_fields:
+                continue
+            if (fields and name not in fields) or name in omit:
+                self.fields.pop(name)
+
+
+class SparseFieldsetsViewMixin:
+    """
+    Reduce el SELECT a las columnas que necesitan los campos pedidos (.only()).
+
+    Los campos del serializer que no son columnas (propiedades del modelo)
+    se declaran en Meta.sparse_field_sources, ej:
+        sparse_field_sources = {'is_expired': ['status', 'expiration_date']}
+    Si algún campo pedido no se puede resolver, la consulta no se reduce.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, omit = get_requested_fieldset(self.request)
+        if not fields and not omit:
+            return queryset
+        return self.narrow_queryset(queryset)
+
+    def narrow_queryset(self, queryset):
+        serializer = self.get_serializer()
+        extra_sources = getattr(serializer.Meta, 'sparse_field_sources', {})
+        model_meta = queryset.model._meta
+
+        only_fields = {model_meta.pk.name}
+        related = set()
+        for name, field in serializer.fields.items():
+            if name in extra_sources:
+                only_fields.update(extra_sources[name])
+                continue
+            if field.source == '*':
+                return queryset
+            attrs = field.source.split('.')
+            try:
+                model_field = model_meta.get_field(attrs[0])
+            except FieldDoesNotExist:
+                return queryset
+            if not model_field.concrete:
+                return queryset
+            if len(attrs) == 1:
+                only_fields.add(attrs[0])
+            elif model_field.is_relation and len(attrs) == 2:
+                related.add(attrs[0])
+                only_fields.add(f'{attrs[0]}__{attrs[1]}')
+            else:
+                return queryset
+
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*only_fields)
@@ -0,0 +1,248 @@
+# backend/config/pagination.py
+import base64
+import json
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from django.core.exceptions import EmptyResultSet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Total aproximado de filas según las estadísticas del planificador.
+    En PostgreSQL usa EXPLAIN (sin ejecutar la consulta); en otras bases
+    de datos (ej. SQLite en pruebas) hace un COUNT normal.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """Paginator de Django que usa un total estimado en lugar de COUNT(*)"""
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+    def validate_number(self, number):
+        # El total es aproximado: no rechazar páginas por encima de la estimación
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Número de página inválido')
+        if number < 1:
+            raise EmptyPage('Número de página menor que 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por llave (keyset) sobre (created_at, id).
+    No ejecuta COUNT(*) ni OFFSET: cada página es una búsqueda por índice.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def get_ordering(self, view, queryset):
+        ordering = getattr(view, 'keyset_ordering', None)
+        if ordering:
+            return tuple(ordering)
+        field_names = {field.name for field in queryset.model._meta.get_fields()}
+        if 'created_at' in field_names:
+            return ('-created_at', '-pk')
+        return ('-pk',)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(encoded + padding).decode())
+            position = payload['p']
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            return position, bool(payload.get('r'))
+        except (ValueError, KeyError, TypeError):
+            raise NotFound('Cursor inválido')
+
+    def _position_for(self, obj):
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return position
+
+    def _parse_position(self, position):
+        values = []
+        for field, raw in zip(self.ordering, position):
+            if field.lstrip('-') in ('created_at', 'updated_at'):
+                parsed = parse_datetime(raw)
+                if parsed is None:
+                    raise NotFound('Cursor inválido')
+                values.append(parsed)
+            else:
+                values.append(raw)
+        return values
+
+    def _keyset_filter(self, values, forward):
+        """
+        Condición lexicográfica: filas estrictamente después (o antes) de la posición.
+        El OR se combina con una cota inclusiva sobre la primera columna para
+        que la base de datos lo resuelva como un rango del índice y no
+        filtrando todas las filas anteriores al cursor.
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_index in range(index):
+                term &= Q(**{self.ordering[prev_index].lstrip('-'): values[prev_index]})
+            condition |= term
+
+        first = self.ordering[0]
+        bound = 'lte' if first.startswith('-') == forward else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+    def _flip(self, field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(view, queryset)
+
+        page_size = self.page_size
+        requested = request.query_params.get(self.page_size_query_param)
+        if requested:
+            try:
+                page_size = max(1, min(int(requested), self.max_page_size))
+            except ValueError:
+                pass
+
+        position, reverse = self.decode_cursor(request)
+        if reverse:
+            queryset = queryset.order_by(*[self._flip(field) for field in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            values = self._parse_position(position)
+            queryset = queryset.filter(self._keyset_filter(values, forward=not reverse))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(self._position_for(self.page[-1]), reverse=False)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(self._position_for(self.page[0]), reverse=True)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+
+class StandardPagination(PageNumberPagination):
+    """
+    Paginación por defecto del API.
+
+    - ?page=N                : paginación por número de página (COUNT exacto).
+    - ?page=N&count=estimated: igual, pero con total estimado por el planificador.
+    - ?pagination=cursor     : paginación por llave (created_at, id), sin COUNT
+      ni OFFSET; las siguientes páginas se piden con el enlace `next` (?cursor=...).
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    count_query_param = 'count'
+    mode_query_param = 'pagination'
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        self.count_is_estimated = request.query_params.get(self.count_query_param) == 'estimated'
+
+        if self.use_cursor(request):
+            self.keyset = KeysetPagination(self.get_page_size(request) or self.page_size)
+            self.keyset.max_page_size = self.max_page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        if self.count_is_estimated:
+            self.django_paginator_class = EstimatedCountPaginator
+        else:
+            self.django_paginator_class = DjangoPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return Response({
+                'next': self.keyset.get_next_link(),
+                'previous': self.keyset.get_previous_link(),
+                'results': data,
+            })
+        response = super().get_paginated_response(data)
+        if self.count_is_estimated:
+            response.data['count_is_estimated'] = True
+        return response
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_previous_link()
+        return super().get_previous_link()
@@ -0,0 +1,82 @@
+# backend/config/response_cache.py
+import functools
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+from companies.generations import GLOBAL_GENERATION, get_generations
+from users.authentication import CompanyAPIKey
+from users.permissions import user_company_ids
+from .db_routers import use_replica
+
+RESPONSE_CACHE_KEY = 'response:{}'
+
+
+def generation_scope(request):
+    """Empresas de las que depende la respuesta; los superusuarios ven todas"""
+    if request.user.is_superuser and not isinstance(request.auth, CompanyAPIKey):
+        return [GLOBAL_GENERATION]
+    return sorted(user_company_ids(request))
+
+
+def versioned_key(namespace, company_ids, *parts):
+    """
+    Clave que incluye la generación de cada empresa: al escribir en una
+    empresa su generación sube y las claves viejas simplemente caducan.
+    """
+    generations = get_generations(company_ids)
+    raw = '|'.join([namespace, *map(str, parts), *(f'{c}:{g}' for c, g in sorted(generations.items()))])
+    return RESPONSE_CACHE_KEY.format(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+
+
+def cached_payload(namespace, company_ids, build, *parts):
+    """Devolver build() desde la caché versionada por empresa"""
+    timeout = settings.RESPONSE_CACHE_TIMEOUT
+    if not timeout:
+        return build()
+    key = versioned_key(namespace, company_ids, *parts)
+    payload = cache.get(key)
+    if payload is None:
+        # Del primario: una réplica atrasada quedaría cacheada con la generación nueva
+        with use_replica(False):
+            payload = build()
+        cache.set(key, payload, timeout)
+    return payload
+
+
+def cache_response(view_method):
+    """
+    Decorador para lecturas de ViewSets (list, retrieve, acciones GET).
+    Guarda los datos de las respuestas 200 por usuario, URL completa y
+    generación de sus empresas, así una lectura repetida no toca la base
+    de datos y cualquier escritura en la empresa la invalida.
+    Añade X-Cache: HIT/MISS.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if not timeout or request.method != 'GET' or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+
+        api_company = request.auth.company_id if isinstance(request.auth, CompanyAPIKey) else ''
+        key = versioned_key(
+            f'{self.__class__.__name__}.{view_method.__name__}',
+            generation_scope(request),
+            request.user.pk,
+            api_company,
+            request.get_full_path(),
+            request.accepted_media_type,
+        )
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        with use_replica(False):
+            response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200 and response.data is not None:
+            cache.set(key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
@@ -11,8 +11,10 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third party
     'rest_framework',
     'corsheaders',
@@ -58,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.db_routers.PrimaryPinningMiddleware',  # Réplicas: leer lo propio tras escribir
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -112,6 +116,26 @@ DATABASES = {
     }
 }
 
+# Réplicas de lectura (config/db_routers.py): DB_REPLICA_HOSTS=replica1:5432,replica2
+# Las lecturas seguras de los ViewSets (listados, búsqueda, export_csv, stats) van a
+# una réplica; escrituras, transacciones y migraciones, al primario.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv())):
+    host, _, port = replica.partition(':')
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['config.db_routers.ReplicaRouter']
+
+# Segundos que un cliente lee del primario después de escribir (lee sus propias escrituras)
+DATABASE_REPLICA_PIN_SECONDS = config('DATABASE_REPLICA_PIN_SECONDS', default=10, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -163,14 +187,102 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'config.pagination.StandardPagination',
     'PAGE_SIZE': 20,
 }
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cache
+# Backend: locmem (un proceso), file (varios procesos en una máquina) o redis
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+if CACHE_BACKEND == 'redis':
+    if find_spec('redis') is None:
+        raise ImproperlyConfigured('CACHE_BACKEND=redis requiere el paquete redis (pip install redis)')
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cards-default',
+        }
+    }
+
+# Caché compartida por todos los procesos: las cachés que se invalidan con señales
+# solo se activan con ella (con locmem la invalidación no llega a los demás procesos)
+SHARED_CACHE = CACHE_BACKEND in ('file', 'redis')
+
+# Tiempo (segundos) que se guardan las respuestas de lectura cacheadas (0 = desactivado).
+# Se invalidan antes, al escribir en la empresa (companies/generations.py)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300 if SHARED_CACHE else 0, cast=int)
+
+# Tiempo (segundos) que se guardan en caché los permisos por empresa de cada usuario
+# (0 = solo durante la petición)
+COMPANY_PERMISSIONS_CACHE_TIMEOUT = config(
+    'COMPANY_PERMISSIONS_CACHE_TIMEOUT', default=300 if SHARED_CACHE else 0, cast=int
+)
+
+# Tiempo (segundos) que se guardan en caché los tokens y las API Keys de empresa
+# (0 = sin caché: un logout o una API Key regenerada deben verse en todos los procesos)
+AUTH_TOKEN_CACHE_TIMEOUT = config('AUTH_TOKEN_CACHE_TIMEOUT', default=60 if SHARED_CACHE else 0, cast=int)
+COMPANY_API_KEY_CACHE_TIMEOUT = config('COMPANY_API_KEY_CACHE_TIMEOUT', default=60 if SHARED_CACHE else 0, cast=int)
+
+# Generación de código de barras, QR y vista previa tras guardar una tarjeta (cards/assets.py):
+# 'inline' (al confirmar la transacción), 'thread' (en segundo plano) u 'off'
+CARD_ASSETS_MODE = config('CARD_ASSETS_MODE', default='inline')
+CARD_ASSETS_WORKERS = config('CARD_ASSETS_WORKERS', default=2, cast=int)
+
+# Progreso de operaciones largas (cards/progress.py). Se guarda en la caché por defecto:
+# con varios procesos/servidores debe ser compartida (Redis, Memcached)
+PROGRESS_UPDATE_EVERY = config('PROGRESS_UPDATE_EVERY', default=200, cast=int)  # tarjetas entre escrituras
+PROGRESS_UPDATE_INTERVAL = config('PROGRESS_UPDATE_INTERVAL', default=1.0, cast=float)  # o segundos
+PROGRESS_TTL = config('PROGRESS_TTL', default=3600, cast=int)
+PROGRESS_STREAM_INTERVAL = config('PROGRESS_STREAM_INTERVAL', default=1.0, cast=float)
+PROGRESS_STREAM_TIMEOUT = config('PROGRESS_STREAM_TIMEOUT', default=300, cast=int)
+PROGRESS_BACKGROUND_WORKERS = config('PROGRESS_BACKGROUND_WORKERS', default=2, cast=int)
+
+# Dibujo de tarjetas en las vistas async (cards/rendering.py)
+RENDER_WORKERS = config('RENDER_WORKERS', default=2, cast=int)  # procesos; 0 = en un hilo
+RENDER_MAX_PENDING = config('RENDER_MAX_PENDING', default=32, cast=int)  # en curso + en cola; más = 503
+
+# Caché de imágenes generadas por /api/cards/<id>/image/ (cards/artifacts.py)
+RENDER_CACHE_DIR = config('RENDER_CACHE_DIR', default=str(BASE_DIR / 'render_cache'))
+RENDER_CACHE_DISK_BYTES = config('RENDER_CACHE_DISK_BYTES', default=1024 ** 3, cast=int)  # 1 GB por nodo
+RENDER_CACHE_MEMORY_BYTES = config('RENDER_CACHE_MEMORY_BYTES', default=64 * 1024 ** 2, cast=int)  # por proceso
+CARD_IMAGE_MAX_WIDTH = config('CARD_IMAGE_MAX_WIDTH', default=2048, cast=int)
+
+# Segundos mínimos entre actualizaciones de IDCard.last_accessed (una escritura por tarjeta y periodo)
+LAST_ACCESSED_UPDATE_INTERVAL = config('LAST_ACCESSED_UPDATE_INTERVAL', default=3600, cast=int)
+
+# Regeneración de tarjetas desactualizadas (cards/rerender.py, comando rerender_stale)
+RERENDER_CHUNK_SIZE = config('RERENDER_CHUNK_SIZE', default=100, cast=int)  # tarjetas por punto de control
+RERENDER_STALL_SECONDS = config('RERENDER_STALL_SECONDS', default=600, cast=int)  # sin avance: se puede retomar
+
+# Webhooks (companies/webhooks.py, comando deliver_webhooks)
+WEBHOOK_TIMEOUT = config('WEBHOOK_TIMEOUT', default=5, cast=int)  # segundos por POST
+WEBHOOK_BATCH_SIZE = config('WEBHOOK_BATCH_SIZE', default=100, cast=int)  # eventos por POST
+WEBHOOK_WORKERS = config('WEBHOOK_WORKERS', default=4, cast=int)  # POST simultáneos (uno por empresa)
+WEBHOOK_MAX_ATTEMPTS = config('WEBHOOK_MAX_ATTEMPTS', default=8, cast=int)
+WEBHOOK_RETRY_BASE = config('WEBHOOK_RETRY_BASE', default=30, cast=int)  # segundos, se duplica en cada intento
+WEBHOOK_RETRY_MAX = config('WEBHOOK_RETRY_MAX', default=3600, cast=int)
+WEBHOOK_ENABLED_CACHE_TIMEOUT = config(
+    'WEBHOOK_ENABLED_CACHE_TIMEOUT', default=60 if SHARED_CACHE else 0, cast=int
+)  # 0 = consultar siempre
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from cards.models import CardTemplate, IDCard
+from companies.models import Company
+from users.models import CompanyUser
+from .db_routers import PrimaryPinningMiddleware, pin_key, use_replica
+
+# Réplica de pruebas: un segundo alias espejo de la base de datos de pruebas
+# (con SQLite, otra conexión a la misma base en memoria). Ve lo confirmado en
+# 'default' y cada alias registra sus propias consultas.
+REPLICA = 'replica_test'
+settings.DATABASES.setdefault(REPLICA, {
+    **settings.DATABASES[DEFAULT_DB_ALIAS],
+    'TEST': {**settings.DATABASES[DEFAULT_DB_ALIAS].get('TEST', {}), 'MIRROR': DEFAULT_DB_ALIAS},
+})
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTests(TransactionTestCase):
+    """ReplicaRouter, ReplicaReadMixin y PrimaryPinningMiddleware"""
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.company = Company.objects.create(name='Acme', contact_email='acme@example.com', created_by=admin)
+        self.template = CardTemplate.objects.create(company=self.company, name='Básica', created_by=admin)
+        IDCard.objects.create(
+            company=self.company, template=self.template,
+            person_name='Persona 1', id_number='ID1', card_number='C1',
+        )
+        self.user = User.objects.create_user('ed', 'ed@example.com', 'x')
+        CompanyUser.objects.create(user=self.user, company=self.company, role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_cards(self, client=None):
+        """GET del listado; devuelve (respuesta, consultas a la réplica)"""
+        with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+            response = (client or self.client).get('/api/cards/')
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in replica_queries]
+
+    def test_viewset_read_uses_replica(self):
+        response, replica_queries = self.get_cards()
+
+        self.assertEqual([card['card_number'] for card in response.data['results']], ['C1'])
+        self.assertTrue(any('cards_idcard' in sql for sql in replica_queries))
+
+    def test_reads_outside_viewsets_use_primary(self):
+        self.assertEqual(IDCard.objects.all().db, DEFAULT_DB_ALIAS)
+        with use_replica():
+            self.assertEqual(IDCard.objects.all().db, REPLICA)
+
+    def test_writes_and_transactions_use_primary(self):
+        with use_replica():
+            self.assertEqual(router.db_for_write(IDCard), DEFAULT_DB_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(IDCard.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.patch(
+            f'/api/cards/templates/{self.template.pk}/', {'name': 'Nueva'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PrimaryPinningMiddleware.cookie_name, response.cookies)
+        self.assertTrue(cache.get(pin_key(self.user.pk)))
+
+        # Clientes con token (sin cookies): la marca en caché
+        token_client = APIClient()
+        token_client.force_authenticate(self.user)
+        _, replica_queries = self.get_cards(token_client)
+        self.assertEqual(replica_queries, [])
+
+        # Al caducar la marca vuelve a la réplica; la cookie sigue fijando al navegador
+        cache.delete(pin_key(self.user.pk))
+        _, replica_queries = self.get_cards(token_client)
+        self.assertNotEqual(replica_queries, [])
+        _, replica_queries = self.get_cards()
+        self.assertEqual(replica_queries, [])
@@ -0,0 +1,138 @@
+# backend/users/authentication.py
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, BaseAuthentication, get_authorization_header
+
+TOKEN_CACHE_KEY = 'auth_token:{key}'
+API_KEY_CACHE_KEY = 'company_api_key:{key}'
+
+# Permisos de un cliente autenticado con la API Key de una empresa
+API_KEY_PERMISSIONS = {
+    'role': 'api',
+    'can_create_templates': False,
+    'can_edit_templates': False,
+    'can_delete_templates': False,
+    'can_create_cards': True,
+    'can_edit_cards': True,
+    'can_delete_cards': False,
+    'can_export_data': True,
+    'can_manage_users': False,
+    'can_view_reports': True,
+}
+
+
+def _token_cache_key(key):
+    return TOKEN_CACHE_KEY.format(key=key)
+
+
+def _api_key_cache_key(key):
+    return API_KEY_CACHE_KEY.format(key=key)
+
+
+def invalidate_token(key):
+    """Eliminar de la caché un token (logout, usuario modificado)"""
+    cache.delete(_token_cache_key(key))
+
+
+def invalidate_api_key(key):
+    """Eliminar de la caché una API Key de empresa (regenerada o empresa modificada)"""
+    cache.delete(_api_key_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication con caché: con caché compartida el token y su
+    usuario se guardan durante AUTH_TOKEN_CACHE_TIMEOUT segundos, así que las
+    peticiones repetidas no consultan authtoken_token ni auth_user.
+    Las señales de users/signals.py invalidan la caché.
+    """
+
+    def authenticate_credentials(self, key):
+        timeout = settings.AUTH_TOKEN_CACHE_TIMEOUT
+        cache_key = _token_cache_key(key)
+        token = cache.get(cache_key) if timeout else None
+        if token is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Token inválido.')
+            if timeout:
+                cache.set(cache_key, token, timeout)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('Usuario inactivo o eliminado.')
+
+        return (token.user, token)
+
+
+class CompanyAPIKey:
+    """Credencial de un cliente servidor-a-servidor limitada a una empresa"""
+
+    def __init__(self, key, company_id):
+        self.key = key
+        self.company_id = company_id
+
+    def __str__(self):
+        return str(self.key)
+
+
+class CompanyAPIKeyAuthentication(BaseAuthentication):
+    """
+    Autenticación con la API Key de una empresa (sincronización de tarjetas):
+        Authorization: Api-Key <company.api_key>   o   X-API-Key: <company.api_key>
+
+    request.user es el creador de la empresa (para los campos created_by) sin
+    privilegios de superusuario, y request.auth es un CompanyAPIKey: el
+    resolvedor de permisos (users/permissions.py) solo le da acceso a esa empresa.
+    """
+    keyword = 'Api-Key'
+    header = 'HTTP_X_API_KEY'
+
+    def get_key(self, request):
+        auth = get_authorization_header(request).split()
+        if auth and auth[0].lower() == self.keyword.lower().encode():
+            if len(auth) != 2:
+                raise exceptions.AuthenticationFailed('Cabecera Api-Key inválida.')
+            return auth[1].decode(errors='ignore')
+        return request.META.get(self.header)
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if not key:
+            return None
+        try:
+            key = str(uuid.UUID(key))
+        except ValueError:
+            raise exceptions.AuthenticationFailed('API Key inválida.')
+
+        timeout = settings.COMPANY_API_KEY_CACHE_TIMEOUT
+        cache_key = _api_key_cache_key(key)
+        company = cache.get(cache_key) if timeout else None
+        if company is None:
+            from companies.models import Company
+
+            company = (
+                Company.objects.select_related('created_by')
+                .only('id', 'is_active', 'api_key', 'created_by')
+                .filter(api_key=key)
+                .first()
+            )
+            if company is None:
+                raise exceptions.AuthenticationFailed('API Key inválida.')
+            if timeout:
+                cache.set(cache_key, company, timeout)
+
+        user = company.created_by
+        if not company.is_active or user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed('Empresa inactiva o sin responsable.')
+
+        # El cliente solo actúa sobre su empresa, nunca como superusuario
+        user.is_superuser = False
+        user.is_staff = False
+        return (user, CompanyAPIKey(key, str(company.pk)))
+
+    def authenticate_header(self, request):
+        return self.keyword
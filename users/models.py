@@ -63,6 +63,12 @@ class CompanyUser(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.company.name} ({self.role})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_role = instance.__dict__.get('role')
+        return instance
+    
     def save(self, *args, **kwargs):
         # Asignar permisos automáticos según el rol
         if not self.pk:  # Solo en creación
@@ -128,4 +134,5 @@ class CompanyUser(models.Model):
             for perm, value in permissions.items():
                 setattr(self, perm, value)
         
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+        self._loaded_role = self.role
\ No newline at end of file
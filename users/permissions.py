@@ -0,0 +1,112 @@
+# backend/users/permissions.py
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from .authentication import API_KEY_PERMISSIONS, CompanyAPIKey
+from .models import CompanyUser
+
+# Permisos por empresa que se guardan en caché
+PERMISSION_FIELDS = [
+    'can_create_templates',
+    'can_edit_templates',
+    'can_delete_templates',
+    'can_create_cards',
+    'can_edit_cards',
+    'can_delete_cards',
+    'can_export_data',
+    'can_manage_users',
+    'can_view_reports',
+]
+
+CACHE_KEY = 'company_perms:{user_id}'
+
+
+def _cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def _normalize_company_id(company_id):
+    """Normalizar el ID de empresa a su forma canónica (str de UUID)"""
+    if company_id is None or company_id == '':
+        return None
+    try:
+        return str(uuid.UUID(str(company_id)))
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+def _load_memberships(user_id):
+    """Cargar todas las membresías del usuario en una sola consulta"""
+    rows = CompanyUser.objects.filter(user_id=user_id).values(
+        'company_id', 'role', *PERMISSION_FIELDS
+    )
+    return {str(row.pop('company_id')): row for row in rows}
+
+
+def get_memberships(request):
+    """
+    Obtener las membresías del usuario de la petición.
+    Se resuelven una vez por petición y, con caché compartida, se guardan entre peticiones.
+    Con API Key de empresa (request.auth) solo se incluye esa empresa.
+    Devuelve un diccionario {company_id: {'role': ..., 'can_...': bool}}.
+    """
+    memberships = getattr(request, '_company_memberships', None)
+    if memberships is not None:
+        return memberships
+
+    user = getattr(request, 'user', None)
+    api_key = getattr(request, 'auth', None)
+    if user is None or not user.is_authenticated:
+        memberships = {}
+    elif isinstance(api_key, CompanyAPIKey):
+        # Cliente con API Key: membresía sintética solo en su empresa
+        memberships = {api_key.company_id: dict(API_KEY_PERMISSIONS)}
+    else:
+        memberships = get_user_memberships(user.pk)
+
+    request._company_memberships = memberships
+    return memberships
+
+
+def get_user_memberships(user_id):
+    """Membresías de un usuario desde la caché (sin petición, ej. en el login)"""
+    timeout = settings.COMPANY_PERMISSIONS_CACHE_TIMEOUT
+    if not timeout:
+        return _load_memberships(user_id)
+    key = _cache_key(user_id)
+    memberships = cache.get(key)
+    if memberships is None:
+        memberships = _load_memberships(user_id)
+        cache.set(key, memberships, timeout)
+    return memberships
+
+
+def user_company_ids(request):
+    """IDs de las empresas a las que pertenece el usuario"""
+    return list(get_memberships(request).keys())
+
+
+def get_membership(request, company_id):
+    """Membresía del usuario en una empresa (o None si no pertenece)"""
+    company_id = _normalize_company_id(company_id)
+    if company_id is None:
+        return None
+    return get_memberships(request).get(company_id)
+
+
+def has_company_permission(request, company_id, permission=None):
+    """
+    Verificar si el usuario pertenece a la empresa y, opcionalmente,
+    si tiene el permiso indicado (ej. 'can_create_cards').
+    """
+    membership = get_membership(request, company_id)
+    if membership is None:
+        return False
+    if permission is None:
+        return True
+    return bool(membership.get(permission))
+
+
+def invalidate_memberships(user_id):
+    """Eliminar de la caché las membresías de un usuario"""
+    cache.delete(_cache_key(user_id))
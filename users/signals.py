@@ -0,0 +1,48 @@
+# backend/users/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from companies.models import Company
+from .authentication import invalidate_api_key, invalidate_token
+from .models import CompanyUser
+from .permissions import invalidate_memberships
+
+# Campos del usuario que afectan a la autenticación con token o API Key
+CREDENTIAL_FIELDS = {'is_active', 'is_superuser', 'is_staff', 'password'}
+
+
+@receiver(post_save, sender=CompanyUser)
+@receiver(post_delete, sender=CompanyUser)
+def invalidate_company_user_cache(sender, instance, **kwargs):
+    """Invalidar la caché de permisos cuando cambia una membresía"""
+    invalidate_memberships(instance.user_id)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token_cache(sender, instance, **kwargs):
+    """Invalidar el token en caché al cerrar sesión"""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_credentials_cache(sender, instance, update_fields=None, **kwargs):
+    """
+    El usuario va dentro del token y de la API Key en caché:
+    si cambia (ej. se desactiva), se invalidan ambos.
+    """
+    # update_last_login en cada login no cambia nada de lo que se comprueba
+    if update_fields is not None and not set(update_fields) & CREDENTIAL_FIELDS:
+        return
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        invalidate_token(key)
+    for api_key in Company.objects.filter(created_by_id=instance.pk).values_list('api_key', flat=True):
+        invalidate_api_key(api_key)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_company_api_key_cache(sender, instance, **kwargs):
+    """Invalidar la API Key en caché cuando cambia la empresa (ej. is_active)"""
+    invalidate_api_key(instance.api_key)
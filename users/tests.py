@@ -1,3 +1,52 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from companies.models import Company
+from .models import CompanyUser
+from .permissions import _cache_key, get_user_memberships
 
-# Create your tests here.
+
+@override_settings(COMPANY_PERMISSIONS_CACHE_TIMEOUT=300)
+class MembershipCacheTests(TestCase):
+    """Membresías en caché entre peticiones, invalidadas por las señales de CompanyUser"""
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.company = Company.objects.create(name='Acme', contact_email='acme@example.com', created_by=admin)
+        self.user = User.objects.create_user('ed', 'ed@example.com', 'x')
+        self.membership = CompanyUser.objects.create(user=self.user, company=self.company, role='viewer')
+        self.company_id = str(self.company.pk)
+
+    def test_second_read_comes_from_cache(self):
+        get_user_memberships(self.user.pk)
+
+        with self.assertNumQueries(0):
+            memberships = get_user_memberships(self.user.pk)
+        self.assertEqual(memberships[self.company_id]['role'], 'viewer')
+
+    def test_saving_membership_invalidates(self):
+        get_user_memberships(self.user.pk)
+
+        self.membership.role = 'admin'
+        self.membership.can_manage_users = True
+        self.membership.save()
+
+        membership = get_user_memberships(self.user.pk)[self.company_id]
+        self.assertEqual(membership['role'], 'admin')
+        self.assertTrue(membership['can_manage_users'])
+
+    def test_deleting_membership_invalidates(self):
+        get_user_memberships(self.user.pk)
+
+        self.membership.delete()
+
+        self.assertEqual(get_user_memberships(self.user.pk), {})
+
+    @override_settings(COMPANY_PERMISSIONS_CACHE_TIMEOUT=0)
+    def test_no_cache_without_timeout(self):
+        get_user_memberships(self.user.pk)
+
+        self.assertIsNone(cache.get(_cache_key(self.user.pk)))
+        with self.assertNumQueries(1):
+            get_user_memberships(self.user.pk)
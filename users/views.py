@@ -7,8 +7,10 @@ from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate
 from .models import CompanyUser
+from .permissions import get_user_memberships, has_company_permission
 from .serializers import UserSerializer, CompanyUserSerializer
 from companies.models import Company
+from config.response_cache import cached_payload
 
 class UserViewSet(viewsets.ModelViewSet):
     """
@@ -37,11 +39,7 @@ class CompanyUserViewSet(viewsets.ModelViewSet):
             return CompanyUser.objects.none()
         
         # Verificar que el usuario tenga permiso para gestionar usuarios en esta empresa
-        user_permission = CompanyUser.objects.filter(
-            user=user,
-            company_id=company_id,
-            can_manage_users=True
-        ).exists()
+        user_permission = has_company_permission(self.request, company_id, 'can_manage_users')
         
         if not user_permission and not user.is_superuser:
             return CompanyUser.objects.none()
@@ -56,11 +54,9 @@ class CompanyUserViewSet(viewsets.ModelViewSet):
         if company_id:
             # Verificar permisos
             if not self.request.user.is_superuser:
-                user_permission = CompanyUser.objects.filter(
-                    user=self.request.user,
-                    company_id=company_id,
-                    can_manage_users=True
-                ).exists()
+                user_permission = has_company_permission(
+                    self.request, company_id, 'can_manage_users'
+                )
                 
                 if not user_permission:
                     raise PermissionError("No tienes permiso para agregar usuarios a esta empresa")
@@ -73,8 +69,6 @@ def register_user(request):
     """
     Registro de nuevo usuario usando API Key de empresa.
     """
-    from companies.models import Company
-    
     username = request.data.get('username')
     email = request.data.get('email')
     password = request.data.get('password')
@@ -146,6 +140,23 @@ def register_user(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+def _login_companies(user):
+    companies = CompanyUser.objects.filter(user=user).select_related('company')
+    companies_data = []
+    
+    for company_user in companies:
+        companies_data.append({
+            'company_id': str(company_user.company.id),
+            'company_name': company_user.company.name,
+            'role': company_user.role,
+            'permissions': {
+                'can_create_templates': company_user.can_create_templates,
+                'can_manage_users': company_user.can_manage_users,
+                'can_export_data': company_user.can_export_data,
+            }
+        })
+    return companies_data
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login(request):
@@ -179,21 +190,10 @@ def login(request):
     # Obtener o crear token
     token, created = Token.objects.get_or_create(user=user)
     
-    # Obtener empresas del usuario
-    companies = CompanyUser.objects.filter(user=user).select_related('company')
-    companies_data = []
-    
-    for company_user in companies:
-        companies_data.append({
-            'company_id': str(company_user.company.id),
-            'company_name': company_user.company.name,
-            'role': company_user.role,
-            'permissions': {
-                'can_create_templates': company_user.can_create_templates,
-                'can_manage_users': company_user.can_manage_users,
-                'can_export_data': company_user.can_export_data,
-            }
-        })
+    # Empresas del usuario: en caché hasta que cambie alguna de ellas
+    companies_data = cached_payload(
+        'login', list(get_user_memberships(user.pk)), lambda: _login_companies(user), user.pk
+    )
     
     return Response({
         'token': token.key,